@@ -0,0 +1,24 @@
+"""add sex to categories
+
+Revision ID: add_category_sex
+Revises: add_contest_archived_at
+Create Date: 2024-12-21 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_category_sex'
+down_revision = 'add_contest_archived_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('categories', sa.Column('sex', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('categories', 'sex')
@@ -0,0 +1,24 @@
+"""add tie-break chains to categories
+
+Revision ID: add_category_tie_breaks
+Revises: add_published_results
+Create Date: 2024-12-26 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_category_tie_breaks'
+down_revision = 'add_published_results'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('categories', sa.Column('tie_breaks', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('categories', 'tie_breaks')
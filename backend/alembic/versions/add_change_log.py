@@ -0,0 +1,34 @@
+"""add change log table
+
+Revision ID: add_change_log
+Revises: add_result_audit
+Create Date: 2024-12-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_change_log'
+down_revision = 'add_result_audit'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'change_log',
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('table_name', sa.String(), nullable=False),
+        sa.Column('row_id', sa.Integer(), nullable=False),
+        sa.Column('op', sa.String(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('seq')
+    )
+    op.create_index('ix_change_log_table_row', 'change_log', ['table_name', 'row_id', 'seq'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_change_log_table_row', table_name='change_log')
+    op.drop_table('change_log')
@@ -0,0 +1,24 @@
+"""add related_id to change log
+
+Revision ID: add_change_log_related_id
+Revises: add_change_log
+Create Date: 2024-12-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_change_log_related_id'
+down_revision = 'add_change_log'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('change_log', sa.Column('related_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('change_log', 'related_id')
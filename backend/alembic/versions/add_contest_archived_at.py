@@ -0,0 +1,24 @@
+"""add archived_at to contests
+
+Revision ID: add_contest_archived_at
+Revises: add_contests
+Create Date: 2024-12-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_contest_archived_at'
+down_revision = 'add_contests'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('contests', sa.Column('archived_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('contests', 'archived_at')
@@ -0,0 +1,115 @@
+"""add contests and scope every table by contest
+
+Revision ID: add_contests
+Revises: add_change_log_related_id
+Create Date: 2024-12-19 10:00:00.000000
+
+Existing rows are moved into a default contest (id 1). Set
+PARTITION_RESULTS_BY_CONTEST=1 when upgrading a Postgres database to turn
+``results`` into a table list-partitioned by contest; new contests then get
+their own partition when they are created.
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_contests'
+down_revision = 'add_change_log_related_id'
+branch_labels = None
+depends_on = None
+
+SCOPED_TABLES = ['categories', 'events', 'participants', 'results']
+
+
+def _partition_results():
+    # The partition key has to be part of the primary key, so the table is rebuilt
+    op.execute("ALTER TABLE results RENAME TO results_unpartitioned")
+    op.execute("ALTER SEQUENCE results_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE results (
+            LIKE results_unpartitioned INCLUDING DEFAULTS,
+            PRIMARY KEY (contest_id, id),
+            FOREIGN KEY (contest_id) REFERENCES contests (id),
+            FOREIGN KEY (participant_id) REFERENCES participants (id),
+            FOREIGN KEY (event_id) REFERENCES events (id)
+        ) PARTITION BY LIST (contest_id)
+    """)
+    op.execute("CREATE TABLE results_default PARTITION OF results DEFAULT")
+    op.execute("CREATE TABLE results_contest_1 PARTITION OF results FOR VALUES IN (1)")
+    op.execute("INSERT INTO results SELECT * FROM results_unpartitioned")
+    op.execute("DROP TABLE results_unpartitioned")
+    op.execute("ALTER SEQUENCE results_id_seq OWNED BY results.id")
+    op.create_index('ix_results_id', 'results', ['id'], unique=False)
+
+
+def upgrade() -> None:
+    op.create_table(
+        'contests',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_contests_id'), 'contests', ['id'], unique=False)
+    op.execute("INSERT INTO contests (id, name) VALUES (1, 'Default contest')")
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("SELECT setval('contests_id_seq', (SELECT MAX(id) FROM contests))")
+
+    for table in SCOPED_TABLES:
+        op.add_column(table, sa.Column('contest_id', sa.Integer(), nullable=False, server_default='1'))
+        op.alter_column(table, 'contest_id', server_default=None)
+        op.create_foreign_key(f'fk_{table}_contest', table, 'contests', ['contest_id'], ['id'])
+
+    # Names and chest numbers are only unique within a contest
+    op.drop_index('ix_categories_name', table_name='categories')
+    op.create_unique_constraint('uq_categories_contest_name', 'categories', ['contest_id', 'name'])
+    op.drop_index('ix_participants_chest_number', table_name='participants')
+    op.create_unique_constraint('uq_participants_contest_chest_number', 'participants', ['contest_id', 'chest_number'])
+
+    if op.get_bind().dialect.name == 'postgresql' and os.getenv('PARTITION_RESULTS_BY_CONTEST'):
+        _partition_results()
+
+    op.create_index('ix_events_contest_category', 'events', ['contest_id', 'category_id'], unique=False)
+    op.create_index('ix_participants_contest_category', 'participants', ['contest_id', 'category_id'], unique=False)
+    op.create_index('ix_results_contest_event', 'results', ['contest_id', 'event_id', 'rank'], unique=False)
+    op.create_index('ix_results_contest_participant', 'results', ['contest_id', 'participant_id', 'event_id'], unique=False)
+
+    op.add_column('jobs', sa.Column('contest_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_jobs_contest', 'jobs', 'contests', ['contest_id'], ['id'])
+    op.create_index('ix_jobs_contest_kind', 'jobs', ['contest_id', 'kind', 'status'], unique=False)
+
+    op.add_column('change_log', sa.Column('contest_id', sa.Integer(), nullable=True))
+    op.create_index('ix_change_log_contest_seq', 'change_log', ['contest_id', 'seq'], unique=False)
+
+
+def downgrade() -> None:
+    # A results table partitioned by contest has to be rebuilt by hand first
+    op.drop_index('ix_change_log_contest_seq', table_name='change_log')
+    op.drop_column('change_log', 'contest_id')
+
+    op.drop_index('ix_jobs_contest_kind', table_name='jobs')
+    op.drop_constraint('fk_jobs_contest', 'jobs', type_='foreignkey')
+    op.drop_column('jobs', 'contest_id')
+
+    op.drop_index('ix_results_contest_participant', table_name='results')
+    op.drop_index('ix_results_contest_event', table_name='results')
+    op.drop_index('ix_participants_contest_category', table_name='participants')
+    op.drop_index('ix_events_contest_category', table_name='events')
+
+    # Only valid while every row still belongs to one contest
+    op.drop_constraint('uq_participants_contest_chest_number', 'participants', type_='unique')
+    op.create_index(op.f('ix_participants_chest_number'), 'participants', ['chest_number'], unique=True)
+    op.drop_constraint('uq_categories_contest_name', 'categories', type_='unique')
+    op.create_index(op.f('ix_categories_name'), 'categories', ['name'], unique=True)
+
+    for table in reversed(SCOPED_TABLES):
+        op.drop_constraint(f'fk_{table}_contest', table, type_='foreignkey')
+        op.drop_column(table, 'contest_id')
+
+    op.drop_index(op.f('ix_contests_id'), table_name='contests')
+    op.drop_table('contests')
@@ -0,0 +1,32 @@
+"""add rounds and qualification rules to events
+
+Revision ID: add_event_rounds
+Revises: add_place_dictionaries
+Create Date: 2024-12-23 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_event_rounds'
+down_revision = 'add_place_dictionaries'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('events', sa.Column('next_round_id', sa.Integer(), nullable=True))
+    op.add_column('events', sa.Column('qualify_top', sa.Integer(), nullable=True))
+    op.add_column('events', sa.Column('qualify_min_marks', sa.Float(), nullable=True))
+    op.create_foreign_key('fk_events_next_round', 'events', 'events', ['next_round_id'], ['id'])
+    op.create_index(op.f('ix_events_next_round_id'), 'events', ['next_round_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_events_next_round_id'), table_name='events')
+    op.drop_constraint('fk_events_next_round', 'events', type_='foreignkey')
+    op.drop_column('events', 'qualify_min_marks')
+    op.drop_column('events', 'qualify_top')
+    op.drop_column('events', 'next_round_id')
@@ -0,0 +1,95 @@
+"""move participants' places into lookup tables
+
+Revision ID: add_place_dictionaries
+Revises: add_category_sex
+Create Date: 2024-12-22 10:00:00.000000
+
+``participants.state``, ``region``, ``district`` and ``church`` become ids
+into ``states``, ``regions``, ``districts`` and ``churches``. Existing
+values are deduplicated on a folded key (case, spacing and punctuation), and
+the most common spelling of each becomes its name.
+"""
+import re
+from collections import Counter
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_place_dictionaries'
+down_revision = 'add_category_sex'
+branch_labels = None
+depends_on = None
+
+# participant column -> lookup table
+PLACES = {'state': 'states', 'region': 'regions', 'district': 'districts', 'church': 'churches'}
+
+
+def _key(name):
+    # Same folding as app.dictionaries.name_key
+    folded = re.sub(r"[^\w\s]", "", name or "").casefold()
+    return " ".join(folded.split()) or None
+
+
+def _encode(connection, column, table):
+    spellings = {}
+    for value, count in connection.execute(sa.text(
+        f"SELECT {column}, COUNT(*) FROM participants WHERE {column} IS NOT NULL GROUP BY {column}"
+    )):
+        key = _key(value)
+        if key is not None:
+            spellings.setdefault(key, Counter())[" ".join(value.split())] += count
+    if not spellings:
+        return
+
+    connection.execute(
+        sa.text(f"INSERT INTO {table} (name, key) VALUES (:name, :key)"),
+        [{"name": counter.most_common(1)[0][0], "key": key} for key, counter in spellings.items()],
+    )
+    ids = dict(connection.execute(sa.text(f"SELECT key, id FROM {table}")).fetchall())
+    raw_values = [row[0] for row in connection.execute(sa.text(
+        f"SELECT DISTINCT {column} FROM participants WHERE {column} IS NOT NULL"
+    ))]
+    connection.execute(
+        sa.text(f"UPDATE participants SET {column}_id = :id WHERE {column} = :value"),
+        [{"id": ids[_key(value)], "value": value} for value in raw_values if _key(value) is not None],
+    )
+
+
+def upgrade() -> None:
+    for column, table in PLACES.items():
+        op.create_table(
+            table,
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('key', sa.String(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('key')
+        )
+        op.add_column('participants', sa.Column(f'{column}_id', sa.Integer(), nullable=True))
+        op.create_foreign_key(f'fk_participants_{column}', 'participants', table, [f'{column}_id'], ['id'])
+
+    connection = op.get_bind()
+    for column, table in PLACES.items():
+        _encode(connection, column, table)
+
+    for column in PLACES:
+        op.drop_column('participants', column)
+    op.create_index(
+        'ix_participants_contest_place', 'participants',
+        ['contest_id', 'state_id', 'region_id', 'district_id', 'church_id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_participants_contest_place', table_name='participants')
+    for column, table in PLACES.items():
+        op.add_column('participants', sa.Column(column, sa.String(), nullable=True))
+        op.execute(
+            f"UPDATE participants SET {column} = "
+            f"(SELECT name FROM {table} WHERE {table}.id = participants.{column}_id)"
+        )
+        op.drop_constraint(f'fk_participants_{column}', 'participants', type_='foreignkey')
+        op.drop_column('participants', f'{column}_id')
+        op.drop_table(table)
@@ -0,0 +1,64 @@
+"""add published result snapshots
+
+Revision ID: add_published_results
+Revises: add_teams
+Create Date: 2024-12-25 10:00:00.000000
+
+Results entered from now on are drafts until their event is published.
+Events that already have results are published as they stand (version 1),
+so existing result boards keep showing them after the upgrade.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_published_results'
+down_revision = 'add_teams'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('events', sa.Column('published_version', sa.Integer(), nullable=True))
+    op.add_column('events', sa.Column('published_at', sa.DateTime(), nullable=True))
+    op.create_table(
+        'published_results',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('contest_id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('participant_id', sa.Integer(), nullable=False),
+        sa.Column('participant_name', sa.String(), nullable=True),
+        sa.Column('chest_number', sa.String(), nullable=True),
+        sa.Column('judge1_marks', sa.Float(), nullable=True),
+        sa.Column('judge2_marks', sa.Float(), nullable=True),
+        sa.Column('judge3_marks', sa.Float(), nullable=True),
+        sa.Column('total_marks', sa.Float(), nullable=True),
+        sa.Column('rank', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['contest_id'], ['contests.id'], ),
+        sa.ForeignKeyConstraint(['event_id'], ['events.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_published_results_event_version', 'published_results', ['event_id', 'version', 'rank'], unique=False
+    )
+
+    op.execute("""
+        INSERT INTO published_results (contest_id, event_id, version, participant_id, participant_name,
+                                       chest_number, judge1_marks, judge2_marks, judge3_marks, total_marks, rank)
+        SELECT r.contest_id, r.event_id, 1, r.participant_id, p.name, p.chest_number,
+               r.judge1_marks, r.judge2_marks, r.judge3_marks, r.total_marks, r.rank
+        FROM results r JOIN participants p ON p.id = r.participant_id
+    """)
+    op.execute("""
+        UPDATE events SET published_version = 1, published_at = CURRENT_TIMESTAMP
+        WHERE id IN (SELECT event_id FROM published_results)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_published_results_event_version', table_name='published_results')
+    op.drop_table('published_results')
+    op.drop_column('events', 'published_at')
+    op.drop_column('events', 'published_version')
@@ -0,0 +1,69 @@
+"""add result audit table
+
+Revision ID: add_result_audit
+Revises: add_jobs_table
+Create Date: 2024-12-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_result_audit'
+down_revision = 'add_jobs_table'
+branch_labels = None
+depends_on = None
+
+PARTITIONS = 8
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        # Hash partitioned by event so history lookups prune to one partition;
+        # the partition key has to be part of the primary key
+        op.execute("""
+            CREATE TABLE result_audit (
+                id SERIAL NOT NULL,
+                event_id INTEGER NOT NULL,
+                participant_id INTEGER NOT NULL,
+                result_id INTEGER,
+                action VARCHAR NOT NULL,
+                judge1_marks DOUBLE PRECISION,
+                judge2_marks DOUBLE PRECISION,
+                judge3_marks DOUBLE PRECISION,
+                total_marks DOUBLE PRECISION,
+                rank INTEGER,
+                changed_by VARCHAR,
+                changed_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+                PRIMARY KEY (event_id, id)
+            ) PARTITION BY HASH (event_id)
+        """)
+        for remainder in range(PARTITIONS):
+            op.execute(
+                f"CREATE TABLE result_audit_p{remainder} PARTITION OF result_audit "
+                f"FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})"
+            )
+    else:
+        op.create_table(
+            'result_audit',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('event_id', sa.Integer(), nullable=False),
+            sa.Column('participant_id', sa.Integer(), nullable=False),
+            sa.Column('result_id', sa.Integer(), nullable=True),
+            sa.Column('action', sa.String(), nullable=False),
+            sa.Column('judge1_marks', sa.Float(), nullable=True),
+            sa.Column('judge2_marks', sa.Float(), nullable=True),
+            sa.Column('judge3_marks', sa.Float(), nullable=True),
+            sa.Column('total_marks', sa.Float(), nullable=True),
+            sa.Column('rank', sa.Integer(), nullable=True),
+            sa.Column('changed_by', sa.String(), nullable=True),
+            sa.Column('changed_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+    op.create_index('ix_result_audit_participant_event', 'result_audit', ['participant_id', 'event_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_result_audit_participant_event', table_name='result_audit')
+    op.drop_table('result_audit')
@@ -13,10 +13,14 @@ import sqlalchemy as sa
 revision = 'add_results_table_rev'
 down_revision = None
 branch_labels = None
-depends_on = None
+# initial_migration creates the results table too; run after it, so on a
+# fresh database this revision finds the table and leaves it alone
+depends_on = 'initial_migration'
 
 
 def upgrade():
+    if sa.inspect(op.get_bind()).has_table('results'):
+        return
     op.create_table('results',
         sa.Column('id', sa.Integer(), nullable=False),
         sa.Column('participant_id', sa.Integer(), nullable=False),
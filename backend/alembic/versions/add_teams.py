@@ -0,0 +1,93 @@
+"""add teams, team registrations and team results
+
+Revision ID: add_teams
+Revises: add_event_rounds
+Create Date: 2024-12-24 10:00:00.000000
+
+Also indexes participant_event both ways, which had no index at all, so
+"events of a participant" and "entrants of an event" are index lookups.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_teams'
+down_revision = 'add_event_rounds'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_participant_event_participant', 'participant_event', ['participant_id', 'event_id'], unique=False)
+    op.create_index('ix_participant_event_event', 'participant_event', ['event_id', 'participant_id'], unique=False)
+
+    op.create_table(
+        'teams',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('contest_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('chest_number', sa.String(), nullable=True),
+        sa.Column('category_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['contest_id'], ['contests.id'], ),
+        sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('contest_id', 'name', name='uq_teams_contest_name')
+    )
+    op.create_index(op.f('ix_teams_id'), 'teams', ['id'], unique=False)
+    op.create_index('ix_teams_contest_category', 'teams', ['contest_id', 'category_id'], unique=False)
+
+    op.create_table(
+        'team_members',
+        sa.Column('team_id', sa.Integer(), nullable=False),
+        sa.Column('participant_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+        sa.ForeignKeyConstraint(['participant_id'], ['participants.id'], ),
+        sa.PrimaryKeyConstraint('team_id', 'participant_id')
+    )
+    op.create_index('ix_team_members_participant', 'team_members', ['participant_id', 'team_id'], unique=False)
+
+    op.create_table(
+        'team_event',
+        sa.Column('team_id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+        sa.ForeignKeyConstraint(['event_id'], ['events.id'], ),
+        sa.PrimaryKeyConstraint('team_id', 'event_id')
+    )
+    op.create_index('ix_team_event_event', 'team_event', ['event_id', 'team_id'], unique=False)
+
+    op.create_table(
+        'team_results',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('contest_id', sa.Integer(), nullable=False),
+        sa.Column('team_id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('judge1_marks', sa.Float(), nullable=True),
+        sa.Column('judge2_marks', sa.Float(), nullable=True),
+        sa.Column('judge3_marks', sa.Float(), nullable=True),
+        sa.Column('total_marks', sa.Float(), nullable=True),
+        sa.Column('rank', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['contest_id'], ['contests.id'], ),
+        sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+        sa.ForeignKeyConstraint(['event_id'], ['events.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('team_id', 'event_id', name='uq_team_results_team_event')
+    )
+    op.create_index(op.f('ix_team_results_id'), 'team_results', ['id'], unique=False)
+    op.create_index('ix_team_results_contest_event', 'team_results', ['contest_id', 'event_id', 'rank'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_team_results_contest_event', table_name='team_results')
+    op.drop_index(op.f('ix_team_results_id'), table_name='team_results')
+    op.drop_table('team_results')
+    op.drop_index('ix_team_event_event', table_name='team_event')
+    op.drop_table('team_event')
+    op.drop_index('ix_team_members_participant', table_name='team_members')
+    op.drop_table('team_members')
+    op.drop_index('ix_teams_contest_category', table_name='teams')
+    op.drop_index(op.f('ix_teams_id'), table_name='teams')
+    op.drop_table('teams')
+    op.drop_index('ix_participant_event_event', table_name='participant_event')
+    op.drop_index('ix_participant_event_participant', table_name='participant_event')
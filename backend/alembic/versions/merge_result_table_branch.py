@@ -0,0 +1,29 @@
+"""merge the stray results-table branch into the main chain
+
+add_results_table_rev was added as a second root next to
+initial_migration, so the tree had two heads and ``alembic upgrade head``
+refused to run. This revision joins them; both of that branch's revisions
+are no-ops on databases created by initial_migration.
+
+Revision ID: merge_result_table_branch
+Revises: scope_job_idempotency_keys, update_result_marks_columns_rev
+Create Date: 2024-12-29 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'merge_result_table_branch'
+down_revision = ('scope_job_idempotency_keys', 'update_result_marks_columns_rev')
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    pass
+
+
+def downgrade() -> None:
+    pass
@@ -0,0 +1,27 @@
+"""scope job idempotency keys to the contest
+
+Revision ID: scope_job_idempotency_keys
+Revises: add_category_tie_breaks
+Create Date: 2024-12-28 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'scope_job_idempotency_keys'
+down_revision = 'add_category_tie_breaks'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keys come from clients, so they are only unique within a contest
+    op.drop_constraint('jobs_idempotency_key_key', 'jobs', type_='unique')
+    op.create_unique_constraint('uq_jobs_contest_idempotency_key', 'jobs', ['contest_id', 'idempotency_key'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_jobs_contest_idempotency_key', 'jobs', type_='unique')
+    op.create_unique_constraint('jobs_idempotency_key_key', 'jobs', ['idempotency_key'])
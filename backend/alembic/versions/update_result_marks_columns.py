@@ -19,6 +19,10 @@ depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
+    # Already named judgeN_marks when the table came from initial_migration
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('results')}
+    if 'mark1' not in columns:
+        return
     # Rename columns
     op.alter_column('results', 'mark1', new_column_name='judge1_marks', existing_type=sa.Float())
     op.alter_column('results', 'mark2', new_column_name='judge2_marks', existing_type=sa.Float())
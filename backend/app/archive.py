@@ -0,0 +1,226 @@
+"""Cold storage for finished contests.
+
+``archive_contest`` copies a contest's categories, events, participants,
+registrations, results and result history into one file per table under
+``ARCHIVE_DIR/contest-<id>/`` (with the place names they use) and then
+deletes those rows from the live tables, so the hot tables and their indexes only hold contests still running.
+Files are Parquet when pyarrow is installed and gzipped JSON lines otherwise.
+Archived contests stay readable through ``read_table``.
+
+Usage: python -m app.archive CONTEST_ID
+       python -m app.archive --list
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+
+from sqlalchemy import DateTime, Float, Integer, delete, select
+
+from . import models, database, contests, eligibility, dictionaries
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+BATCH_SIZE = 5000
+MANIFEST_FILE = "manifest.json"
+
+
+def _contest_tables(contest_id):
+    """(name, table, where clause) for every table holding rows of the contest."""
+    event_ids = select(models.Event.id).where(models.Event.contest_id == contest_id)
+    participant_ids = select(models.Participant.id).where(models.Participant.contest_id == contest_id)
+    team_ids = select(models.Team.id).where(models.Team.contest_id == contest_id)
+    return [
+        ("categories", models.Category.__table__, models.Category.contest_id == contest_id),
+        ("events", models.Event.__table__, models.Event.contest_id == contest_id),
+        ("participants", models.Participant.__table__, models.Participant.contest_id == contest_id),
+        ("participant_event", models.participant_event,
+         models.participant_event.c.participant_id.in_(participant_ids)),
+        ("results", models.Result.__table__, models.Result.contest_id == contest_id),
+        ("published_results", models.PublishedResult.__table__, models.PublishedResult.contest_id == contest_id),
+        ("result_audit", models.ResultAudit.__table__, models.ResultAudit.event_id.in_(event_ids)),
+        ("teams", models.Team.__table__, models.Team.contest_id == contest_id),
+        ("team_members", models.team_members, models.team_members.c.team_id.in_(team_ids)),
+        ("team_event", models.team_event, models.team_event.c.team_id.in_(team_ids)),
+        ("team_results", models.TeamResult.__table__, models.TeamResult.contest_id == contest_id),
+    ]
+
+
+def _lookup_tables(contest_id):
+    """Place names the contest's participants refer to; copied, but shared with other contests so kept."""
+    return [
+        (model.__tablename__, model.__table__, model.id.in_(
+            select(getattr(models.Participant, f"{kind}_id")).where(models.Participant.contest_id == contest_id)
+        ))
+        for kind, model in dictionaries.KINDS.items()
+    ]
+
+
+def _contest_dir(contest_id):
+    return os.path.join(ARCHIVE_DIR, f"contest-{contest_id}")
+
+
+def _arrow_schema(table):
+    types = {Integer: pyarrow.int64(), Float: pyarrow.float64(), DateTime: pyarrow.timestamp("us")}
+    return pyarrow.schema([
+        (column.name, next((t for base, t in types.items() if isinstance(column.type, base)), pyarrow.string()))
+        for column in table.columns
+    ])
+
+
+def _write_table(db, out_dir, name, table, where):
+    """Stream the rows to a file in batches; returns (file name, row count)."""
+    rows = db.execute(select(table).where(where).execution_options(yield_per=BATCH_SIZE)).mappings()
+    count = 0
+    if pyarrow is not None:
+        file_name = f"{name}.parquet"
+        schema = _arrow_schema(table)
+        with pyarrow.parquet.ParquetWriter(os.path.join(out_dir, file_name), schema) as writer:
+            for batch in rows.partitions(BATCH_SIZE):
+                writer.write_table(pyarrow.Table.from_pylist([dict(row) for row in batch], schema=schema))
+                count += len(batch)
+    else:
+        file_name = f"{name}.jsonl.gz"
+        with gzip.open(os.path.join(out_dir, file_name), "wt", encoding="utf-8") as f:
+            for batch in rows.partitions(BATCH_SIZE):
+                for row in batch:
+                    f.write(json.dumps(dict(row), default=str) + "\n")
+                count += len(batch)
+    return file_name, count
+
+
+def archive_contest(db, contest_id):
+    """Move a contest's rows into archive files; returns the archive manifest."""
+    contest = db.query(models.Contest).filter(models.Contest.id == contest_id).first()
+    if contest is None:
+        raise ValueError(f"Contest {contest_id} not found")
+    if contest.archived_at is not None:
+        raise ValueError(f"Contest {contest_id} is already archived")
+
+    # Written next to the final directory and renamed, so a failed run leaves no partial archive
+    out_dir = _contest_dir(contest_id)
+    tmp_dir = f"{out_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    tables = _contest_tables(contest_id)
+    manifest = {
+        "contest": {"id": contest.id, "name": contest.name, "year": contest.year, "description": contest.description},
+        "archived_at": datetime.utcnow().isoformat(),
+        "format": "parquet" if pyarrow is not None else "jsonl.gz",
+        "tables": {},
+    }
+    for name, table, where in tables + _lookup_tables(contest_id):
+        file_name, count = _write_table(db, tmp_dir, name, table, where)
+        manifest["tables"][name] = {"file": file_name, "rows": count, "columns": [c.name for c in table.columns]}
+        logger.info(f"Archived {count} {name} row(s) of contest {contest_id}")
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+
+    # Children first; bulk deletes skip the audit and change-log hooks on purpose
+    for name, table, where in reversed(tables):
+        db.execute(delete(table).where(where))
+    db.execute(delete(models.ChangeLog).where(models.ChangeLog.contest_id == contest_id))
+    contest.archived_at = datetime.utcnow()
+    db.commit()
+    contests.forget(contest_id)
+    eligibility.forget(contest_id)
+    return manifest
+
+
+def get_manifest(contest_id):
+    path = os.path.join(_contest_dir(contest_id), MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_archives():
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    manifests = []
+    for entry in sorted(os.listdir(ARCHIVE_DIR)):
+        if entry.startswith("contest-") and not entry.endswith(".tmp"):
+            manifest = get_manifest(entry[len("contest-"):])
+            if manifest:
+                manifests.append(manifest)
+    return manifests
+
+
+def read_table(contest_id, name, filters=None, limit=100, offset=0):
+    """Rows of one archived table matching ``filters`` (column -> value), or None if not archived."""
+    manifest = get_manifest(contest_id)
+    if manifest is None or name not in manifest["tables"]:
+        return None
+    filters = {column: value for column, value in (filters or {}).items() if value is not None}
+    for column in filters:
+        if column not in manifest["tables"][name]["columns"]:
+            raise ValueError(f"Cannot filter {name} by {column}")
+    path = os.path.join(_contest_dir(contest_id), manifest["tables"][name]["file"])
+
+    if path.endswith(".parquet"):
+        if pyarrow is None:
+            raise RuntimeError("pyarrow is required to read this archive")
+        # Filters are pushed down to the row groups
+        table = pyarrow.parquet.read_table(path, filters=[(c, "=", v) for c, v in filters.items()] or None)
+        rows = table.slice(offset, limit + 1).to_pylist()
+    else:
+        rows = []
+        skipped = 0
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                if any(row.get(column) != value for column, value in filters.items()):
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                rows.append(row)
+                if len(rows) > limit:
+                    break
+
+    return {
+        "contest_id": manifest["contest"]["id"],
+        "table": name,
+        "rows": rows[:limit],
+        "has_more": len(rows) > limit,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move a finished contest into cold storage")
+    parser.add_argument("contest_id", type=int, nargs="?")
+    parser.add_argument("--list", action="store_true", help="list archived contests")
+    args = parser.parse_args()
+
+    if args.list or args.contest_id is None:
+        for manifest in list_archives():
+            counts = ", ".join(f"{name}: {table['rows']}" for name, table in manifest["tables"].items())
+            print(f"{manifest['contest']['id']} {manifest['contest']['name']} ({manifest['archived_at']}) {counts}")
+        return
+
+    database.init_engine()
+    db = database.SessionLocal()
+    try:
+        manifest = archive_contest(db, args.contest_id)
+    finally:
+        db.close()
+    print(f"Archived contest {args.contest_id} to {_contest_dir(args.contest_id)} ({manifest['format']})")
+
+
+if __name__ == "__main__":
+    main()
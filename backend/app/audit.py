@@ -0,0 +1,82 @@
+"""Append-only audit trail of result changes.
+
+An ``after_flush`` hook collects every inserted, updated or deleted ``Result``
+in the flush and writes them to ``result_audit`` with a single executemany
+INSERT on the same connection, so the history commits (or rolls back) together
+with the marks and a batch of results costs one extra statement.
+
+Bulk UPDATE and DELETE statements do not go through the flush, so their
+callers log the rows with ``record_bulk`` (one INSERT ... SELECT) instead.
+"""
+from datetime import datetime
+
+from sqlalchemy import String, event, insert, literal, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+AUDITED_FIELDS = ("judge1_marks", "judge2_marks", "judge3_marks", "total_marks", "rank")
+
+
+def _entry(result, action, changed_by, changed_at):
+    entry = {
+        "event_id": result.event_id,
+        "participant_id": result.participant_id,
+        "result_id": result.id,
+        "action": action,
+        "changed_by": changed_by,
+        "changed_at": changed_at,
+    }
+    for field in AUDITED_FIELDS:
+        entry[field] = getattr(result, field)
+    return entry
+
+
+@event.listens_for(Session, "after_flush")
+def record_result_changes(session, flush_context):
+    changed_by = session.info.get("actor")
+    changed_at = datetime.utcnow()
+    entries = []
+
+    for obj in session.new:
+        if isinstance(obj, models.Result):
+            entries.append(_entry(obj, "insert", changed_by, changed_at))
+    for obj in session.dirty:
+        if isinstance(obj, models.Result) and session.is_modified(obj, include_collections=False):
+            entries.append(_entry(obj, "update", changed_by, changed_at))
+    for obj in session.deleted:
+        if isinstance(obj, models.Result):
+            entries.append(_entry(obj, "delete", changed_by, changed_at))
+
+    if entries:
+        session.connection().execute(insert(models.ResultAudit.__table__), entries)
+
+
+def record_bulk(db, action, *criteria):
+    """Audit the results matching ``criteria`` as ``action``.
+
+    Call it after a bulk UPDATE, so the new values are logged, or before a
+    bulk DELETE, while the rows still exist.
+    """
+    columns = ["event_id", "participant_id", "result_id", "action", "changed_by", "changed_at", *AUDITED_FIELDS]
+    db.execute(insert(models.ResultAudit.__table__).from_select(columns, select(
+        models.Result.event_id,
+        models.Result.participant_id,
+        models.Result.id,
+        literal(action),
+        literal(db.info.get("actor"), String),
+        literal(datetime.utcnow()),
+        *[getattr(models.Result, field) for field in AUDITED_FIELDS],
+    ).where(*criteria)))
+
+
+def history(db, participant_id, event_id):
+    return (
+        db.query(models.ResultAudit)
+        .filter(
+            models.ResultAudit.participant_id == participant_id,
+            models.ResultAudit.event_id == event_id,
+        )
+        .order_by(models.ResultAudit.id)
+        .all()
+    )
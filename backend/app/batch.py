@@ -0,0 +1,81 @@
+"""Several reads in one request.
+
+Pages that need categories, events and participants at once can ask for
+them together with ``GET /batch?include=categories,events,participants``
+instead of making one round trip each. Read endpoints opt in with
+``@batch.read(name)``; the batch calls them in turn with one database
+session and the query parameters of the batch request. A parameter applies
+to every read that accepts it, and ``<name>.<param>`` to that read only.
+"""
+import inspect
+
+from fastapi import HTTPException
+from pydantic import TypeAdapter, ValidationError
+
+# name -> _Read
+READS = {}
+
+# Supplied by the batch endpoint rather than taken from the query string
+_PROVIDED = ("db", "contest_id")
+
+
+class _Read:
+    def __init__(self, func, response_model):
+        self.func = func
+        self.response = TypeAdapter(response_model) if response_model else None
+        signature = inspect.signature(func).parameters.values()
+        self.provided = [param.name for param in signature if param.name in _PROVIDED]
+        self.params = {
+            param.name: TypeAdapter(str if param.annotation is inspect.Parameter.empty else param.annotation)
+            for param in signature
+            if param.name not in _PROVIDED
+        }
+        self.required = [
+            param.name for param in signature
+            if param.name not in _PROVIDED and param.default is inspect.Parameter.empty
+        ]
+
+    def __call__(self, name, db, contest_id, query_params):
+        provided = {"db": db, "contest_id": contest_id}
+        kwargs = {param: provided[param] for param in self.provided}
+        for param, adapter in self.params.items():
+            value = query_params.get(f"{name}.{param}", query_params.get(param))
+            if value is not None:
+                kwargs[param] = adapter.validate_python(value)
+        missing = [param for param in self.required if param not in kwargs]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Missing parameter: {', '.join(missing)}")
+        value = self.func(**kwargs)
+        if self.response is not None:
+            value = self.response.dump_python(self.response.validate_python(value, from_attributes=True), mode="json")
+        return value
+
+
+def read(name, response_model=None):
+    """Make a read endpoint available to /batch under ``name``."""
+    def register(func):
+        READS[name] = _Read(func, response_model)
+        return func
+    return register
+
+
+def run(db, contest_id, names, query_params):
+    """Run the named reads; a failing read is reported under "errors" without failing the others."""
+    unknown = [name for name in names if name not in READS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown read: {', '.join(unknown)}")
+
+    payload = {}
+    errors = {}
+    for name in names:
+        try:
+            payload[name] = READS[name](name, db, contest_id, query_params)
+        except ValidationError as e:
+            errors[name] = {"status_code": 400, "detail": str(e)}
+        except HTTPException as e:
+            # Leave the session usable for the remaining reads
+            db.rollback()
+            errors[name] = {"status_code": e.status_code, "detail": e.detail}
+    if errors:
+        payload["errors"] = errors
+    return payload
@@ -0,0 +1,281 @@
+"""Batch certificate and prize-list generation.
+
+Ranked results are streamed from the database in chunks, rendered to PDF in a
+process pool and written one file per certificate under the job directory, so
+an interrupted job resumes by skipping certificates already on disk. When the
+run finishes the certificates are packed into ``certificates.zip`` next to a
+``prize_list.pdf`` of the top three in every event.
+"""
+import json
+import logging
+import os
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from . import models, database
+
+logger = logging.getLogger(__name__)
+
+CERTIFICATE_DIR = os.getenv("CERTIFICATE_DIR", "certificates")
+CERTIFICATE_WORKERS = int(os.getenv("CERTIFICATE_WORKERS", str(os.cpu_count() or 2)))
+BATCH_SIZE = 500
+PRIZE_RANKS = 3
+
+# job_id -> thread, for jobs running in this process
+_running = {}
+_running_lock = threading.Lock()
+
+
+def _pdf_text(value):
+    text = "" if value is None else str(value)
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def render_pdf(pages, width=595, height=842):
+    """Render a minimal PDF; each page is a list of (x, y, font_size, text) lines."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold >>",
+    ]
+    page_refs = []
+    for lines in pages:
+        stream = "\n".join(
+            f"BT /F{2 if bold else 1} {size} Tf {x} {y} Td ({_pdf_text(text)}) Tj ET"
+            for x, y, size, text, bold in (
+                line if len(line) == 5 else (*line, False) for line in lines
+            )
+        ).encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] "
+             f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {content_ref} 0 R >>").encode()
+        )
+        page_refs.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(page_refs)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def _ordinal(rank):
+    if 10 <= rank % 100 <= 20:
+        return f"{rank}th"
+    return f"{rank}{ {1: 'st', 2: 'nd', 3: 'rd'}.get(rank % 10, 'th') }"
+
+
+def render_certificate(row):
+    lines = [
+        (250, 480, 32, "Certificate of Merit", True),
+        (120, 410, 14, "This is to certify that"),
+        (120, 370, 24, row["participant_name"], True),
+        (120, 340, 12, f"Chest No. {row['chest_number']}  -  {row['church'] or ''}"),
+        (120, 290, 14, f"secured {_ordinal(row['rank'])} place in {row['event_name']}"),
+        (120, 265, 14, f"({row['category_name']} category) with {row['total_marks']} marks."),
+    ]
+    # A4 landscape
+    return render_pdf([lines], width=842, height=595)
+
+
+def _render_batch(out_dir, rows):
+    """Process pool worker: render and write a batch of certificates."""
+    written = 0
+    for row in rows:
+        path = os.path.join(out_dir, f"{row['result_id']}.pdf")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(render_certificate(row))
+        os.replace(tmp_path, path)
+        written += 1
+    return written
+
+
+def render_prize_list(winners):
+    pages, lines, y = [], [(50, 790, 20, "Prize List", True)], 750
+    for event_name, category_name, rows in winners:
+        if y < 120:
+            pages.append(lines)
+            lines, y = [], 790
+        lines.append((50, y, 13, f"{event_name} ({category_name})", True))
+        y -= 20
+        for row in rows:
+            lines.append((70, y, 11, f"{_ordinal(row['rank'])}  {row['participant_name']}  "
+                                     f"(Chest No. {row['chest_number']})  {row['total_marks']}"))
+            y -= 16
+        y -= 10
+    pages.append(lines)
+    return render_pdf(pages)
+
+
+def _job_dir(job_id):
+    return os.path.join(CERTIFICATE_DIR, job_id)
+
+
+def _save_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def get_job(job_id):
+    """Return the job's parameters merged with its latest progress, or None."""
+    job_dir = _job_dir(job_id)
+    try:
+        with open(os.path.join(job_dir, "job.json"), encoding="utf-8") as f:
+            job = json.load(f)
+    except (OSError, ValueError):
+        return None
+    try:
+        with open(os.path.join(job_dir, "progress.json"), encoding="utf-8") as f:
+            job.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    with _running_lock:
+        thread = _running.get(job_id)
+    if job.get("status") == "running" and thread is None:
+        # The process running it went away; posting the job again resumes it
+        job["status"] = "interrupted"
+    return job
+
+
+def _ranked_rows(db, params):
+    query = (
+        db.query(
+            models.Result.id,
+            models.Result.rank,
+            models.Result.total_marks,
+            models.Result.event_id,
+            models.Participant.name.label("participant_name"),
+            models.Participant.chest_number,
+            models.Church.name.label("church"),
+            models.Event.name.label("event_name"),
+            models.Category.name.label("category_name"),
+        )
+        .join(models.Participant, models.Result.participant_id == models.Participant.id)
+        .outerjoin(models.Church, models.Participant.church_id == models.Church.id)
+        .join(models.Event, models.Result.event_id == models.Event.id)
+        .join(models.Category, models.Event.category_id == models.Category.id)
+        .filter(
+            models.Result.contest_id == params.get("contest_id", models.DEFAULT_CONTEST_ID),
+            models.Result.rank.isnot(None),
+        )
+        .order_by(models.Result.event_id, models.Result.rank, models.Result.id)
+    )
+    if params.get("max_rank"):
+        query = query.filter(models.Result.rank <= params["max_rank"])
+    if params.get("event_id"):
+        query = query.filter(models.Result.event_id == params["event_id"])
+    if params.get("category_id"):
+        query = query.filter(models.Event.category_id == params["category_id"])
+    return query.yield_per(BATCH_SIZE)
+
+
+def run_job(job_id):
+    job = get_job(job_id)
+    job_dir = _job_dir(job_id)
+    pdf_dir = os.path.join(job_dir, "pdf")
+    os.makedirs(pdf_dir, exist_ok=True)
+    progress_path = os.path.join(job_dir, "progress.json")
+
+    existing = {name[:-4] for name in os.listdir(pdf_dir) if name.endswith(".pdf")}
+    progress = {"status": "running", "total": 0, "done": len(existing), "error": None}
+    _save_json(progress_path, progress)
+
+    db = database.SessionLocal()
+    winners = {}
+    try:
+        with ProcessPoolExecutor(max_workers=CERTIFICATE_WORKERS) as pool:
+            pending = set()
+            batch = []
+
+            def drain(limit):
+                nonlocal pending
+                while len(pending) > limit:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        progress["done"] += future.result()
+                    _save_json(progress_path, progress)
+
+            for row in _ranked_rows(db, job):
+                progress["total"] += 1
+                data = {
+                    "result_id": row.id,
+                    "rank": row.rank,
+                    "total_marks": row.total_marks,
+                    "participant_name": row.participant_name,
+                    "chest_number": row.chest_number,
+                    "church": row.church,
+                    "event_name": row.event_name,
+                    "category_name": row.category_name,
+                }
+                if row.rank <= PRIZE_RANKS:
+                    winners.setdefault(row.event_id, (row.event_name, row.category_name, []))[2].append(data)
+                if str(row.id) in existing:
+                    continue
+                batch.append(data)
+                if len(batch) >= BATCH_SIZE:
+                    pending.add(pool.submit(_render_batch, pdf_dir, batch))
+                    batch = []
+                    # Keep a bounded number of batches in flight so memory stays flat
+                    drain(CERTIFICATE_WORKERS * 2)
+            if batch:
+                pending.add(pool.submit(_render_batch, pdf_dir, batch))
+            drain(0)
+
+        with open(os.path.join(job_dir, "prize_list.pdf"), "wb") as f:
+            f.write(render_prize_list(winners.values()))
+
+        zip_path = os.path.join(job_dir, "certificates.zip")
+        with zipfile.ZipFile(f"{zip_path}.tmp", "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.write(os.path.join(job_dir, "prize_list.pdf"), "prize_list.pdf")
+            for name in sorted(os.listdir(pdf_dir)):
+                if name.endswith(".pdf"):
+                    archive.write(os.path.join(pdf_dir, name), f"certificates/{name}")
+        os.replace(f"{zip_path}.tmp", zip_path)
+
+        progress["status"] = "completed"
+    except Exception as e:
+        logger.error(f"Certificate job {job_id} failed: {str(e)}", exc_info=True)
+        progress["status"] = "failed"
+        progress["error"] = str(e)
+    finally:
+        db.close()
+        _save_json(progress_path, progress)
+        with _running_lock:
+            _running.pop(job_id, None)
+
+
+def start_job(params, job_id=None):
+    """Start a new job, or resume ``job_id`` from where it stopped."""
+    if job_id is None:
+        job_id = uuid.uuid4().hex[:12]
+        os.makedirs(_job_dir(job_id), exist_ok=True)
+        _save_json(os.path.join(_job_dir(job_id), "job.json"), {"id": job_id, **params})
+    elif get_job(job_id) is None:
+        return None
+
+    with _running_lock:
+        if job_id not in _running:
+            _save_json(os.path.join(_job_dir(job_id), "progress.json"), {"status": "queued", "error": None})
+            thread = threading.Thread(target=run_job, args=(job_id,), daemon=True)
+            _running[job_id] = thread
+            thread.start()
+    return job_id
+
+
+def zip_path(job_id):
+    return os.path.join(_job_dir(job_id), "certificates.zip")
@@ -0,0 +1,391 @@
+"""Change data capture for incremental consumers.
+
+An ``after_flush`` hook appends one ``change_log`` row per changed category,
+event, participant, result or ``participant_event`` membership, batched into a
+single INSERT per flush and committed with the change itself. The
+autoincrementing ``seq`` is a monotonic cursor: the sync API, the ``/changes``
+feed and other consumers ask for "everything after N" instead of rescanning
+tables. On Postgres every committing transaction also sends a
+``NOTIFY judgify_changes`` so long-polling readers wake up immediately; one
+listener thread per process holds the only LISTEN connection for all of them.
+
+On Postgres ``seq`` values are handed out before commit, so a transaction
+can commit after another one with a higher ``seq``. Readers therefore only
+see entries up to ``current_version``, a commit-safe watermark: the highest
+``seq`` written before the oldest transaction still writing began (entries
+are stamped with the database clock). Anything at or below it is committed
+for good, so a cursor that moved past it never skips a late commit. SQLite
+has one writer at a time and commits in ``seq`` order, so there the
+watermark is simply the latest entry.
+
+``compact`` drops entries superseded by a later change to the same row, which
+keeps the log proportional to the number of live rows rather than the number
+of writes.
+"""
+import logging
+import select as selectors
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import DateTime, create_engine, delete, event, func, insert, literal, select, text
+from sqlalchemy.orm import Session, attributes
+from sqlalchemy.pool import NullPool
+
+from . import models, database
+
+logger = logging.getLogger(__name__)
+
+TRACKED_MODELS = {
+    models.Category: "categories",
+    models.Event: "events",
+    models.Participant: "participants",
+    models.Result: "results",
+    models.Team: "teams",
+    models.TeamResult: "team_results",
+}
+
+NOTIFY_CHANNEL = "judgify_changes"
+
+
+# Oldest transaction of another session that has written something, and how
+# far the primary's WAL has got (replicas must have replayed up to it)
+_WRITERS_QUERY = text("""
+    SELECT min(timezone('utc', xact_start)), pg_current_wal_lsn()
+    FROM pg_stat_activity
+    WHERE datname = current_database() AND backend_xid IS NOT NULL AND pid <> pg_backend_pid()
+""")
+
+
+def _clock(dialect_name):
+    """Timestamp for new entries; the database clock on Postgres, as the watermark compares against it."""
+    if dialect_name == "postgresql":
+        return func.timezone("utc", func.clock_timestamp())
+    return literal(datetime.utcnow(), DateTime)
+
+
+def _contest_id(obj):
+    # Read without loading, a deleted row can no longer be refreshed
+    return obj.__dict__.get("contest_id")
+
+
+def _membership_changes(session, memberships):
+    """Collect participant_event rows added or removed in this flush.
+
+    Histories are read without loading anything, since SQL must not be emitted
+    for lazy loads while the flush is finishing.
+    """
+    passive = attributes.PASSIVE_NO_INITIALIZE
+    for objects, op_for_all in (
+        (session.new, None),
+        (session.dirty, None),
+        (session.deleted, "delete"),
+    ):
+        for obj in objects:
+            if isinstance(obj, models.Participant):
+                history = attributes.get_history(obj, "events", passive)
+                pair = lambda other: (obj.id, other.id)
+            elif isinstance(obj, models.Event):
+                history = attributes.get_history(obj, "participants", passive)
+                pair = lambda other: (other.id, obj.id)
+            else:
+                continue
+
+            contest_id = _contest_id(obj)
+            if op_for_all:
+                # Association rows go away with the deleted participant/event
+                for other in history.sum():
+                    memberships[pair(other)] = (op_for_all, contest_id)
+                continue
+            for other in history.added:
+                memberships[pair(other)] = ("upsert", contest_id)
+            for other in history.deleted:
+                memberships[pair(other)] = ("delete", contest_id)
+
+
+@event.listens_for(Session, "after_flush")
+def record_changes(session, flush_context):
+    # (table, row id, related id) -> (op, contest); a row touched twice in one flush is logged once
+    changes = {}
+
+    for obj in session.new:
+        table_name = TRACKED_MODELS.get(type(obj))
+        if table_name:
+            changes[(table_name, obj.id, None)] = ("upsert", _contest_id(obj))
+    for obj in session.dirty:
+        table_name = TRACKED_MODELS.get(type(obj))
+        if table_name and session.is_modified(obj):
+            changes[(table_name, obj.id, None)] = ("upsert", _contest_id(obj))
+    for obj in session.deleted:
+        table_name = TRACKED_MODELS.get(type(obj))
+        if table_name:
+            changes[(table_name, obj.id, None)] = ("delete", _contest_id(obj))
+
+    memberships = {}
+    _membership_changes(session, memberships)
+    for (participant_id, event_id), change in memberships.items():
+        changes[("participant_event", participant_id, event_id)] = change
+
+    if changes:
+        connection = session.connection()
+        statement = insert(models.ChangeLog.__table__).values(changed_at=_clock(connection.dialect.name))
+        connection.execute(statement, [
+            {
+                "contest_id": contest_id,
+                "table_name": table_name,
+                "row_id": row_id,
+                "related_id": related_id,
+                "op": op,
+            }
+            for (table_name, row_id, related_id), (op, contest_id) in changes.items()
+        ])
+        if connection.dialect.name == "postgresql":
+            # Delivered on commit; duplicates within a transaction are folded
+            connection.execute(text(f"NOTIFY {NOTIFY_CHANNEL}"))
+
+
+def record_memberships(db, pairs, contest_id):
+    """Log participant_event rows that a bulk INSERT ... SELECT is about to add.
+
+    ``pairs`` selects (participant_id, event_id); statements like that bypass
+    the flush hook, so callers log them first, in the same transaction.
+    """
+    pairs = pairs.subquery()
+    db.execute(insert(models.ChangeLog.__table__).from_select(
+        ["contest_id", "table_name", "row_id", "related_id", "op", "changed_at"],
+        select(
+            literal(contest_id),
+            literal("participant_event"),
+            pairs.c.participant_id,
+            pairs.c.event_id,
+            literal("upsert"),
+            _clock(db.get_bind().dialect.name),
+        ),
+    ))
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"NOTIFY {NOTIFY_CHANNEL}"))
+
+
+def record_rows(db, table_name, rows):
+    """Log ``rows`` ((row id, contest id) pairs) of ``table_name`` changed by a bulk UPDATE."""
+    statement = insert(models.ChangeLog.__table__).values(changed_at=_clock(db.get_bind().dialect.name))
+    db.execute(statement, [
+        {
+            "contest_id": contest_id,
+            "table_name": table_name,
+            "row_id": row_id,
+            "related_id": None,
+            "op": "upsert",
+        }
+        for row_id, contest_id in rows
+    ])
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"NOTIFY {NOTIFY_CHANNEL}"))
+
+
+def _in_flight_since(db):
+    """UTC start of the oldest other transaction still writing, or None if there is none.
+
+    Always asked of the primary. A session reading from a replica that has
+    not yet replayed everything the primary had committed is moved to the
+    primary, since a late commit could still be missing there.
+    """
+    if database.engine.dialect.name != "postgresql":
+        return None
+    oldest, lsn = db.connection(bind_arguments={"bind": database.engine}).execute(_WRITERS_QUERY).one()
+    if db.get_bind() is not database.engine:
+        caught_up = db.execute(text("SELECT pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)"), {"lsn": lsn}).scalar()
+        if not caught_up:
+            db.info["replica"] = None
+    return oldest
+
+
+def _version_before(db, oldest):
+    query = db.query(func.coalesce(func.max(models.ChangeLog.seq), 0))
+    if oldest is not None:
+        query = query.filter(models.ChangeLog.changed_at < oldest)
+    return query.scalar()
+
+
+def current_version(db):
+    """Commit-safe watermark: every entry with ``seq`` up to it is committed."""
+    return _version_before(db, _in_flight_since(db))
+
+
+def latest_version(db):
+    """A value that changes with every commit, for keying caches of derived data.
+
+    The watermark stands still while any transaction is writing, and
+    ``max(seq)`` alone misses a commit that lands after one with a higher
+    ``seq``, so above the watermark the committed entries are counted too.
+    """
+    oldest = _in_flight_since(db)
+    if oldest is None:
+        return _version_before(db, None)
+    watermark = _version_before(db, oldest)
+    latest, committed = (
+        db.query(func.max(models.ChangeLog.seq), func.count())
+        .filter(models.ChangeLog.seq > watermark)
+        .one()
+    )
+    return watermark, latest, committed
+
+
+def changes_since(db, since, contest_id=None, until=None):
+    """Return {table: {row_id: (latest seq, latest op)}} for changes after ``since``.
+
+    ``participant_event`` entries are keyed by participant id, the participant
+    whose events changed.
+    """
+    latest = {}
+    rows = (
+        db.query(models.ChangeLog.table_name, models.ChangeLog.row_id, models.ChangeLog.seq, models.ChangeLog.op)
+        .filter(
+            models.ChangeLog.seq > since,
+            models.ChangeLog.seq <= (current_version(db) if until is None else until),
+            models.ChangeLog.table_name.in_([*TRACKED_MODELS.values(), "participant_event"]),
+        )
+        .order_by(models.ChangeLog.seq)
+    )
+    if contest_id is not None:
+        rows = rows.filter(models.ChangeLog.contest_id == contest_id)
+    for row in rows:
+        latest.setdefault(row.table_name, {})[row.row_id] = (row.seq, row.op)
+    return latest
+
+
+def row_versions(db, table_name, row_ids):
+    """Latest change seq of each row, for optimistic conflict checks."""
+    if not row_ids:
+        return {}
+    return dict(
+        db.query(models.ChangeLog.row_id, func.max(models.ChangeLog.seq))
+        .filter(models.ChangeLog.table_name == table_name, models.ChangeLog.row_id.in_(row_ids))
+        .group_by(models.ChangeLog.row_id)
+        .all()
+    )
+
+
+def feed(db, after, limit=500, tables=None, contest_id=None):
+    """One page of the change feed after cursor ``after``, up to the commit-safe watermark."""
+    query = db.query(models.ChangeLog).filter(
+        models.ChangeLog.seq > after,
+        models.ChangeLog.seq <= current_version(db),
+    )
+    if contest_id is not None:
+        query = query.filter(models.ChangeLog.contest_id == contest_id)
+    if tables:
+        query = query.filter(models.ChangeLog.table_name.in_(tables))
+    rows = query.order_by(models.ChangeLog.seq).limit(limit).all()
+    return {
+        "cursor": rows[-1].seq if rows else after,
+        "has_more": len(rows) == limit,
+        "changes": [
+            {
+                "seq": row.seq,
+                "contest_id": row.contest_id,
+                "table": row.table_name,
+                "row_id": row.row_id,
+                "related_id": row.related_id,
+                "op": row.op,
+                "changed_at": row.changed_at,
+            }
+            for row in rows
+        ],
+    }
+
+
+# Every long-poll of this process waits on one LISTEN connection, held by a
+# background thread, rather than on a pooled connection of its own
+_notified = threading.Condition()
+_notifications = 0
+_listener = None
+# Waiters also re-check this often, as the watermark can move without a NOTIFY
+# (e.g. when an older transaction that wrote no log entries finishes)
+RECHECK_INTERVAL = 1.0
+
+
+def _listen(url):
+    """Listener thread: count NOTIFYs until the app's engine goes away."""
+    global _notifications, _listener
+    listen_engine = create_engine(url, poolclass=NullPool)
+    try:
+        while database.engine is not None:
+            try:
+                connection = listen_engine.raw_connection()
+            except Exception as e:
+                logger.warning(f"Change listener cannot connect: {str(e)}")
+                time.sleep(RECHECK_INTERVAL)
+                continue
+            dbapi_connection = connection.driver_connection
+            dbapi_connection.autocommit = True
+            try:
+                dbapi_connection.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+                while database.engine is not None:
+                    if selectors.select([dbapi_connection], [], [], RECHECK_INTERVAL) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    if dbapi_connection.notifies:
+                        dbapi_connection.notifies.clear()
+                        with _notified:
+                            _notifications += 1
+                            _notified.notify_all()
+            except Exception as e:
+                logger.warning(f"Change listener lost its connection: {str(e)}")
+            finally:
+                connection.close()
+    finally:
+        with _notified:
+            _listener = None
+        listen_engine.dispose()
+
+
+def _start_listener():
+    global _listener
+    with _notified:
+        if _listener is None:
+            _listener = threading.Thread(
+                target=_listen, args=(database.engine.url,), name="change-listener", daemon=True
+            )
+            _listener.start()
+
+
+def wait_for_changes(db, after, timeout):
+    """Block until the commit-safe watermark passes ``after`` or ``timeout`` seconds pass.
+
+    The session's connection goes back to the pool while waiting, so idle
+    long-polls do not hold connections other requests need.
+    """
+    deadline = time.monotonic() + timeout
+    postgres = database.engine.dialect.name == "postgresql"
+    if postgres:
+        _start_listener()
+    while True:
+        with _notified:
+            # Read before checking, so a commit in between still wakes us
+            seen = _notifications
+        if current_version(db) > after:
+            return
+        db.rollback()  # end the read transaction so the next check sees new commits
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if postgres:
+            with _notified:
+                _notified.wait_for(lambda: _notifications != seen, min(remaining, RECHECK_INTERVAL))
+        else:
+            time.sleep(min(remaining, 0.5))
+
+
+def compact(db, up_to=None):
+    """Delete log entries superseded by a later change to the same row."""
+    latest = (
+        select(func.max(models.ChangeLog.seq))
+        .group_by(models.ChangeLog.table_name, models.ChangeLog.row_id, models.ChangeLog.related_id)
+    )
+    statement = delete(models.ChangeLog).where(models.ChangeLog.seq.not_in(latest))
+    if up_to is not None:
+        statement = statement.where(models.ChangeLog.seq <= up_to)
+    removed = db.execute(statement, execution_options={"synchronize_session": False}).rowcount
+    db.commit()
+    return removed
@@ -0,0 +1,51 @@
+"""Contest (tenant) resolution.
+
+One deployment can host several festivals. Clients choose one with an
+``X-Contest-Id`` header or a ``contest_id`` query parameter and every query in
+the API is filtered by it; clients that do not choose get
+``models.DEFAULT_CONTEST_ID``. Archived contests are only readable through the
+archive endpoints.
+"""
+import time
+
+from sqlalchemy import text
+
+from . import models
+
+# contest id -> monotonic time it was last seen live, so resolving usually costs no query.
+# Entries expire so other processes notice a contest archived elsewhere.
+_known = {}
+KNOWN_TTL = 60
+
+
+def resolve(db, contest_id=None):
+    """Return the contest id to use, or None when that contest does not exist."""
+    contest_id = contest_id or models.DEFAULT_CONTEST_ID
+    if time.monotonic() - _known.get(contest_id, float("-inf")) > KNOWN_TTL:
+        contest = db.query(models.Contest.id).filter(
+            models.Contest.id == contest_id,
+            models.Contest.archived_at.is_(None)
+        ).first()
+        if contest is None:
+            return None
+        _known[contest_id] = time.monotonic()
+    return contest_id
+
+
+def forget(contest_id):
+    _known.pop(contest_id, None)
+
+
+def ensure_partition(db, contest_id):
+    """Give a contest its own results partition if results is partitioned (Postgres)."""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    partitioned = db.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'results'::regclass"
+    )).first()
+    if partitioned:
+        contest_id = int(contest_id)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS results_contest_{contest_id} "
+            f"PARTITION OF results FOR VALUES IN ({contest_id})"
+        ))
@@ -0,0 +1,122 @@
+from sqlalchemy import func, text
+from sqlalchemy.orm import joinedload
+import logging
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+
+def compute_stats(db, contest_id=models.DEFAULT_CONTEST_ID):
+    logger.info("Starting to fetch dashboard stats")
+    
+    # Get total counts
+    total_categories = db.query(models.Category).filter(models.Category.contest_id == contest_id).count()
+    logger.info(f"Total categories: {total_categories}")
+    
+    total_events = db.query(models.Event).filter(models.Event.contest_id == contest_id).count()
+    logger.info(f"Total events: {total_events}")
+    
+    total_participants = db.query(models.Participant).filter(models.Participant.contest_id == contest_id).count()
+    logger.info(f"Total participants: {total_participants}")
+    
+    # Get completed events (events with results)
+    try:
+        completed_events = (
+            db.query(models.Result.event_id.distinct())
+            .filter(models.Result.contest_id == contest_id)
+            .count()
+        )
+    except Exception as e:
+        logger.error(f"Error getting completed events: {str(e)}")
+        completed_events = 0
+    logger.info(f"Completed events: {completed_events}")
+    
+    # Get recent participants (last 5)
+    try:
+        recent_participants = (
+            db.query(models.Participant)
+            .options(joinedload(models.Participant.category))
+            .options(joinedload(models.Participant.events))
+            .filter(models.Participant.contest_id == contest_id)
+            .order_by(models.Participant.id.desc())
+            .limit(5)
+            .all()
+        )
+    except Exception as e:
+        logger.error(f"Error getting recent participants: {str(e)}")
+        recent_participants = []
+        
+    # Get category stats
+    try:
+        category_stats = (
+            db.query(
+                models.Category.name.label('category'),
+                func.count(models.Participant.id).label('participant_count')
+            )
+            .outerjoin(models.Participant)
+            .filter(models.Category.contest_id == contest_id)
+            .group_by(models.Category.name)
+            .all()
+        )
+    except Exception as e:
+        logger.error(f"Error getting category stats: {str(e)}")
+        category_stats = []
+        
+    # Get popular events
+    try:
+        popular_events = (
+            db.query(
+                models.Event.name,
+                func.count(models.participant_event.c.participant_id).label('participant_count')
+            )
+            .outerjoin(models.participant_event)
+            .filter(models.Event.contest_id == contest_id)
+            .group_by(models.Event.id, models.Event.name)
+            .order_by(text('participant_count DESC'))
+            .limit(6)
+            .all()
+        )
+    except Exception as e:
+        logger.error(f"Error getting popular events: {str(e)}")
+        popular_events = []
+    
+    # Format recent participants data
+    recent_participants_data = []
+    for participant in recent_participants:
+        try:
+            events = [event.name for event in participant.events]
+            recent_participants_data.append({
+                "id": participant.id,
+                "name": participant.name,
+                "chest_number": participant.chest_number,
+                "category": participant.category.name if participant.category else "No Category",
+                "events": events
+            })
+        except Exception as e:
+            logger.error(f"Error formatting participant {participant.id}: {str(e)}")
+    
+    # Format category stats
+    category_stats_data = [
+        {"category": stat.category, "participant_count": stat.participant_count}
+        for stat in category_stats
+    ]
+    
+    # Format popular events
+    popular_events_data = [
+        {"name": event.name, "participant_count": event.participant_count}
+        for event in popular_events
+    ]
+    
+    response_data = {
+        "total_categories": total_categories,
+        "total_events": total_events,
+        "total_participants": total_participants,
+        "completed_events": completed_events,
+        "recent_participants": recent_participants_data,
+        "category_stats": category_stats_data,
+        "popular_events": popular_events_data
+    }
+    
+    logger.info("Successfully compiled dashboard stats")
+    return response_data
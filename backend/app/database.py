@@ -1,18 +1,139 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+import itertools
+import logging
 import os
+import time
 from dotenv import load_dotenv
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+# Settings are read by init_engine() so importing this module stays cheap
+SQLALCHEMY_DATABASE_URL = None
+# Comma separated read replica URLs; GET requests are spread across them
+SQLALCHEMY_REPLICA_URLS = []
+# Replicas further behind the primary than this many seconds are skipped
+REPLICA_MAX_LAG = 5.0
+# How often (seconds) replica lag is re-measured
+REPLICA_LAG_CHECK_INTERVAL = 2.0
+# After a write, the same client keeps reading from the primary for this long
+READ_YOUR_WRITES_WINDOW = 10.0
+READ_YOUR_WRITES_COOKIE = "judgify_primary_until"
+READ_PRIMARY_HEADER = "x-read-primary"
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = None
+replica_engines = []
+
+
+def get_database_url():
+    load_dotenv()
+    return os.getenv("DATABASE_URL")
+
+
+def init_engine():
+    """Create the engines from the environment; called once from the app lifespan or a CLI."""
+    global SQLALCHEMY_DATABASE_URL, SQLALCHEMY_REPLICA_URLS, REPLICA_MAX_LAG, \
+        REPLICA_LAG_CHECK_INTERVAL, READ_YOUR_WRITES_WINDOW, engine, replica_engines
+    if engine is not None:
+        return engine
+
+    SQLALCHEMY_DATABASE_URL = get_database_url()
+    SQLALCHEMY_REPLICA_URLS = [
+        url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    REPLICA_MAX_LAG = float(os.getenv("DATABASE_REPLICA_MAX_LAG", "5"))
+    REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("DATABASE_REPLICA_LAG_CHECK_INTERVAL", "2"))
+    READ_YOUR_WRITES_WINDOW = float(os.getenv("DATABASE_READ_YOUR_WRITES_WINDOW", "10"))
+
+    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    replica_engines = [create_engine(url) for url in SQLALCHEMY_REPLICA_URLS]
+    SessionLocal.configure(bind=engine)
+    return engine
+
+
+def dispose_engines():
+    global engine, replica_engines
+    for e in [engine, *replica_engines]:
+        if e is not None:
+            e.dispose()
+    engine = None
+    replica_engines = []
+    _replica_lag.clear()
+
+
+class RoutingSession(Session):
+    """Session that reads from the replica assigned in ``info["replica"]``.
+
+    Flushes (and sessions without a replica) always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is not None and not self._flushing:
+            return replica
+        return engine
+
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
+# replica engine -> (monotonic time checked, lag in seconds or None if unreachable)
+_replica_lag = {}
+_replica_turn = itertools.count()
+
+_PG_LAG_QUERY = text("""
+    SELECT COALESCE(
+        CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+             ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+        END, 0)
+""")
+
+
+def replica_lag(replica):
+    checked_at, lag = _replica_lag.get(replica, (None, None))
+    now = time.monotonic()
+    if checked_at is not None and now - checked_at < REPLICA_LAG_CHECK_INTERVAL:
+        return lag
+
+    try:
+        with replica.connect() as connection:
+            if replica.dialect.name == "postgresql":
+                lag = float(connection.execute(_PG_LAG_QUERY).scalar())
+            else:
+                # Stand-in replicas (e.g. a second SQLite file) have no replication lag
+                connection.execute(text("SELECT 1"))
+                lag = 0.0
+    except Exception as e:
+        logger.warning(f"Replica {replica.url!r} unavailable: {str(e)}")
+        lag = None
+
+    _replica_lag[replica] = (now, lag)
+    return lag
+
+
+def pick_replica():
+    """Return a healthy replica engine, or None to fall back to the primary."""
+    healthy = [
+        replica for replica in replica_engines
+        if (lag := replica_lag(replica)) is not None and lag <= REPLICA_MAX_LAG
+    ]
+    if not healthy:
+        return None
+    return healthy[next(_replica_turn) % len(healthy)]
+
+
+def wants_primary(headers, cookies):
+    """True when a read must see the client's own recent writes."""
+    if headers.get(READ_PRIMARY_HEADER):
+        return True
+    try:
+        return float(cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
 def get_db():
     db = SessionLocal()
     try:
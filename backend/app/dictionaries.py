@@ -0,0 +1,114 @@
+"""Dictionary encoding of participants' places.
+
+State, region, district and church names are stored once in lookup tables
+and participants refer to them by id, so rows and indexes stay small and
+rollups group on integers. Names are matched on a folded key, so "St. Mary's"
+and "st marys " land on the same row.
+
+``Participant.church`` etc. still read and write plain strings; a
+``before_flush`` hook turns the names assigned since the last flush into ids
+with one lookup per table for the whole flush, adding names not seen before.
+"""
+import re
+
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+
+# participant attribute -> lookup table
+KINDS = {
+    "state": models.State,
+    "region": models.Region,
+    "district": models.District,
+    "church": models.Church,
+}
+
+
+def name_key(name):
+    """Fold case, punctuation and spacing; None for blank names."""
+    folded = re.sub(r"[^\w\s]", "", name or "").casefold()
+    return " ".join(folded.split()) or None
+
+
+def _insert_missing(session, model, rows):
+    connection = session.connection()
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        statement = postgresql.insert(model.__table__).on_conflict_do_nothing(index_elements=["key"])
+    elif dialect == "sqlite":
+        statement = sqlite.insert(model.__table__).on_conflict_do_nothing(index_elements=["key"])
+    else:
+        statement = insert(model.__table__)
+    # Concurrent registrations may add the same name; the loser's insert is skipped
+    connection.execute(statement, rows)
+
+
+def lookup(session, model, names):
+    """Entries for ``names`` by key, adding the ones that do not exist yet."""
+    names_by_key = {}
+    for name in names:
+        key = name_key(name)
+        if key is not None:
+            names_by_key.setdefault(key, " ".join(name.split()))
+    if not names_by_key:
+        return {}
+    with session.no_autoflush:
+        entries = {e.key: e for e in session.query(model).filter(model.key.in_(list(names_by_key)))}
+        missing = [{"name": name, "key": key} for key, name in names_by_key.items() if key not in entries]
+        if missing:
+            _insert_missing(session, model, missing)
+            entries.update(
+                (e.key, e) for e in
+                session.query(model).filter(model.key.in_([row["key"] for row in missing]))
+            )
+    return entries
+
+
+@event.listens_for(Session, "before_flush")
+def encode_names(session, flush_context, instances):
+    pending = [
+        obj for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, models.Participant) and obj.__dict__.get("_pending_names")
+    ]
+    if not pending:
+        return
+    for kind, model in KINDS.items():
+        assigned = [obj for obj in pending if kind in obj.__dict__["_pending_names"]]
+        if not assigned:
+            continue
+        entries = lookup(session, model, [obj.__dict__["_pending_names"][kind] for obj in assigned])
+        for obj in assigned:
+            setattr(obj, f"{kind}_entry", entries.get(name_key(obj.__dict__["_pending_names"][kind])))
+    for obj in pending:
+        del obj.__dict__["_pending_names"]
+
+
+def rollup(db, contest_id, levels=("state", "region", "district", "church")):
+    """Participant counts per combination of the given place levels.
+
+    Grouping runs on the integer ids (covered by ix_participants_contest_place
+    for leading levels); names are joined onto the grouped rows afterwards.
+    """
+    id_columns = [getattr(models.Participant, f"{level}_id") for level in levels]
+    counts = (
+        select(*id_columns, func.count(models.Participant.id).label("participants"))
+        .where(models.Participant.contest_id == contest_id)
+        .group_by(*id_columns)
+        .subquery()
+    )
+    query = select(*[KINDS[level].name.label(level) for level in levels], counts.c.participants).select_from(counts)
+    for level in levels:
+        query = query.outerjoin(KINDS[level], KINDS[level].id == counts.c[f"{level}_id"])
+    query = query.order_by(*[KINDS[level].name for level in levels])
+    return [dict(row) for row in db.execute(query).mappings()]
+
+
+def entries(db, kind, search=None, limit=50):
+    """Known names of one kind, e.g. for suggesting spellings while typing."""
+    model = KINDS[kind]
+    query = db.query(model.id, model.name)
+    if search:
+        query = query.filter(model.key.startswith(name_key(search) or ""))
+    return [{"id": row.id, "name": row.name} for row in query.order_by(model.name).limit(limit)]
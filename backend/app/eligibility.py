@@ -0,0 +1,136 @@
+"""Category eligibility.
+
+Categories are age bands, optionally limited to one sex. ``CategoryIndex``
+keeps a contest's bands as sorted intervals so the category for a
+participant is found with a binary search; registering thousands of
+participants costs one query for the categories rather than one per row.
+Indexes are cached per contest, dropped with ``forget`` after category
+writes, and expire like ``contests._known`` so other processes notice
+changes made elsewhere.
+"""
+import bisect
+import time
+
+from . import models
+
+# contest id -> (monotonic time built, CategoryIndex)
+_indexes = {}
+INDEX_TTL = 60
+
+
+def sex_key(sex):
+    """Normalise "Male", "male", "M" to "m"; empty means open to everyone."""
+    sex = (sex or "").strip().lower()
+    return sex[:1] or None
+
+
+def accepts_sex(category, sex):
+    """Whether ``category`` is open to ``sex``, by the same rule as CategoryIndex's scopes."""
+    return sex_key(category.sex) in (None, sex_key(sex))
+
+
+def _intersects(category, min_age, max_age, sex):
+    same_sex = sex_key(sex) is None or sex_key(category.sex) in (None, sex_key(sex))
+    return same_sex and category.min_age <= max_age and min_age <= category.max_age
+
+
+class _Scope:
+    """Intervals sorted by lower bound, with the running maximum of upper bounds."""
+
+    def __init__(self, categories):
+        self.items = sorted(categories, key=lambda c: (c.min_age, c.max_age))
+        self.starts = [c.min_age for c in self.items]
+        self.max_ends = []
+        highest = None
+        for category in self.items:
+            highest = category.max_age if highest is None else max(highest, category.max_age)
+            self.max_ends.append(highest)
+
+    def matches(self, age):
+        i = bisect.bisect_right(self.starts, age)
+        found = []
+        # Walk left only while some earlier interval can still reach this age
+        while i > 0 and self.max_ends[i - 1] >= age:
+            i -= 1
+            if self.items[i].max_age >= age:
+                found.append(self.items[i])
+        return found[::-1]
+
+    def gaps(self):
+        gaps = []
+        covered_to = None
+        for category in self.items:
+            if covered_to is not None and category.min_age > covered_to + 1:
+                gaps.append({"min_age": covered_to + 1, "max_age": category.min_age - 1})
+            covered_to = category.max_age if covered_to is None else max(covered_to, category.max_age)
+        return gaps
+
+
+class CategoryIndex:
+    def __init__(self, categories):
+        # Categories without a complete age range can only be chosen explicitly
+        self.categories = [c for c in categories if c.min_age is not None and c.max_age is not None]
+        sexes = {sex_key(c.sex) for c in self.categories} - {None}
+        # One scope per sex holding that sex's bands plus the open ones; the
+        # None scope (open bands only) serves any other value
+        self._scopes = {
+            key: _Scope([c for c in self.categories if sex_key(c.sex) in (None, key)])
+            for key in sexes | {None}
+        }
+
+    def matches(self, age, sex=None):
+        scope = self._scopes.get(sex_key(sex), self._scopes[None])
+        return scope.matches(age)
+
+    def resolve(self, age, sex=None):
+        """The one category for ``age``/``sex``; raises ValueError if none or several match."""
+        found = self.matches(age, sex)
+        if not found:
+            raise ValueError(f"No category accepts participants aged {age}" + (f" ({sex})" if sex else ""))
+        if len(found) > 1:
+            raise ValueError(f"Age {age} matches several categories: {', '.join(c.name for c in found)}")
+        return found[0]
+
+    def overlaps(self, min_age, max_age, sex=None, exclude_id=None):
+        """Categories whose range and sex intersect the given band."""
+        return [
+            c for c in self.categories
+            if c.id != exclude_id and _intersects(c, min_age, max_age, sex)
+        ]
+
+    def coverage(self):
+        """Overlapping pairs and uncovered ages between bands, per sex when bands are split by sex."""
+        overlaps = [
+            {"categories": [a.id, b.id], "names": [a.name, b.name]}
+            for i, a in enumerate(self.categories)
+            for b in self.categories[i + 1:]
+            if _intersects(b, a.min_age, a.max_age, a.sex)
+        ]
+        sexes = sorted(key for key in self._scopes if key is not None)
+        gaps = {key: self._scopes[key].gaps() for key in sexes} if sexes else {"any": self._scopes[None].gaps()}
+        return {"overlaps": overlaps, "gaps": gaps}
+
+
+def build(db, contest_id):
+    # Plain rows rather than ORM objects, so a cached index outlives the session that loaded it
+    return CategoryIndex(
+        db.query(
+            models.Category.id,
+            models.Category.name,
+            models.Category.min_age,
+            models.Category.max_age,
+            models.Category.sex,
+        ).filter(models.Category.contest_id == contest_id).all()
+    )
+
+
+def index_for(db, contest_id):
+    built_at, index = _indexes.get(contest_id, (float("-inf"), None))
+    if time.monotonic() - built_at > INDEX_TTL:
+        index = build(db, contest_id)
+        _indexes[contest_id] = (time.monotonic(), index)
+    return index
+
+
+def forget(contest_id):
+    _indexes.pop(contest_id, None)
@@ -0,0 +1,174 @@
+"""Data-integrity scanner.
+
+Finds rows the API should never have let through, each with one set-based
+query over the whole contest rather than a check per row:
+
+- ``unregistered_results``: results of a participant not registered for the
+  event (an anti-join against ``participant_event``)
+- ``age_outside_category``: participants whose age no longer fits their
+  category's band, e.g. after the band was edited
+- ``duplicate_results``: more than one result for the same participant and
+  event (``row_number()`` over the pair)
+- ``wrong_ranks``: stored ranks that differ from the ranking window of
+  app.ranking, which covers gaps, missing ranks and stale tie resolution
+
+With ``fix`` the scanner registers the participants of unregistered results
+(their marks are kept) when the event is in their category, deletes all but
+the newest of duplicate results and reranks the events involved, in the same
+transaction. Ages are only reported, as are results in an event of another
+category, since moving a participant to another category changes their
+events and needs an organiser.
+
+Usage: python -m app.integrity [CONTEST_ID ...] [--fix]
+"""
+import argparse
+from datetime import datetime
+
+from sqlalchemy import and_, func, insert, or_, select
+
+from . import models, database, changes, ranking
+
+# Rows listed per check in a report; counts are always complete
+SAMPLE_SIZE = 100
+
+
+def _unregistered(contest_id, *columns):
+    pe = models.participant_event
+    return (
+        select(*(columns or (models.Result.id.label("result_id"), models.Result.participant_id, models.Result.event_id)))
+        .outerjoin(pe, and_(
+            pe.c.participant_id == models.Result.participant_id,
+            pe.c.event_id == models.Result.event_id,
+        ))
+        .where(models.Result.contest_id == contest_id, pe.c.participant_id.is_(None))
+    )
+
+
+def _age_outside_category(contest_id):
+    return (
+        select(
+            models.Participant.id.label("participant_id"),
+            models.Participant.age,
+            models.Category.id.label("category_id"),
+            models.Category.min_age,
+            models.Category.max_age,
+        )
+        .join(models.Category, models.Participant.category_id == models.Category.id)
+        .where(
+            models.Participant.contest_id == contest_id,
+            models.Participant.age.isnot(None),
+            or_(models.Participant.age < models.Category.min_age, models.Participant.age > models.Category.max_age),
+        )
+    )
+
+
+def _duplicates(contest_id):
+    pair = (models.Result.participant_id, models.Result.event_id)
+    numbered = (
+        select(
+            models.Result.id,
+            models.Result.participant_id,
+            models.Result.event_id,
+            func.row_number().over(partition_by=pair, order_by=models.Result.id.desc()).label("copy"),
+            func.max(models.Result.id).over(partition_by=pair).label("kept_id"),
+        )
+        .where(models.Result.contest_id == contest_id)
+        .subquery()
+    )
+    return select(
+        numbered.c.id.label("result_id"), numbered.c.participant_id, numbered.c.event_id, numbered.c.kept_id
+    ).where(numbered.c.copy > 1)
+
+
+def _wrong_ranks(db, contest_id):
+    ranked = ranking.ranked_results(db).add_columns(models.Result.event_id).filter(
+        models.Result.contest_id == contest_id
+    ).subquery()
+    return select(
+        ranked.c.id.label("result_id"), ranked.c.event_id, ranked.c.rank, ranked.c.new_rank.label("expected")
+    ).where(ranked.c.rank.is_distinct_from(ranked.c.new_rank))
+
+
+def _report(rows, **extra):
+    return {"count": len(rows), "sample": rows[:SAMPLE_SIZE], **extra}
+
+
+def scan(db, contest_id, fix=False):
+    """Check one contest and return a report per check; with ``fix`` the caller commits."""
+    unregistered = [dict(row) for row in db.execute(_unregistered(contest_id)).mappings()]
+    ages = [dict(row) for row in db.execute(_age_outside_category(contest_id)).mappings()]
+    duplicates = [dict(row) for row in db.execute(_duplicates(contest_id)).mappings()]
+    wrong_ranks = [dict(row) for row in db.execute(_wrong_ranks(db, contest_id)).mappings()]
+
+    report = {
+        "contest_id": contest_id,
+        "scanned_at": datetime.utcnow().isoformat(),
+        "unregistered_results": _report(unregistered),
+        "age_outside_category": _report(ages),
+        "duplicate_results": _report(duplicates),
+        "wrong_ranks": _report(wrong_ranks),
+    }
+    if fix:
+        _fix(db, contest_id, report, unregistered, duplicates, wrong_ranks)
+    return report
+
+
+def _fix(db, contest_id, report, unregistered, duplicates, wrong_ranks):
+    # Through the session, so result history and the change log see the deletes
+    if duplicates:
+        for result in db.query(models.Result).filter(models.Result.id.in_([d["result_id"] for d in duplicates])):
+            db.delete(result)
+        db.flush()
+    report["duplicate_results"]["fixed"] = len(duplicates)
+
+    # Only where the API would have accepted the registration
+    missing = (
+        _unregistered(contest_id, models.Result.participant_id, models.Result.event_id)
+        .join(models.Participant, models.Participant.id == models.Result.participant_id)
+        .join(models.Event, models.Event.id == models.Result.event_id)
+        .where(models.Event.category_id == models.Participant.category_id)
+        .distinct()
+    )
+    changes.record_memberships(db, missing, contest_id)
+    registered = db.execute(
+        insert(models.participant_event).from_select(["participant_id", "event_id"], missing)
+    ).rowcount
+    pairs = {(row["participant_id"], row["event_id"]) for row in unregistered}
+    report["unregistered_results"]["fixed"] = registered
+    report["unregistered_results"]["not_fixed"] = len(pairs) - registered
+
+    event_ids = sorted({row["event_id"] for row in duplicates + wrong_ranks})
+    report["wrong_ranks"]["fixed"] = ranking.rerank(db, event_ids) if event_ids else 0
+
+
+def summary(report):
+    counts = ", ".join(
+        f"{check}: {report[check]['count']}" + (f" ({report[check]['fixed']} fixed)" if "fixed" in report[check] else "")
+        for check in ("unregistered_results", "age_outside_category", "duplicate_results", "wrong_ranks")
+    )
+    return f"Contest {report['contest_id']}: {counts}"
+
+
+def active_contests(db):
+    return [c for (c,) in db.query(models.Contest.id).filter(models.Contest.archived_at.is_(None)).order_by(models.Contest.id)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check contests for inconsistent results and registrations")
+    parser.add_argument("contest_ids", type=int, nargs="*", help="contests to scan (default: all not archived)")
+    parser.add_argument("--fix", action="store_true", help="repair what can be repaired automatically")
+    args = parser.parse_args()
+
+    database.init_engine()
+    db = database.SessionLocal()
+    try:
+        for contest_id in args.contest_ids or active_contests(db):
+            report = scan(db, contest_id, fix=args.fix)
+            db.commit()
+            print(summary(report))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""Database-backed background job queue.
+
+Heavy operations are stored as rows in the ``jobs`` table and picked up by
+worker threads started with the app, so the HTTP request only inserts a row
+and returns 202. Workers claim jobs with ``SELECT ... FOR UPDATE SKIP LOCKED``
+on Postgres (several uvicorn processes can share the queue) followed by a
+conditional status update, which also keeps SQLite safe. Failed jobs are
+retried with exponential backoff up to ``max_attempts``, and an
+``Idempotency-Key`` maps repeated submissions to the same job.
+
+With ``INTEGRITY_SCAN_INTERVAL`` set, an ``integrity`` job is kept queued
+that scans every running contest and schedules its successor when it finishes.
+"""
+import csv
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from pydantic import ValidationError
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+# dictionaries turns imported participants' place names into ids on flush
+from . import models, schemas, database, dashboard, ranking, changes, eligibility, dictionaries, integrity
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# Running jobs not finished after this many seconds are assumed lost and re-queued
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "1800"))
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+# Seconds between scheduled integrity scans (0 disables them), and whether they repair
+INTEGRITY_SCAN_INTERVAL = int(os.getenv("INTEGRITY_SCAN_INTERVAL", "0"))
+INTEGRITY_SCAN_FIX = os.getenv("INTEGRITY_SCAN_FIX", "").lower() in ("1", "true", "yes")
+
+# kind -> handler(db, payload, job) returning a JSON-serialisable result
+HANDLERS = {}
+
+_stop = threading.Event()
+_workers = []
+
+
+def handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(db, kind, payload=None, idempotency_key=None, max_attempts=3, contest_id=models.DEFAULT_CONTEST_ID, run_after=None):
+    if idempotency_key:
+        existing = db.query(models.Job).filter(models.Job.contest_id == contest_id, models.Job.idempotency_key == idempotency_key).first()
+        if existing:
+            return existing
+
+    job = models.Job(
+        contest_id=contest_id,
+        kind=kind,
+        status="queued",
+        payload=payload or {},
+        attempts=0,
+        max_attempts=max_attempts,
+        idempotency_key=idempotency_key,
+        run_after=run_after,
+        created_at=datetime.utcnow(),
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request with the same key won the race
+        db.rollback()
+        return db.query(models.Job).filter(models.Job.contest_id == contest_id, models.Job.idempotency_key == idempotency_key).one()
+    db.refresh(job)
+    return job
+
+
+def _requeue_stale(db):
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_LEASE_SECONDS)
+    db.execute(
+        update(models.Job)
+        .where(models.Job.status == "running", models.Job.started_at < cutoff)
+        .values(status="queued", run_after=None)
+    )
+    db.commit()
+
+
+def claim(db):
+    """Claim the next runnable job, or return None when the queue is empty."""
+    now = datetime.utcnow()
+    candidate = (
+        db.query(models.Job.id)
+        .filter(
+            models.Job.status == "queued",
+            or_(models.Job.run_after.is_(None), models.Job.run_after <= now),
+        )
+        .order_by(models.Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if candidate is None:
+        db.rollback()
+        return None
+
+    claimed = db.execute(
+        update(models.Job)
+        .where(models.Job.id == candidate.id, models.Job.status == "queued")
+        .values(status="running", started_at=now, attempts=models.Job.attempts + 1)
+    ).rowcount
+    db.commit()
+    if not claimed:
+        return None
+    return db.query(models.Job).filter(models.Job.id == candidate.id).first()
+
+
+def run(job_id):
+    db = database.SessionLocal()
+    try:
+        job = db.query(models.Job).filter(models.Job.id == job_id).first()
+        try:
+            job.result = HANDLERS[job.kind](db, job.payload or {}, job)
+            job.status = "completed"
+            job.error = None
+        except Exception as e:
+            db.rollback()
+            job = db.query(models.Job).filter(models.Job.id == job_id).first()
+            logger.error(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed: {str(e)}", exc_info=True)
+            job.error = str(e)
+            if job.attempts < job.max_attempts:
+                job.status = "queued"
+                job.run_after = datetime.utcnow() + timedelta(seconds=2 ** job.attempts)
+            else:
+                job.status = "failed"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _work():
+    last_stale_check = None
+    while not _stop.is_set():
+        db = database.SessionLocal()
+        try:
+            if last_stale_check is None or datetime.utcnow() - last_stale_check > timedelta(seconds=60):
+                _requeue_stale(db)
+                last_stale_check = datetime.utcnow()
+            job = claim(db)
+        except Exception as e:
+            logger.error(f"Error claiming job: {str(e)}")
+            job = None
+        finally:
+            db.close()
+
+        if job is None:
+            _stop.wait(JOB_POLL_INTERVAL)
+            continue
+        run(job.id)
+
+
+def schedule_integrity_scan(db, delay=None):
+    """Queue the next scheduled scan unless one is already waiting.
+
+    Scheduled scans are the integrity jobs without a contest; they cover all
+    running contests.
+    """
+    waiting = db.query(models.Job.id).filter(
+        models.Job.kind == "integrity",
+        models.Job.contest_id.is_(None),
+        models.Job.status == "queued",
+    ).first()
+    if waiting is None:
+        enqueue(db, "integrity", {"fix": INTEGRITY_SCAN_FIX}, contest_id=None,
+                run_after=datetime.utcnow() + timedelta(seconds=INTEGRITY_SCAN_INTERVAL if delay is None else delay))
+
+
+def start_workers(count=JOB_WORKERS):
+    _stop.clear()
+    if INTEGRITY_SCAN_INTERVAL > 0:
+        db = database.SessionLocal()
+        try:
+            schedule_integrity_scan(db, delay=0)
+        finally:
+            db.close()
+    for index in range(count):
+        thread = threading.Thread(target=_work, name=f"job-worker-{index}", daemon=True)
+        thread.start()
+        _workers.append(thread)
+
+
+def stop_workers():
+    _stop.set()
+    for thread in _workers:
+        thread.join(timeout=5)
+    _workers.clear()
+
+
+@handler("rerank")
+def _rerank(db, payload, job):
+    # Only the job's own contest, whatever ids the payload names
+    events = db.query(models.Event.id).filter(models.Event.contest_id == job.contest_id)
+    if payload.get("event_ids") is not None:
+        events = events.filter(models.Event.id.in_(payload["event_ids"]))
+    event_ids = [e for (e,) in events]
+    updated = ranking.rerank(db, event_ids) + ranking.rerank(db, event_ids, models.TeamResult)
+    db.commit()
+    return {"updated": updated}
+
+
+@handler("integrity")
+def _check_integrity(db, payload, job):
+    if job.contest_id is None and INTEGRITY_SCAN_INTERVAL > 0:
+        # Queued first, so a failing scan does not end the schedule
+        schedule_integrity_scan(db)
+    contest_ids = [job.contest_id] if job.contest_id is not None else integrity.active_contests(db)
+    reports = []
+    for contest_id in contest_ids:
+        report = integrity.scan(db, contest_id, fix=payload.get("fix", False))
+        db.commit()
+        logger.info(integrity.summary(report))
+        reports.append(report)
+    return {"reports": reports}
+
+
+@handler("compact_changes")
+def _compact_changes(db, payload, job):
+    return {"removed": changes.compact(db, payload.get("up_to"))}
+
+
+@handler("archive")
+def _archive_contest(db, payload, job):
+    from . import archive
+    manifest = archive.archive_contest(db, job.contest_id)
+    return {name: table["rows"] for name, table in manifest["tables"].items()}
+
+
+@handler("stats")
+def _rebuild_stats(db, payload, job):
+    return dashboard.compute_stats(db, job.contest_id)
+
+
+@handler("export")
+def _export_results(db, payload, job):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, f"results-{job.id}.csv")
+    query = (
+        db.query(
+            models.Result,
+            models.Participant.name.label("participant_name"),
+            models.Participant.chest_number,
+            models.Event.name.label("event_name"),
+            models.Category.name.label("category_name"),
+        )
+        .join(models.Participant, models.Result.participant_id == models.Participant.id)
+        .join(models.Event, models.Result.event_id == models.Event.id)
+        .join(models.Category, models.Event.category_id == models.Category.id)
+        .filter(models.Result.contest_id == job.contest_id)
+        .order_by(models.Result.event_id, models.Result.rank)
+    )
+    if payload.get("event_id"):
+        query = query.filter(models.Result.event_id == payload["event_id"])
+    elif payload.get("category_id"):
+        query = query.filter(models.Event.category_id == payload["category_id"])
+
+    rows = 0
+    with open(f"{path}.tmp", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            "category", "event", "chest_number", "participant",
+            "judge1_marks", "judge2_marks", "judge3_marks", "total_marks", "rank",
+        ])
+        for row in query.yield_per(1000):
+            writer.writerow([
+                row.category_name, row.event_name, row.chest_number, row.participant_name,
+                row.Result.judge1_marks, row.Result.judge2_marks, row.Result.judge3_marks,
+                row.Result.total_marks, row.Result.rank,
+            ])
+            rows += 1
+    os.replace(f"{path}.tmp", path)
+    return {"path": path, "rows": rows}
+
+
+@handler("import")
+def _import_participants(db, payload, job):
+    """Bulk participant registration with the same checks as POST /participants/."""
+    rows = payload.get("participants", [])
+    categories = {c.id: c for c in db.query(models.Category).filter(models.Category.contest_id == job.contest_id)}
+    # Rows without a category_id are placed by age and sex, without a query per row
+    category_index = eligibility.CategoryIndex(list(categories.values()))
+    events = {e.id: e for e in db.query(models.Event).filter(models.Event.contest_id == job.contest_id)}
+
+    chest_numbers = [row.get("chest_number") for row in rows]
+    taken = set()
+    for start in range(0, len(chest_numbers), 500):
+        chunk = chest_numbers[start:start + 500]
+        taken.update(
+            number for (number,) in
+            db.query(models.Participant.chest_number).filter(
+                models.Participant.contest_id == job.contest_id,
+                models.Participant.chest_number.in_(chunk)
+            )
+        )
+
+    errors = []
+    created = 0
+    for index, row in enumerate(rows):
+        try:
+            data = schemas.ParticipantCreate(**row)
+        except ValidationError as e:
+            errors.append({"row": index, "detail": str(e)})
+            continue
+
+        if data.category_id is None:
+            try:
+                data.category_id = category_index.resolve(data.age, data.sex).id
+            except ValueError as e:
+                errors.append({"row": index, "detail": str(e)})
+                continue
+
+        category = categories.get(data.category_id)
+        if data.chest_number in taken:
+            errors.append({"row": index, "detail": "Chest number already registered"})
+        elif not category:
+            errors.append({"row": index, "detail": "Selected category does not exist"})
+        elif data.age < category.min_age or data.age > category.max_age:
+            errors.append({"row": index, "detail": f"Participant age {data.age} is not within the allowed range ({category.min_age}-{category.max_age}) for category {category.name}"})
+        elif not eligibility.accepts_sex(category, data.sex):
+            errors.append({"row": index, "detail": f"Category {category.name} is only open to {category.sex} participants"})
+        elif any(event_id not in events for event_id in data.event_ids):
+            errors.append({"row": index, "detail": "One or more event IDs are invalid"})
+        elif any(events[event_id].category_id != data.category_id for event_id in data.event_ids):
+            errors.append({"row": index, "detail": f"One or more events do not belong to the selected category {category.name}"})
+        else:
+            participant = models.Participant(**data.dict(exclude={'event_ids'}), contest_id=job.contest_id)
+            participant.events = [events[event_id] for event_id in data.event_ids]
+            db.add(participant)
+            taken.add(data.chest_number)
+            created += 1
+
+    db.commit()
+    return {"created": created, "errors": errors}
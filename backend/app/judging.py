@@ -0,0 +1,229 @@
+"""Judge bias and consistency analytics.
+
+Marks of every fully judged result are loaded with one query into a NumPy
+array of shape (results, 3) and all statistics are computed for every event
+at once with grouped array operations:
+
+- mean offset of each judge slot from the panel median, and its spread
+- Spearman and Kendall (tau-b) rank correlation between each pair of judges
+- outlier flags for events where a judge's average offset is far from what
+  that judge does elsewhere (robust z-score on the median absolute deviation)
+
+Judges are identified by their slot (judge1..judge3), so statistics across
+events assume a slot is the same person for the events analysed.
+
+Usage: python -m app.judging [--contest ID] [--category ID]
+"""
+import argparse
+from itertools import combinations
+
+import numpy as np
+
+from . import models, database
+
+JUDGES = ("judge1", "judge2", "judge3")
+PAIRS = list(combinations(range(len(JUDGES)), 2))
+# Robust z-score above which a judge's offset in an event is flagged
+OUTLIER_Z = 3.5
+# Events with fewer results are too small to flag
+OUTLIER_MIN_RESULTS = 3
+
+
+def load_marks(db, contest_id, category_id=None, event_id=None):
+    """Return (event index per row, event ids, marks array) for fully judged results."""
+    query = (
+        db.query(
+            models.Result.event_id,
+            models.Result.judge1_marks,
+            models.Result.judge2_marks,
+            models.Result.judge3_marks,
+        )
+        .filter(
+            models.Result.contest_id == contest_id,
+            models.Result.judge1_marks.isnot(None),
+            models.Result.judge2_marks.isnot(None),
+            models.Result.judge3_marks.isnot(None),
+        )
+        .order_by(models.Result.event_id)
+    )
+    if event_id:
+        query = query.filter(models.Result.event_id == event_id)
+    elif category_id:
+        query = query.join(models.Event, models.Result.event_id == models.Event.id).filter(
+            models.Event.category_id == category_id
+        )
+
+    rows = np.array(query.all(), dtype=float).reshape(-1, 1 + len(JUDGES))
+    event_ids, event_index = np.unique(rows[:, 0].astype(int), return_inverse=True)
+    return event_index, event_ids, rows[:, 1:]
+
+
+def _group_mean(values, groups, counts):
+    return np.bincount(groups, weights=values, minlength=len(counts)) / counts
+
+
+def _within_group_ranks(values, groups):
+    """1-based ranks of ``values`` inside each group, ties sharing their average rank."""
+    order = np.lexsort((values, groups))
+    sorted_groups = groups[order]
+    sorted_values = values[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    position = np.arange(len(values)) - np.repeat(starts, np.diff(np.r_[starts, len(values)]))
+
+    # Runs of equal values within a group get the mean of their positions
+    new_run = np.r_[True, (sorted_groups[1:] != sorted_groups[:-1]) | (sorted_values[1:] != sorted_values[:-1])]
+    run = np.cumsum(new_run) - 1
+    run_rank = np.bincount(run, weights=position) / np.bincount(run)
+
+    ranks = np.empty(len(values))
+    ranks[order] = run_rank[run] + 1
+    return ranks
+
+
+def _within_group_pairs(groups, counts):
+    """Index arrays (i, j) of every pair of rows inside the same group; rows are sorted by group."""
+    starts = np.r_[0, np.cumsum(counts)[:-1]].astype(int)
+    first, second = [], []
+    # One vectorised step per distinct group size rather than per group
+    for size in np.unique(counts):
+        if size < 2:
+            continue
+        upper_i, upper_j = np.triu_indices(int(size), 1)
+        group_starts = starts[counts == size][:, None]
+        first.append((group_starts + upper_i).ravel())
+        second.append((group_starts + upper_j).ravel())
+    if not first:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    return np.concatenate(first), np.concatenate(second)
+
+
+def _spearman(ranks, groups, counts):
+    """Per-group Pearson correlation of the rank columns for each judge pair."""
+    centred = ranks - np.stack([_group_mean(ranks[:, k], groups, counts) for k in range(ranks.shape[1])], axis=1)[groups]
+    sum_sq = np.stack([np.bincount(groups, weights=centred[:, k] ** 2, minlength=len(counts))
+                       for k in range(ranks.shape[1])], axis=1)
+    result = {}
+    for a, b in PAIRS:
+        covariance = np.bincount(groups, weights=centred[:, a] * centred[:, b], minlength=len(counts))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result[(a, b)] = covariance / np.sqrt(sum_sq[:, a] * sum_sq[:, b])
+    return result
+
+
+def _kendall(marks, groups, counts):
+    """Per-group Kendall tau-b for each judge pair."""
+    first, second = _within_group_pairs(groups, counts)
+    pair_group = groups[first]
+    n0 = np.bincount(pair_group, minlength=len(counts))
+    signs = np.sign(marks[second] - marks[first])
+    ties = np.stack([np.bincount(pair_group, weights=signs[:, k] == 0, minlength=len(counts))
+                     for k in range(marks.shape[1])], axis=1)
+    result = {}
+    for a, b in PAIRS:
+        concordance = np.bincount(pair_group, weights=signs[:, a] * signs[:, b], minlength=len(counts))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result[(a, b)] = concordance / np.sqrt((n0 - ties[:, a]) * (n0 - ties[:, b]))
+    return result
+
+
+def _weighted(values, weights):
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return None
+    return float(np.average(values[valid], weights=weights[valid]))
+
+
+def _number(value):
+    return None if value is None or np.isnan(value) else round(float(value), 4)
+
+
+def analyse(event_index, event_ids, marks):
+    counts = np.bincount(event_index, minlength=len(event_ids)).astype(float)
+    if not len(marks):
+        return {"events": 0, "results": 0, "judges": {}, "agreement": {}, "per_event": []}
+
+    # Offset of each mark from the panel median for the same performance; the
+    # median keeps one harsh judge from shifting the other judges' offsets
+    offsets = marks - np.median(marks, axis=1, keepdims=True)
+    event_offsets = np.stack([_group_mean(offsets[:, k], event_index, counts) for k in range(len(JUDGES))], axis=1)
+
+    # Robust z-score of each event's offset against the same judge's other events
+    median = np.median(event_offsets, axis=0)
+    mad = np.median(np.abs(event_offsets - median), axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        robust_z = np.where(mad > 0, 0.6745 * (event_offsets - median) / mad, 0.0)
+    outliers = (np.abs(robust_z) > OUTLIER_Z) & (counts >= OUTLIER_MIN_RESULTS)[:, None]
+
+    ranks = np.stack([_within_group_ranks(marks[:, k], event_index) for k in range(len(JUDGES))], axis=1)
+    spearman = _spearman(ranks, event_index, counts)
+    kendall = _kendall(marks, event_index, counts)
+    # Correlations of larger events count for more when pooled
+    pair_weights = counts * (counts - 1) / 2
+
+    judges = {}
+    for k, judge in enumerate(JUDGES):
+        judges[judge] = {
+            "mean": _number(marks[:, k].mean()),
+            "variance": _number(marks[:, k].var()),
+            "mean_offset": _number(offsets[:, k].mean()),
+            "offset_stdev": _number(offsets[:, k].std()),
+            "outlier_events": [int(e) for e in event_ids[outliers[:, k]]],
+        }
+
+    agreement = {
+        f"{JUDGES[a]}-{JUDGES[b]}": {
+            "spearman": _number(_weighted(spearman[(a, b)], pair_weights)),
+            "kendall": _number(_weighted(kendall[(a, b)], pair_weights)),
+        }
+        for a, b in PAIRS
+    }
+
+    per_event = [
+        {
+            "event_id": int(event_id),
+            "results": int(counts[i]),
+            "offsets": {judge: _number(event_offsets[i, k]) for k, judge in enumerate(JUDGES)},
+            "spearman": {f"{JUDGES[a]}-{JUDGES[b]}": _number(spearman[(a, b)][i]) for a, b in PAIRS},
+            "kendall": {f"{JUDGES[a]}-{JUDGES[b]}": _number(kendall[(a, b)][i]) for a, b in PAIRS},
+            "outliers": [judge for k, judge in enumerate(JUDGES) if outliers[i, k]],
+        }
+        for i, event_id in enumerate(event_ids)
+    ]
+
+    return {
+        "events": len(event_ids),
+        "results": len(marks),
+        "judges": judges,
+        "agreement": agreement,
+        "per_event": per_event,
+    }
+
+
+def judge_report(db, contest_id, category_id=None, event_id=None):
+    return analyse(*load_marks(db, contest_id, category_id, event_id))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Judge bias and consistency report")
+    parser.add_argument("--contest", type=int, default=models.DEFAULT_CONTEST_ID)
+    parser.add_argument("--category", type=int)
+    parser.add_argument("--event", type=int)
+    args = parser.parse_args()
+
+    database.init_engine()
+    db = database.SessionLocal()
+    try:
+        report = judge_report(db, args.contest, args.category, args.event)
+    finally:
+        db.close()
+
+    print(f"{report['events']} event(s), {report['results']} fully judged result(s)")
+    for judge, stats in report["judges"].items():
+        print(f"{judge}: mean offset {stats['mean_offset']}, offset stdev {stats['offset_stdev']}, "
+              f"outlier events {stats['outlier_events'] or '-'}")
+    for pair, stats in report["agreement"].items():
+        print(f"{pair}: spearman {stats['spearman']}, kendall {stats['kendall']}")
+
+
+if __name__ == "__main__":
+    main()
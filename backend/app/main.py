@@ -1,18 +1,65 @@
-from fastapi import FastAPI, HTTPException, Depends, status
-from sqlalchemy.orm import Session, joinedload
-from typing import List
-from . import models, schemas, database
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, BackgroundTasks, Body, Header, status
+from sqlalchemy.orm import Session, joinedload, selectinload
+from typing import List, Literal, Optional
+from . import models, schemas, database, dashboard, audit, changes, sync, contests, reports, throttle, eligibility, profiling, batch, dictionaries, rounds, teams, publishing, ranking
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from sqlalchemy import func, text
 import logging
+import os
+import time
+from contextlib import asynccontextmanager
 
 # Configure logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Engines are created here rather than at import so workers and tests
+    # can import the app without touching the database
+    database.init_engine()
+    # The job module (and what it imports) is only loaded when this process runs workers
+    workers = int(os.getenv("JOB_WORKERS", "2"))
+    if workers > 0:
+        from . import jobs
+        jobs.start_workers(workers)
+    yield
+    if workers > 0:
+        jobs.stop_workers()
+    database.dispose_engines()
 
-# Configure CORS
+app = FastAPI(lifespan=lifespan)
+# Lets a single request be profiled on demand (see app.profiling)
+app.router.route_class = profiling.ProfiledRoute
+
+# Compress responses above a size threshold; Brotli when brotli-asgi is installed.
+# Registered first (innermost) so it sees whole responses and can honour the threshold.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1000"))
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+single_flight = throttle.SingleFlight()
+rate_limiter = throttle.RateLimiter()
+
+# Token bucket per client and route; writes from judges are not limited
+@app.middleware("http")
+async def rate_limit(request: Request, call_next):
+    if request.method == "GET" and rate_limiter.rate > 0:
+        wait = rate_limiter.acquire((throttle.client_key(request), request.url.path))
+        if wait:
+            return JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": "Too many requests"},
+                headers={"Retry-After": str(max(1, round(wait)))},
+            )
+    return await call_next(request)
+
+# Configure CORS (registered after the rate limiter so 429 responses carry CORS headers)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -21,88 +68,283 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create tables
-models.Base.metadata.create_all(bind=database.engine)
+# Clients that just wrote get their reads from the primary for a short window
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and database.replica_engines:
+        response.set_cookie(
+            database.READ_YOUR_WRITES_COOKIE,
+            str(time.time() + database.READ_YOUR_WRITES_WINDOW),
+            max_age=int(database.READ_YOUR_WRITES_WINDOW) + 1,
+        )
+    return response
+
+# Outermost, so the profile's duration covers the whole request
+app.add_middleware(profiling.ProfilingMiddleware)
+
+def coalescing_scope(db: Session):
+    # Reads pinned to the primary must not be handed a result read from a replica
+    return "replica" if db.info.get("replica") is not None else "primary"
+
+def publish_results(background_tasks: BackgroundTasks, contest_id, event_ids):
+    # The static site generator is only loaded when publishing is configured
+    if os.getenv("STATIC_SITE_DIR"):
+        from . import static_site
+        background_tasks.add_task(static_site.publish_events, contest_id, event_ids)
 
 # Dependency
-def get_db():
+def get_db(request: Request):
     db = database.SessionLocal()
+    # GET handlers read from a replica unless the client needs its own writes
+    if request.method == "GET" and not database.wants_primary(request.headers, request.cookies):
+        db.info["replica"] = database.pick_replica()
+    # Recorded in the result audit trail
+    db.info["actor"] = request.headers.get("x-changed-by")
     try:
         yield db
     finally:
         db.close()
 
+# Every query below is scoped to the contest chosen by the client
+def current_contest(
+    contest_id: Optional[int] = None,
+    x_contest_id: Optional[int] = Header(None),
+    db: Session = Depends(get_db)
+):
+    resolved = contests.resolve(db, x_contest_id or contest_id)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="Contest not found")
+    return resolved
+
+# Contest endpoints
+@app.post("/contests/", response_model=schemas.Contest)
+def create_contest(contest: schemas.ContestCreate, db: Session = Depends(get_db)):
+    existing = db.query(models.Contest).filter(models.Contest.name == contest.name).first()
+    if existing:
+        raise HTTPException(status_code=400, detail="Contest name already exists")
+    db_contest = models.Contest(**contest.dict())
+    db.add(db_contest)
+    db.flush()
+    contests.ensure_partition(db, db_contest.id)
+    db.commit()
+    db.refresh(db_contest)
+    return db_contest
+
+@app.get("/contests/", response_model=List[schemas.Contest])
+def get_contests(db: Session = Depends(get_db)):
+    return db.query(models.Contest).order_by(models.Contest.id).all()
+
+@app.get("/contests/{contest_id}", response_model=schemas.Contest)
+def get_contest(contest_id: int, db: Session = Depends(get_db)):
+    contest = db.query(models.Contest).filter(models.Contest.id == contest_id).first()
+    if not contest:
+        raise HTTPException(status_code=404, detail="Contest not found")
+    return contest
+
+# Archive endpoints (read-only access to contests moved to cold storage)
+@app.get("/archive/")
+def get_archives():
+    from . import archive
+    return archive.list_archives()
+
+@app.get("/archive/{contest_id}")
+def get_archive(contest_id: int):
+    from . import archive
+    manifest = archive.get_manifest(contest_id)
+    if not manifest:
+        raise HTTPException(status_code=404, detail="Archive not found")
+    return manifest
+
+@app.get("/archive/{contest_id}/{table}")
+def query_archive(
+    contest_id: int,
+    table: str,
+    event_id: Optional[int] = None,
+    participant_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    limit: int = 100,
+    offset: int = 0
+):
+    from . import archive
+    try:
+        page = archive.read_table(
+            contest_id,
+            table,
+            {"event_id": event_id, "participant_id": participant_id, "category_id": category_id},
+            limit=max(1, min(limit, 5000)),
+            offset=max(0, offset),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=404, detail="Archived table not found")
+    return page
+
 # Category endpoints
+def check_age_band(db: Session, contest_id: int, category: schemas.CategoryCreate, category_id: int = None):
+    # Participants are placed in a category by age, so bands must not overlap
+    if category.min_age > category.max_age:
+        raise HTTPException(status_code=400, detail="Minimum age cannot be greater than maximum age")
+    clashes = eligibility.build(db, contest_id).overlaps(category.min_age, category.max_age, category.sex, exclude_id=category_id)
+    if clashes:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Age range {category.min_age}-{category.max_age} overlaps category {', '.join(c.name for c in clashes)}"
+        )
+
+def check_tie_breaks(category: schemas.CategoryCreate):
+    try:
+        ranking.check_tie_breaks(category.tie_breaks)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/categories/", response_model=schemas.Category)
-def create_category(category: schemas.CategoryCreate, db: Session = Depends(get_db)):
-    db_category = models.Category(**category.dict())
+def create_category(category: schemas.CategoryCreate, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    existing = db.query(models.Category).filter(
+        models.Category.contest_id == contest_id,
+        models.Category.name == category.name
+    ).first()
+    if existing:
+        raise HTTPException(status_code=400, detail="Category name already exists")
+    check_age_band(db, contest_id, category)
+    check_tie_breaks(category)
+    db_category = models.Category(**category.dict(), contest_id=contest_id)
     db.add(db_category)
     db.commit()
+    eligibility.forget(contest_id)
     db.refresh(db_category)
     return db_category
 
+@batch.read("categories", List[schemas.Category])
 @app.get("/categories/", response_model=List[schemas.Category])
-def get_categories(db: Session = Depends(get_db)):
-    return db.query(models.Category).all()
+def get_categories(db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    return db.query(models.Category).filter(models.Category.contest_id == contest_id).all()
+
+@batch.read("category_coverage")
+@app.get("/categories/coverage")
+def get_category_coverage(db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    return eligibility.build(db, contest_id).coverage()
+
+@app.post("/categories/resolve")
+def resolve_categories(participants: List[schemas.CategoryResolve], db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    # One lookup per row against the cached index; no query per row
+    index = eligibility.index_for(db, contest_id)
+    resolved = []
+    for participant in participants:
+        try:
+            category = index.resolve(participant.age, participant.sex)
+            resolved.append({"category_id": category.id, "category_name": category.name})
+        except ValueError as e:
+            resolved.append({"category_id": None, "error": str(e)})
+    return resolved
 
 @app.get("/categories/{category_id}", response_model=schemas.Category)
-def get_category(category_id: int, db: Session = Depends(get_db)):
-    category = db.query(models.Category).filter(models.Category.id == category_id).first()
+def get_category(category_id: int, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    category = db.query(models.Category).filter(
+        models.Category.contest_id == contest_id,
+        models.Category.id == category_id
+    ).first()
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     return category
 
 @app.put("/categories/{category_id}", response_model=schemas.Category)
-def update_category(category_id: int, category_update: schemas.CategoryCreate, db: Session = Depends(get_db)):
-    db_category = db.query(models.Category).filter(models.Category.id == category_id).first()
+def update_category(category_id: int, category_update: schemas.CategoryCreate, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    db_category = db.query(models.Category).filter(
+        models.Category.contest_id == contest_id,
+        models.Category.id == category_id
+    ).first()
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
+    check_age_band(db, contest_id, category_update, category_id)
+    check_tie_breaks(category_update)
+    reorder = (db_category.tie_breaks or None) != (category_update.tie_breaks or None)
     
     for key, value in category_update.dict().items():
         setattr(db_category, key, value)
     
+    if reorder:
+        # Ranks already stored follow the old chain
+        db.flush()
+        event_ids = [event.id for event in db_category.events]
+        updated = ranking.rerank(db, event_ids) + ranking.rerank(db, event_ids, models.TeamResult)
+        logger.info(f"Tie-breaks of category {category_id} changed; {updated} rank(s) updated")
     db.commit()
+    eligibility.forget(contest_id)
     db.refresh(db_category)
     return db_category
 
 @app.delete("/categories/{category_id}")
-def delete_category(category_id: int, db: Session = Depends(get_db)):
-    category = db.query(models.Category).filter(models.Category.id == category_id).first()
+def delete_category(category_id: int, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    category = db.query(models.Category).filter(
+        models.Category.contest_id == contest_id,
+        models.Category.id == category_id
+    ).first()
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     db.delete(category)
     db.commit()
+    eligibility.forget(contest_id)
     return {"message": "Category deleted successfully"}
 
 # Event endpoints
 @app.post("/events/", response_model=schemas.Event)
-def create_event(event: schemas.EventCreate, db: Session = Depends(get_db)):
-    db_event = models.Event(**event.dict())
+def create_event(event: schemas.EventCreate, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    category = db.query(models.Category).filter(
+        models.Category.contest_id == contest_id,
+        models.Category.id == event.category_id
+    ).first()
+    if not category:
+        raise HTTPException(status_code=400, detail="Selected category does not exist")
+    try:
+        rounds.check_round(db, contest_id, None, event)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db_event = models.Event(**event.dict(), contest_id=contest_id)
     db.add(db_event)
     db.commit()
     db.refresh(db_event)
     return db_event
 
+@batch.read("events", List[schemas.Event])
 @app.get("/events/", response_model=List[schemas.Event])
-def get_events(category_id: int = None, db: Session = Depends(get_db)):
-    query = db.query(models.Event)
+def get_events(category_id: int = None, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    query = db.query(models.Event).filter(models.Event.contest_id == contest_id)
     if category_id:
         query = query.filter(models.Event.category_id == category_id)
     return query.all()
 
 @app.get("/events/{event_id}", response_model=schemas.Event)
-def get_event(event_id: int, db: Session = Depends(get_db)):
-    event = db.query(models.Event).filter(models.Event.id == event_id).first()
+def get_event(event_id: int, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    event = db.query(models.Event).filter(
+        models.Event.contest_id == contest_id,
+        models.Event.id == event_id
+    ).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     return event
 
 @app.put("/events/{event_id}", response_model=schemas.Event)
-def update_event(event_id: int, event_update: schemas.EventCreate, db: Session = Depends(get_db)):
-    db_event = db.query(models.Event).filter(models.Event.id == event_id).first()
+def update_event(event_id: int, event_update: schemas.EventCreate, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    db_event = db.query(models.Event).filter(
+        models.Event.contest_id == contest_id,
+        models.Event.id == event_id
+    ).first()
     if not db_event:
         raise HTTPException(status_code=404, detail="Event not found")
     
+    category = db.query(models.Category).filter(
+        models.Category.contest_id == contest_id,
+        models.Category.id == event_update.category_id
+    ).first()
+    if not category:
+        raise HTTPException(status_code=400, detail="Selected category does not exist")
+    try:
+        rounds.check_round(db, contest_id, event_id, event_update)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     for key, value in event_update.dict().items():
         setattr(db_event, key, value)
     
@@ -111,29 +353,98 @@ def update_event(event_id: int, event_update: schemas.EventCreate, db: Session =
     return db_event
 
 @app.delete("/events/{event_id}")
-def delete_event(event_id: int, db: Session = Depends(get_db)):
-    event = db.query(models.Event).filter(models.Event.id == event_id).first()
+def delete_event(event_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    event = db.query(models.Event).filter(
+        models.Event.contest_id == contest_id,
+        models.Event.id == event_id
+    ).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
     # First, delete all results associated with this event
+    # Bulk deletes skip the flush hooks, so the history is written first
+    audit.record_bulk(db, "delete", models.Result.event_id == event_id)
     db.query(models.Result).filter(models.Result.event_id == event_id).delete()
+    db.query(models.TeamResult).filter(models.TeamResult.event_id == event_id).delete()
+    db.query(models.PublishedResult).filter(models.PublishedResult.event_id == event_id).delete()
+
+    # Rounds that fed into this one no longer have a next round
+    for feeder in db.query(models.Event).filter(models.Event.next_round_id == event_id):
+        feeder.next_round_id = None
     
     # Then delete the event (this will automatically handle the participant_event associations)
     db.delete(event)
     db.commit()
+    publish_results(background_tasks, contest_id, [event_id])
     return {"message": "Event deleted successfully"}
 
+@app.post("/events/{event_id}/advance")
+def advance_event(event_id: int, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    event = db.query(models.Event).filter(
+        models.Event.contest_id == contest_id,
+        models.Event.id == event_id
+    ).first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    try:
+        advanced = rounds.advance(db, event)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    logger.info(f"Advanced {advanced['registered']} of {advanced['qualified']} qualifiers from event {event_id} to {advanced['next_round_id']}")
+    return advanced
+
+def get_event_or_404(db: Session, contest_id: int, event_id: int):
+    event = db.query(models.Event).filter(
+        models.Event.contest_id == contest_id,
+        models.Event.id == event_id
+    ).first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return event
+
+# Ranks the event's results on the server, ties resolved by the category's chain
+@app.post("/events/{event_id}/rank")
+def rank_event(event_id: int, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    event = get_event_or_404(db, contest_id, event_id)
+    updated = ranking.rerank(db, [event.id]) + ranking.rerank(db, [event.id], models.TeamResult)
+    db.commit()
+    logger.info(f"Ranked event {event_id}; {updated} rank(s) updated")
+    return {"event_id": event.id, "updated": updated}
+
+# Marks are drafts until their event is published
+@app.post("/events/{event_id}/publish")
+def publish_event(event_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    event = get_event_or_404(db, contest_id, event_id)
+    published = publishing.publish(db, event)
+    db.commit()
+    publish_results(background_tasks, contest_id, [event_id])
+    return published
+
+@app.post("/events/{event_id}/unpublish")
+def unpublish_event(event_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    event = get_event_or_404(db, contest_id, event_id)
+    publishing.unpublish(db, event)
+    db.commit()
+    publish_results(background_tasks, contest_id, [event_id])
+    return {"message": "Event unpublished successfully"}
+
 # Participant endpoints
-@app.post("/participants/", response_model=schemas.Participant)
-def create_participant(participant: schemas.ParticipantCreate, db: Session = Depends(get_db)):
-    # Check if chest number is unique
-    existing = db.query(models.Participant).filter(models.Participant.chest_number == participant.chest_number).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Chest number already registered")
+def participant_category(db: Session, contest_id: int, participant: schemas.ParticipantCreate):
+    """The category the participant chose, or the one their age and sex fall into."""
+    if participant.category_id is None:
+        try:
+            category = eligibility.index_for(db, contest_id).resolve(participant.age, participant.sex)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        participant.category_id = category.id
+        return category
     
     # Validate category exists
-    category = db.query(models.Category).filter(models.Category.id == participant.category_id).first()
+    category = db.query(models.Category).filter(
+        models.Category.contest_id == contest_id,
+        models.Category.id == participant.category_id
+    ).first()
     if not category:
         raise HTTPException(status_code=400, detail="Selected category does not exist")
     
@@ -143,13 +454,31 @@ def create_participant(participant: schemas.ParticipantCreate, db: Session = Dep
             status_code=400,
             detail=f"Participant age {participant.age} is not within the allowed range ({category.min_age}-{category.max_age}) for category {category.name}"
         )
+    if not eligibility.accepts_sex(category, participant.sex):
+        raise HTTPException(status_code=400, detail=f"Category {category.name} is only open to {category.sex} participants")
+    return category
+
+@app.post("/participants/", response_model=schemas.Participant)
+def create_participant(participant: schemas.ParticipantCreate, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    # Check if chest number is unique within the contest
+    existing = db.query(models.Participant).filter(
+        models.Participant.contest_id == contest_id,
+        models.Participant.chest_number == participant.chest_number
+    ).first()
+    if existing:
+        raise HTTPException(status_code=400, detail="Chest number already registered")
+    
+    category = participant_category(db, contest_id, participant)
     
     # Create participant without events
     participant_data = participant.dict(exclude={'event_ids'})
-    db_participant = models.Participant(**participant_data)
+    db_participant = models.Participant(**participant_data, contest_id=contest_id)
     
     # Add events
-    events = db.query(models.Event).filter(models.Event.id.in_(participant.event_ids)).all()
+    events = db.query(models.Event).filter(
+        models.Event.contest_id == contest_id,
+        models.Event.id.in_(participant.event_ids)
+    ).all()
     if len(events) != len(participant.event_ids):
         raise HTTPException(status_code=400, detail="One or more event IDs are invalid")
     
@@ -167,27 +496,25 @@ def create_participant(participant: schemas.ParticipantCreate, db: Session = Dep
     db.refresh(db_participant)
     return db_participant
 
+@batch.read("participants")
 @app.get("/participants/")
 def get_participants(
     category_id: int = None,
     event_id: int = None,
-    db: Session = Depends(get_db)
+    events: Literal["full", "ids"] = "full",
+    db: Session = Depends(get_db),
+    contest_id: int = Depends(current_contest)
 ):
     try:
-        print(f"Fetching participants with category_id: {category_id}, event_id: {event_id}")
-        
         # Start with base query including events relationship
         query = db.query(models.Participant).options(
             joinedload(models.Participant.events),
             joinedload(models.Participant.results)
-        )
-        
-        print("Base query created")
+        ).filter(models.Participant.contest_id == contest_id)
         
         # Add category filter if provided
         if category_id:
             query = query.filter(models.Participant.category_id == category_id)
-            print(f"Added category filter: {category_id}")
         
         # Add event filter if provided
         if event_id:
@@ -196,14 +523,15 @@ def get_participants(
                 .join(models.participant_event)
                 .filter(models.participant_event.c.event_id == event_id)
             )
-            print(f"Added event filter: {event_id}")
         
         # Execute query and get all participants
         participants = query.all()
-        print(f"Found {len(participants)} participants")
+        logger.debug(f"Found {len(participants)} participants (category {category_id}, event {event_id})")
         
         # Convert to dictionary format
         participants_list = []
+        # events=ids: each event is sent once in a lookup table instead of per participant
+        events_by_id = {}
         for participant in participants:
             # Get results for this participant
             participant_results = {}
@@ -221,81 +549,76 @@ def get_participants(
                 "district": participant.district,
                 "region": participant.region,
                 "state": participant.state,
-                "category_id": participant.category_id,
-                "events": [{
-                    "id": event.id,
-                    "name": event.name,
-                    "category_id": event.category_id,
-                    "date": event.date,
-                    "venue": event.venue
-                } for event in participant.events]
+                "category_id": participant.category_id
             }
+            event_dicts = [{
+                "id": event.id,
+                "name": event.name,
+                "category_id": event.category_id,
+                "date": event.date,
+                "venue": event.venue
+            } for event in participant.events]
+            if events == "ids":
+                participant_dict["event_ids"] = [event["id"] for event in event_dicts]
+                events_by_id.update((event["id"], event) for event in event_dicts)
+            else:
+                participant_dict["events"] = event_dicts
             
-            # Add result data if available for the selected event
+            # Add result data if available for the selected event; result fields
+            # that are not set are left out rather than sent as null
             if event_id and event_id in participant_results:
                 result_data = participant_results[event_id]
-                participant_dict.update({
+                result_fields = {
                     "judge1_marks": result_data.judge1_marks,
                     "judge2_marks": result_data.judge2_marks,
                     "judge3_marks": result_data.judge3_marks,
                     "total_marks": result_data.total_marks,
                     "rank": result_data.rank
-                })
-            else:
-                participant_dict.update({
-                    "judge1_marks": None,
-                    "judge2_marks": None,
-                    "judge3_marks": None,
-                    "total_marks": None,
-                    "rank": None
-                })
+                }
+                participant_dict.update({key: value for key, value in result_fields.items() if value is not None})
             
             participants_list.append(participant_dict)
         
-        print(f"Returning {len(participants_list)} participants")
+        if events == "ids":
+            return {"participants": participants_list, "events": events_by_id}
         return participants_list
 
     except Exception as e:
-        print(f"Error in get_participants: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
+        logger.error(f"Error in get_participants: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching participants: {str(e)}"
         )
 
 @app.get("/participants/{participant_id}", response_model=schemas.Participant)
-def get_participant(participant_id: int, db: Session = Depends(get_db)):
-    participant = db.query(models.Participant).filter(models.Participant.id == participant_id).first()
+def get_participant(participant_id: int, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    participant = db.query(models.Participant).filter(
+        models.Participant.contest_id == contest_id,
+        models.Participant.id == participant_id
+    ).first()
     if not participant:
         raise HTTPException(status_code=404, detail="Participant not found")
     return participant
 
 @app.put("/participants/{participant_id}", response_model=schemas.Participant)
-def update_participant(participant_id: int, participant_update: schemas.ParticipantCreate, db: Session = Depends(get_db)):
-    db_participant = db.query(models.Participant).filter(models.Participant.id == participant_id).first()
+def update_participant(participant_id: int, participant_update: schemas.ParticipantCreate, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    db_participant = db.query(models.Participant).filter(
+        models.Participant.contest_id == contest_id,
+        models.Participant.id == participant_id
+    ).first()
     if not db_participant:
         raise HTTPException(status_code=404, detail="Participant not found")
     
     # Check if chest number is unique (excluding current participant)
     existing = db.query(models.Participant).filter(
+        models.Participant.contest_id == contest_id,
         models.Participant.chest_number == participant_update.chest_number,
         models.Participant.id != participant_id
     ).first()
     if existing:
         raise HTTPException(status_code=400, detail="Chest number already registered")
     
-    # Validate category exists
-    category = db.query(models.Category).filter(models.Category.id == participant_update.category_id).first()
-    if not category:
-        raise HTTPException(status_code=400, detail="Selected category does not exist")
-    
-    # Validate age against category
-    if participant_update.age < category.min_age or participant_update.age > category.max_age:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Participant age {participant_update.age} is not within the allowed range ({category.min_age}-{category.max_age}) for category {category.name}"
-        )
+    category = participant_category(db, contest_id, participant_update)
     
     # Update participant data
     participant_data = participant_update.dict(exclude={'event_ids'})
@@ -303,7 +626,10 @@ def update_participant(participant_id: int, participant_update: schemas.Particip
         setattr(db_participant, key, value)
     
     # Update events
-    events = db.query(models.Event).filter(models.Event.id.in_(participant_update.event_ids)).all()
+    events = db.query(models.Event).filter(
+        models.Event.contest_id == contest_id,
+        models.Event.id.in_(participant_update.event_ids)
+    ).all()
     if len(events) != len(participant_update.event_ids):
         raise HTTPException(status_code=400, detail="One or more event IDs are invalid")
     
@@ -321,34 +647,51 @@ def update_participant(participant_id: int, participant_update: schemas.Particip
     return db_participant
 
 @app.delete("/participants/{participant_id}")
-def delete_participant(participant_id: int, db: Session = Depends(get_db)):
-    participant = db.query(models.Participant).filter(models.Participant.id == participant_id).first()
+def delete_participant(participant_id: int, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    participant = db.query(models.Participant).filter(
+        models.Participant.contest_id == contest_id,
+        models.Participant.id == participant_id
+    ).first()
     if not participant:
         raise HTTPException(status_code=404, detail="Participant not found")
     
     # Delete associated results first
+    audit.record_bulk(db, "delete", models.Result.participant_id == participant_id)
     db.query(models.Result).filter(models.Result.participant_id == participant_id).delete()
     
-    # Delete participant (this will automatically handle the participant_event associations)
+    # Delete participant (this will automatically handle the participant_event and team_members associations)
     db.delete(participant)
     db.commit()
     return {"message": "Participant deleted successfully"}
 
 # Result endpoints
 @app.post("/results/")
-def create_results(results: List[schemas.ResultCreate], db: Session = Depends(get_db)):
+def create_results(results: List[schemas.ResultCreate], db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
     try:
         # Create all results first
         db_results = []
-        print("Received results data:", results)  # Debug print
+        logger.debug(f"Saving {len(results)} result(s)")
+        
+        # Results may only be entered for this contest's events
+        event_ids = {result.event_id for result in results}
+        known_events = db.query(models.Event.id).filter(
+            models.Event.contest_id == contest_id,
+            models.Event.id.in_(event_ids)
+        ).count() if event_ids else 0
+        if known_events != len(event_ids):
+            raise ValueError("One or more event IDs are invalid")
+        participant_ids = {result.participant_id for result in results}
+        known_participants = db.query(models.Participant.id).filter(
+            models.Participant.contest_id == contest_id,
+            models.Participant.id.in_(participant_ids)
+        ).count() if participant_ids else 0
+        if known_participants != len(participant_ids):
+            raise ValueError("One or more participant IDs are invalid")
         
         for result in results:
-            print(f"Saving result - Participant ID: {result.participant_id}, Event ID: {result.event_id}")
-            print(f"Marks - Judge1: {result.judge1_marks}, Judge2: {result.judge2_marks}, Judge3: {result.judge3_marks}")
-            print(f"Total Marks: {result.total_marks}, Rank: {result.rank}")
-            
             # Create new result using the provided total_marks and rank
             db_result = models.Result(
+                contest_id=contest_id,
                 participant_id=result.participant_id,
                 event_id=result.event_id,
                 judge1_marks=result.judge1_marks,
@@ -376,8 +719,14 @@ def create_results(results: List[schemas.ResultCreate], db: Session = Depends(ge
             detail=f"Error saving results: {str(e)}"
         )
 
+@batch.read("results")
 @app.get("/results/", response_model=List[schemas.ResultResponse])
-def get_results(event_id: int = None, category_id: int = None, db: Session = Depends(get_db)):
+def get_results(event_id: int = None, category_id: int = None, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    # Identical concurrent requests (e.g. everyone refreshing after an announcement) share one query
+    key = ("results", contest_id, event_id, category_id, coalescing_scope(db))
+    return single_flight.do(key, lambda: fetch_results(db, contest_id, event_id, category_id))
+
+def fetch_results(db: Session, contest_id: int, event_id: int = None, category_id: int = None):
     query = db.query(
         models.Result,
         models.Participant.name.label('participant_name'),
@@ -385,11 +734,14 @@ def get_results(event_id: int = None, category_id: int = None, db: Session = Dep
         models.Event.name.label('event_name'),
         models.Category.name.label('category_name')
     ).join(
-        models.Participant
+        models.Participant, models.Result.participant_id == models.Participant.id
     ).join(
-        models.Event
+        models.Event, models.Result.event_id == models.Event.id
     ).join(
-        models.Category
+        # Participants and events both reference categories, so say which one
+        models.Category, models.Event.category_id == models.Category.id
+    ).filter(
+        models.Result.contest_id == contest_id
     )
     
     if event_id:
@@ -412,42 +764,76 @@ def get_results(event_id: int = None, category_id: int = None, db: Session = Dep
         'rank': result.Result.rank
     } for result in results]
 
+# Public result board: published snapshots only. A snapshot does not change
+# until the event is published again, so clients revalidate with the ETag
+@app.get("/public/results")
+def get_public_results(
+    request: Request,
+    response: Response,
+    event_id: int = None,
+    category_id: int = None,
+    db: Session = Depends(get_db),
+    contest_id: int = Depends(current_contest)
+):
+    headers = {"Cache-Control": "public, no-cache"}
+    filters = {"event_id": event_id, "category_id": category_id}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        etag = publishing.current_etag(db, contest_id, **filters)
+        if etag == if_none_match:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={**headers, "ETag": etag})
+    events, etag = publishing.snapshots(db, contest_id, **filters)
+    response.headers.update({**headers, "ETag": etag})
+    return events
+
+@batch.read("results_summary")
+@app.get("/results/summary")
+def get_results_summary(category_id: int, top: int = 3, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    top = max(1, top)
+    key = ("results_summary", contest_id, category_id, top, coalescing_scope(db))
+    return single_flight.do(key, lambda: reports.results_summary(db, contest_id, category_id, top))
+
+@app.get("/analytics/judges")
+def get_judge_analytics(category_id: int = None, event_id: int = None, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    from . import judging
+    return judging.judge_report(db, contest_id, category_id, event_id)
+
+@batch.read("registrations")
 @app.get("/participants/by-category-event/{category_id}/{event_id}")
 def get_participants_by_category_event(
     category_id: int,
     event_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    contest_id: int = Depends(current_contest)
 ):
-    print(f"Fetching participants for category {category_id} and event {event_id}")  # Debug log
-    
-    # First, let's get all participants in this category
+    # Filter by category and event registration in SQL and load every
+    # participant's events in one extra query instead of one per participant
     participants = (
         db.query(models.Participant)
-        .filter(models.Participant.category_id == category_id)
+        .join(models.participant_event, models.participant_event.c.participant_id == models.Participant.id)
+        .filter(
+            models.Participant.contest_id == contest_id,
+            models.Participant.category_id == category_id,
+            models.participant_event.c.event_id == event_id
+        )
+        .options(selectinload(models.Participant.events))
         .all()
     )
     
-    print(f"Found {len(participants)} participants in category")  # Debug log
-    
-    # Then filter for those who are registered for the event
-    filtered_participants = []
-    for participant in participants:
-        event_ids = [event.id for event in participant.events]
-        if event_id in event_ids:
-            filtered_participants.append(participant)
-    
-    print(f"After event filtering: {len(filtered_participants)} participants")  # Debug log
-    return filtered_participants
+    logger.debug(f"Found {len(participants)} participants registered for event {event_id}")
+    return participants
 
 @app.get("/results/{participant_id}/{event_id}")
 def get_result(
     participant_id: int,
     event_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    contest_id: int = Depends(current_contest)
 ):
     result = (
         db.query(models.Result)
         .filter(
+            models.Result.contest_id == contest_id,
             models.Result.participant_id == participant_id,
             models.Result.event_id == event_id
         )
@@ -455,142 +841,314 @@ def get_result(
     )
     return result
 
+@app.get("/results/{participant_id}/{event_id}/history", response_model=List[schemas.ResultAuditEntry])
+def get_result_history(
+    participant_id: int,
+    event_id: int,
+    db: Session = Depends(get_db),
+    contest_id: int = Depends(current_contest)
+):
+    event = db.query(models.Event.id).filter(
+        models.Event.contest_id == contest_id,
+        models.Event.id == event_id
+    ).first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return audit.history(db, participant_id, event_id)
+
 @app.post("/results/update")
-def update_result(result: schemas.ParticipantResultCreate, db: Session = Depends(get_db)):
+def update_result(result: schemas.ParticipantResultCreate, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    get_event_or_404(db, contest_id, result.event_id)
+    if not db.query(models.Participant.id).filter(
+        models.Participant.contest_id == contest_id,
+        models.Participant.id == result.participant_id
+    ).first():
+        raise HTTPException(status_code=404, detail="Participant not found")
     db_result = (
         db.query(models.Result)
         .filter(
+            models.Result.contest_id == contest_id,
             models.Result.participant_id == result.participant_id,
             models.Result.event_id == result.event_id
         )
         .first()
     )
     
+    # The request calls the judges' marks mark1..mark3
+    values = result.dict()
+    for judge in (1, 2, 3):
+        values[f"judge{judge}_marks"] = values.pop(f"mark{judge}")
+    
     if db_result:
         # Update existing result
-        for key, value in result.dict().items():
+        for key, value in values.items():
             setattr(db_result, key, value)
     else:
         # Create new result
-        db_result = models.Result(**result.dict())
+        db_result = models.Result(**values, contest_id=contest_id)
         db.add(db_result)
     
     db.commit()
     db.refresh(db_result)
     return db_result
 
+@batch.read("participant_events", List[schemas.ParticipantEvent])
+@app.get("/participants/{participant_id}/events", response_model=List[schemas.ParticipantEvent])
+def get_participant_events(participant_id: int, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    # Individual and team entries in one query
+    events = teams.events_by_participant(db, contest_id, [participant_id])[participant_id]
+    if not events and not db.query(models.Participant.id).filter(
+        models.Participant.contest_id == contest_id,
+        models.Participant.id == participant_id
+    ).first():
+        raise HTTPException(status_code=404, detail="Participant not found")
+    return events
+
+# Team endpoints (group events are entered and scored per team)
+def get_team_or_404(db: Session, contest_id: int, team_id: int):
+    team = db.query(models.Team).filter(
+        models.Team.contest_id == contest_id,
+        models.Team.id == team_id
+    ).first()
+    if not team:
+        raise HTTPException(status_code=404, detail="Team not found")
+    return team
+
+@app.post("/teams/", response_model=schemas.Team)
+def create_team(team: schemas.TeamCreate, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    if db.query(models.Team.id).filter(models.Team.contest_id == contest_id, models.Team.name == team.name).first():
+        raise HTTPException(status_code=400, detail="Team name already exists")
+    try:
+        members, events = teams.members_and_events(db, contest_id, team)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db_team = models.Team(**team.dict(exclude={"member_ids", "event_ids"}), contest_id=contest_id)
+    db_team.members = members
+    db_team.events = events
+    db.add(db_team)
+    db.commit()
+    return teams.team_dict(db_team)
+
+@batch.read("teams", List[schemas.Team])
+@app.get("/teams/", response_model=List[schemas.Team])
+def get_teams(category_id: int = None, event_id: int = None, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    return teams.list_teams(db, contest_id, category_id, event_id)
+
+@app.get("/teams/{team_id}", response_model=schemas.Team)
+def get_team(team_id: int, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    return teams.team_dict(get_team_or_404(db, contest_id, team_id))
+
+@app.put("/teams/{team_id}", response_model=schemas.Team)
+def update_team(team_id: int, team_update: schemas.TeamCreate, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    db_team = get_team_or_404(db, contest_id, team_id)
+    if db.query(models.Team.id).filter(
+        models.Team.contest_id == contest_id,
+        models.Team.name == team_update.name,
+        models.Team.id != team_id
+    ).first():
+        raise HTTPException(status_code=400, detail="Team name already exists")
+    try:
+        members, events = teams.members_and_events(db, contest_id, team_update)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    for key, value in team_update.dict(exclude={"member_ids", "event_ids"}).items():
+        setattr(db_team, key, value)
+    db_team.members = members
+    db_team.events = events
+    db.commit()
+    return teams.team_dict(db_team)
+
+@app.delete("/teams/{team_id}")
+def delete_team(team_id: int, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    team = get_team_or_404(db, contest_id, team_id)
+    db.query(models.TeamResult).filter(models.TeamResult.team_id == team_id).delete()
+    # Memberships and event registrations go with the team
+    db.delete(team)
+    db.commit()
+    return {"message": "Team deleted successfully"}
+
+@app.post("/team-results/")
+def create_team_results(results: List[schemas.TeamResultCreate], db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    try:
+        count = teams.save_results(db, contest_id, results)
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    return {"message": "Team results saved successfully", "count": count}
+
+@batch.read("team_results", List[schemas.TeamResultResponse])
+@app.get("/team-results/", response_model=List[schemas.TeamResultResponse])
+def get_team_results(event_id: int = None, category_id: int = None, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    return teams.fetch_results(db, contest_id, event_id, category_id)
+
+# Place names (states, regions, districts, churches)
+@app.get("/places/{kind}")
+def get_places(kind: str, q: Optional[str] = None, limit: int = 50, db: Session = Depends(get_db)):
+    if kind not in dictionaries.KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown place kind: {kind}")
+    return dictionaries.entries(db, kind, q, max(1, min(limit, 500)))
+
+@batch.read("places")
+@app.get("/reports/places")
+def get_place_rollup(levels: str = "state,region,district,church", db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    level_list = [level.strip() for level in levels.split(",") if level.strip()]
+    unknown = [level for level in level_list if level not in dictionaries.KINDS]
+    if unknown or not level_list:
+        raise HTTPException(status_code=400, detail=f"Levels must be among: {', '.join(dictionaries.KINDS)}")
+    return dictionaries.rollup(db, contest_id, level_list)
+
+@batch.read("rollup")
+@app.get("/reports/rollup")
+def get_rollup(category_id: int = None, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    if category_id is not None and not db.query(models.Category.id).filter(
+        models.Category.id == category_id, models.Category.contest_id == contest_id
+    ).first():
+        raise HTTPException(status_code=404, detail="Category not found")
+    return reports.place_rollup(db, contest_id, category_id)
+
+# Several of the reads above in one round trip, e.g.
+# /batch?include=categories,events,participants&events=ids
+@app.get("/batch")
+def get_batch(request: Request, include: str, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    names = [name.strip() for name in include.split(",") if name.strip()]
+    return batch.run(db, contest_id, names, request.query_params)
+
+# Change feed
+@app.get("/changes")
+def get_changes(
+    after: int = 0,
+    limit: int = 500,
+    tables: Optional[str] = None,
+    wait: float = 0,
+    db: Session = Depends(get_db),
+    contest_id: int = Depends(current_contest)
+):
+    limit = max(1, min(limit, 5000))
+    table_list = tables.split(",") if tables else None
+    page = changes.feed(db, after, limit, table_list, contest_id)
+    if not page["changes"] and wait > 0:
+        # Long poll: woken by NOTIFY on Postgres, polled elsewhere
+        changes.wait_for_changes(db, after, min(wait, 30))
+        page = changes.feed(db, after, limit, table_list, contest_id)
+    return page
+
+# Sync endpoints for offline judge tablets
+@app.get("/sync")
+def sync_pull(since: int = 0, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    return sync.pull(db, since, contest_id)
+
+@app.post("/sync")
+def sync_push(batch: schemas.SyncPush, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    return sync.push(db, batch.edits, batch.on_conflict, contest_id)
+
+# Certificate endpoints
+@app.post("/certificates/jobs", status_code=status.HTTP_202_ACCEPTED)
+def create_certificate_job(job: schemas.CertificateJobCreate, contest_id: int = Depends(current_contest)):
+    from . import certificates
+    job_id = certificates.start_job({**job.dict(), "contest_id": contest_id})
+    return certificates.get_job(job_id)
+
+@app.post("/certificates/jobs/{job_id}/resume", status_code=status.HTTP_202_ACCEPTED)
+def resume_certificate_job(job_id: str):
+    from . import certificates
+    if certificates.start_job({}, job_id=job_id) is None:
+        raise HTTPException(status_code=404, detail="Certificate job not found")
+    return certificates.get_job(job_id)
+
+@app.get("/certificates/jobs/{job_id}")
+def get_certificate_job(job_id: str):
+    from . import certificates
+    job = certificates.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Certificate job not found")
+    return job
+
+@app.get("/certificates/jobs/{job_id}/download")
+def download_certificates(job_id: str):
+    from . import certificates
+    job = certificates.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Certificate job not found")
+    if job.get("status") != "completed":
+        raise HTTPException(status_code=409, detail="Certificate job has not completed")
+    return FileResponse(certificates.zip_path(job_id), media_type="application/zip", filename=f"certificates-{job_id}.zip")
+
+# Job endpoints
+@app.post("/jobs/{kind}", response_model=schemas.Job, status_code=status.HTTP_202_ACCEPTED)
+def create_job(
+    kind: str,
+    payload: dict = Body(default={}),
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    contest_id: int = Depends(current_contest)
+):
+    from . import jobs
+    if kind not in jobs.HANDLERS:
+        raise HTTPException(status_code=404, detail=f"Unknown job kind: {kind}")
+    return jobs.enqueue(db, kind, payload, idempotency_key, contest_id=contest_id)
+
+@app.get("/jobs/{job_id}", response_model=schemas.Job)
+def get_job(job_id: int, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    job = db.query(models.Job).filter(models.Job.contest_id == contest_id, models.Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/download")
+def download_job_output(job_id: int, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
+    job = db.query(models.Job).filter(models.Job.contest_id == contest_id, models.Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "completed" or not (job.result or {}).get("path"):
+        raise HTTPException(status_code=409, detail="Job has no output to download")
+    return FileResponse(job.result["path"], filename=os.path.basename(job.result["path"]))
+
+@batch.read("dashboard")
 @app.get("/dashboard/stats")
-async def get_dashboard_stats(db: Session = Depends(get_db)):
+def get_dashboard_stats(cached: bool = False, db: Session = Depends(get_db), contest_id: int = Depends(current_contest)):
     try:
-        logger.info("Starting to fetch dashboard stats")
-        
-        # Get total counts
-        total_categories = db.query(models.Category).count()
-        logger.info(f"Total categories: {total_categories}")
-        
-        total_events = db.query(models.Event).count()
-        logger.info(f"Total events: {total_events}")
-        
-        total_participants = db.query(models.Participant).count()
-        logger.info(f"Total participants: {total_participants}")
-        
-        # Get completed events (events with results)
-        try:
-            completed_events = db.query(models.Result.event_id.distinct()).count()
-        except Exception as e:
-            logger.error(f"Error getting completed events: {str(e)}")
-            completed_events = 0
-        logger.info(f"Completed events: {completed_events}")
-        
-        # Get recent participants (last 5)
-        try:
-            recent_participants = (
-                db.query(models.Participant)
-                .options(joinedload(models.Participant.category))
-                .options(joinedload(models.Participant.events))
-                .order_by(models.Participant.id.desc())
-                .limit(5)
-                .all()
-            )
-        except Exception as e:
-            logger.error(f"Error getting recent participants: {str(e)}")
-            recent_participants = []
-            
-        # Get category stats
-        try:
-            category_stats = (
-                db.query(
-                    models.Category.name.label('category'),
-                    func.count(models.Participant.id).label('participant_count')
+        if cached:
+            # Serve the latest snapshot built by a "stats" job, if there is one
+            snapshot = (
+                db.query(models.Job)
+                .filter(
+                    models.Job.contest_id == contest_id,
+                    models.Job.kind == "stats",
+                    models.Job.status == "completed"
                 )
-                .outerjoin(models.Participant)
-                .group_by(models.Category.name)
-                .all()
+                .order_by(models.Job.finished_at.desc())
+                .first()
             )
-        except Exception as e:
-            logger.error(f"Error getting category stats: {str(e)}")
-            category_stats = []
-            
-        # Get popular events
-        try:
-            popular_events = (
-                db.query(
-                    models.Event.name,
-                    func.count(models.participant_event.c.participant_id).label('participant_count')
-                )
-                .outerjoin(models.participant_event)
-                .group_by(models.Event.id, models.Event.name)
-                .order_by(text('participant_count DESC'))
-                .limit(6)
-                .all()
-            )
-        except Exception as e:
-            logger.error(f"Error getting popular events: {str(e)}")
-            popular_events = []
-        
-        # Format recent participants data
-        recent_participants_data = []
-        for participant in recent_participants:
-            try:
-                events = [event.name for event in participant.events]
-                recent_participants_data.append({
-                    "id": participant.id,
-                    "name": participant.name,
-                    "chest_number": participant.chest_number,
-                    "category": participant.category.name if participant.category else "No Category",
-                    "events": events
-                })
-            except Exception as e:
-                logger.error(f"Error formatting participant {participant.id}: {str(e)}")
-        
-        # Format category stats
-        category_stats_data = [
-            {"category": stat.category, "participant_count": stat.participant_count}
-            for stat in category_stats
-        ]
-        
-        # Format popular events
-        popular_events_data = [
-            {"name": event.name, "participant_count": event.participant_count}
-            for event in popular_events
-        ]
-        
-        response_data = {
-            "total_categories": total_categories,
-            "total_events": total_events,
-            "total_participants": total_participants,
-            "completed_events": completed_events,
-            "recent_participants": recent_participants_data,
-            "category_stats": category_stats_data,
-            "popular_events": popular_events_data
-        }
-        
-        logger.info("Successfully compiled dashboard stats")
-        return response_data
-        
+            if snapshot:
+                return snapshot.result
+        return dashboard.compute_stats(db, contest_id)
     except Exception as e:
         logger.error(f"Error fetching dashboard stats: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching dashboard stats: {str(e)}"
         )
+
+# Profiling endpoints (need the X-Profile-Token header)
+def require_profile_token(x_profile_token: Optional[str] = Header(None)):
+    if not profiling.token_matches(x_profile_token):
+        raise HTTPException(status_code=403, detail="Profiling is not enabled or the token is invalid")
+
+@app.get("/admin/profiles", dependencies=[Depends(require_profile_token)])
+def get_profiles(limit: int = 50):
+    return profiling.list_profiles(max(1, min(limit, 500)))
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_profile_token)])
+def get_profile(profile_id: str):
+    profile = profiling.get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+@app.get("/admin/profiles/{profile_id}/download", dependencies=[Depends(require_profile_token)])
+def download_profile(profile_id: str):
+    if not profiling.get_profile(profile_id):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    # Open with `python -m pstats` or snakeviz
+    return FileResponse(profiling.prof_path(profile_id), media_type="application/octet-stream", filename=f"{profile_id}.prof")
@@ -1,64 +1,202 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, Table
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Table, DateTime, JSON, Index, UniqueConstraint, inspect
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm.attributes import flag_dirty
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
+# Rows created before contests existed, and clients that do not pick a contest, use this one
+DEFAULT_CONTEST_ID = 1
+
 # Association table for many-to-many relationship between participants and events
 participant_event = Table(
     'participant_event',
     Base.metadata,
     Column('participant_id', Integer, ForeignKey('participants.id')),
-    Column('event_id', Integer, ForeignKey('events.id'))
+    Column('event_id', Integer, ForeignKey('events.id')),
+    # A participant's events, and an event's entrants
+    Index('ix_participant_event_participant', 'participant_id', 'event_id'),
+    Index('ix_participant_event_event', 'event_id', 'participant_id'),
 )
 
+# Members of a team; the participant-first index serves "teams of a participant"
+team_members = Table(
+    'team_members',
+    Base.metadata,
+    Column('team_id', Integer, ForeignKey('teams.id'), primary_key=True),
+    Column('participant_id', Integer, ForeignKey('participants.id'), primary_key=True),
+    Index('ix_team_members_participant', 'participant_id', 'team_id'),
+)
+
+# Events a team is registered for
+team_event = Table(
+    'team_event',
+    Base.metadata,
+    Column('team_id', Integer, ForeignKey('teams.id'), primary_key=True),
+    Column('event_id', Integer, ForeignKey('events.id'), primary_key=True),
+    Index('ix_team_event_event', 'event_id', 'team_id'),
+)
+
+class Contest(Base):
+    """One festival (e.g. a diocese's competition for a given year).
+
+    Every category, event, participant and result belongs to exactly one
+    contest, and all indexes on those tables lead with ``contest_id`` so a
+    large past contest does not slow down queries for the current one.
+    """
+    __tablename__ = 'contests'
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    year = Column(Integer, nullable=True)
+    description = Column(String, nullable=True)
+    # Set once the contest's rows have been moved to cold storage (see app.archive)
+    archived_at = Column(DateTime, nullable=True)
+
 class Category(Base):
     __tablename__ = 'categories'
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, unique=True, index=True)
+    contest_id = Column(Integer, ForeignKey('contests.id'), nullable=False, default=DEFAULT_CONTEST_ID)
+    name = Column(String)
     min_age = Column(Integer)
     max_age = Column(Integer)
+    # Null when the category is open to everyone (see app.eligibility)
+    sex = Column(String, nullable=True)
     description = Column(String)
+    # Keys tried in order when totals tie, e.g. ["judge1", "youngest"] (see app.ranking)
+    tie_breaks = Column(JSON, nullable=True)
 
     events = relationship("Event", back_populates="category")
     participants = relationship("Participant", back_populates="category")
 
+    __table_args__ = (
+        # Category names only need to be unique within a contest
+        UniqueConstraint("contest_id", "name", name="uq_categories_contest_name"),
+    )
+
 class Event(Base):
     __tablename__ = 'events'
 
     id = Column(Integer, primary_key=True, index=True)
+    contest_id = Column(Integer, ForeignKey('contests.id'), nullable=False, default=DEFAULT_CONTEST_ID)
     name = Column(String, index=True)
     category_id = Column(Integer, ForeignKey('categories.id'))
     date = Column(String)
     venue = Column(String)
+    # Rounds are events: qualifiers of this event advance into next_round_id,
+    # either the top N by total marks, those reaching a mark, or both
+    next_round_id = Column(Integer, ForeignKey('events.id'), nullable=True, index=True)
+    qualify_top = Column(Integer, nullable=True)
+    qualify_min_marks = Column(Float, nullable=True)
+    # Snapshot of published_results shown publicly; None until first published
+    published_version = Column(Integer, nullable=True)
+    published_at = Column(DateTime, nullable=True)
 
     category = relationship("Category", back_populates="events")
     participants = relationship("Participant", secondary=participant_event, back_populates="events")
     results = relationship("Result", back_populates="event")
+    teams = relationship("Team", secondary=team_event, back_populates="events")
+
+    __table_args__ = (
+        Index("ix_events_contest_category", "contest_id", "category_id"),
+    )
+
+class _Dictionary:
+    """Lookup table for a place name repeated across participants.
+
+    Participants store the integer id; ``key`` is the name with case, spacing
+    and punctuation folded (see ``app.dictionaries``) so spelling variants
+    share one row.
+    """
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    key = Column(String, nullable=False, unique=True)
+
+class State(_Dictionary, Base):
+    __tablename__ = 'states'
+
+class Region(_Dictionary, Base):
+    __tablename__ = 'regions'
+
+class District(_Dictionary, Base):
+    __tablename__ = 'districts'
+
+class Church(_Dictionary, Base):
+    __tablename__ = 'churches'
+
+class DictionaryName:
+    """A participant's place as a plain string, stored as a dictionary id.
+
+    Assigned names are kept on the instance until the next flush, when
+    ``app.dictionaries`` turns them into ids (adding new names as needed).
+    """
+
+    def __init__(self, entry):
+        self.entry = entry
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        pending = obj.__dict__.get("_pending_names", {})
+        if self.name in pending:
+            return pending[self.name]
+        entry = getattr(obj, self.entry)
+        return entry.name if entry is not None else None
+
+    def __set__(self, obj, value):
+        obj.__dict__.setdefault("_pending_names", {})[self.name] = value
+        if inspect(obj).session is not None:
+            # Nothing mapped changed yet, so make sure the next flush visits it
+            flag_dirty(obj)
 
 class Participant(Base):
     __tablename__ = 'participants'
 
     id = Column(Integer, primary_key=True, index=True)
+    contest_id = Column(Integer, ForeignKey('contests.id'), nullable=False, default=DEFAULT_CONTEST_ID)
     name = Column(String, index=True)
     age = Column(Integer)
     sex = Column(String)
-    chest_number = Column(String, unique=True, index=True)
-    church = Column(String)
-    district = Column(String)
-    region = Column(String)
-    state = Column(String)
+    chest_number = Column(String)
+    state_id = Column(Integer, ForeignKey('states.id'), nullable=True)
+    region_id = Column(Integer, ForeignKey('regions.id'), nullable=True)
+    district_id = Column(Integer, ForeignKey('districts.id'), nullable=True)
+    church_id = Column(Integer, ForeignKey('churches.id'), nullable=True)
     category_id = Column(Integer, ForeignKey('categories.id'))
 
     category = relationship("Category", back_populates="participants")
     events = relationship("Event", secondary=participant_event, back_populates="participants")
     results = relationship("Result", back_populates="participant")
+    teams = relationship("Team", secondary=team_members, back_populates="members")
+
+    # Joined so reading the names costs no extra queries; the lookup tables are small
+    state_entry = relationship("State", lazy="joined")
+    region_entry = relationship("Region", lazy="joined")
+    district_entry = relationship("District", lazy="joined")
+    church_entry = relationship("Church", lazy="joined")
+
+    state = DictionaryName("state_entry")
+    region = DictionaryName("region_entry")
+    district = DictionaryName("district_entry")
+    church = DictionaryName("church_entry")
+
+    __table_args__ = (
+        # Chest numbers restart for every contest
+        UniqueConstraint("contest_id", "chest_number", name="uq_participants_contest_chest_number"),
+        Index("ix_participants_contest_category", "contest_id", "category_id"),
+        # Rollups by state > region > district > church group on these integers
+        Index("ix_participants_contest_place", "contest_id", "state_id", "region_id", "district_id", "church_id"),
+    )
 
 class Result(Base):
     __tablename__ = "results"
 
     id = Column(Integer, primary_key=True, index=True)
+    contest_id = Column(Integer, ForeignKey("contests.id"), nullable=False, default=DEFAULT_CONTEST_ID)
     participant_id = Column(Integer, ForeignKey("participants.id"))
     event_id = Column(Integer, ForeignKey("events.id"))
     judge1_marks = Column(Float, nullable=True)
@@ -69,3 +207,146 @@ class Result(Base):
 
     participant = relationship("Participant", back_populates="results")
     event = relationship("Event", back_populates="results")
+
+    __table_args__ = (
+        Index("ix_results_contest_event", "contest_id", "event_id", "rank"),
+        Index("ix_results_contest_participant", "contest_id", "participant_id", "event_id"),
+    )
+
+class PublishedResult(Base):
+    """Frozen copy of an event's results as published.
+
+    Rows are only ever inserted (one set per version) and pruned once
+    superseded, never updated; the event's ``published_version`` picks the
+    set readers see. Participant names are copied so a snapshot does not
+    change until the next publish.
+    """
+    __tablename__ = "published_results"
+
+    id = Column(Integer, primary_key=True)
+    contest_id = Column(Integer, ForeignKey("contests.id"), nullable=False, default=DEFAULT_CONTEST_ID)
+    event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
+    version = Column(Integer, nullable=False)
+    participant_id = Column(Integer, nullable=False)
+    participant_name = Column(String, nullable=True)
+    chest_number = Column(String, nullable=True)
+    judge1_marks = Column(Float, nullable=True)
+    judge2_marks = Column(Float, nullable=True)
+    judge3_marks = Column(Float, nullable=True)
+    total_marks = Column(Float, nullable=True)
+    rank = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_published_results_event_version", "event_id", "version", "rank"),
+    )
+
+class Team(Base):
+    """A group entering group events (songs, skits) as one entrant."""
+    __tablename__ = "teams"
+
+    id = Column(Integer, primary_key=True, index=True)
+    contest_id = Column(Integer, ForeignKey("contests.id"), nullable=False, default=DEFAULT_CONTEST_ID)
+    name = Column(String, nullable=False)
+    chest_number = Column(String, nullable=True)
+    category_id = Column(Integer, ForeignKey("categories.id"))
+
+    category = relationship("Category")
+    members = relationship("Participant", secondary=team_members, back_populates="teams")
+    events = relationship("Event", secondary=team_event, back_populates="teams")
+    results = relationship("TeamResult", back_populates="team")
+
+    __table_args__ = (
+        UniqueConstraint("contest_id", "name", name="uq_teams_contest_name"),
+        Index("ix_teams_contest_category", "contest_id", "category_id"),
+    )
+
+class TeamResult(Base):
+    """Marks of a team in a group event; ranked among the event's teams."""
+    __tablename__ = "team_results"
+
+    id = Column(Integer, primary_key=True, index=True)
+    contest_id = Column(Integer, ForeignKey("contests.id"), nullable=False, default=DEFAULT_CONTEST_ID)
+    team_id = Column(Integer, ForeignKey("teams.id"), nullable=False)
+    event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
+    judge1_marks = Column(Float, nullable=True)
+    judge2_marks = Column(Float, nullable=True)
+    judge3_marks = Column(Float, nullable=True)
+    total_marks = Column(Float, nullable=True)
+    rank = Column(Integer, nullable=True)
+
+    team = relationship("Team", back_populates="results")
+    event = relationship("Event")
+
+    __table_args__ = (
+        UniqueConstraint("team_id", "event_id", name="uq_team_results_team_event"),
+        Index("ix_team_results_contest_event", "contest_id", "event_id", "rank"),
+    )
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    contest_id = Column(Integer, ForeignKey("contests.id"), nullable=True)
+    kind = Column(String, nullable=False)
+    # queued -> running -> completed | failed (failed runs are re-queued until max_attempts)
+    status = Column(String, nullable=False, default="queued")
+    payload = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    idempotency_key = Column(String, nullable=True)
+    run_after = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+        Index("ix_jobs_contest_kind", "contest_id", "kind", "status"),
+        # Keys are the client's; two contests may well pick the same one
+        UniqueConstraint("contest_id", "idempotency_key", name="uq_jobs_contest_idempotency_key"),
+    )
+
+class ResultAudit(Base):
+    """Append-only history of result changes.
+
+    On Postgres the table is hash-partitioned by event_id (see the migration),
+    so a history lookup only touches one partition.
+    """
+    __tablename__ = "result_audit"
+
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, nullable=False)
+    participant_id = Column(Integer, nullable=False)
+    result_id = Column(Integer, nullable=True)
+    action = Column(String, nullable=False)  # insert, update or delete
+    judge1_marks = Column(Float, nullable=True)
+    judge2_marks = Column(Float, nullable=True)
+    judge3_marks = Column(Float, nullable=True)
+    total_marks = Column(Float, nullable=True)
+    rank = Column(Integer, nullable=True)
+    changed_by = Column(String, nullable=True)
+    changed_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_result_audit_participant_event", "participant_id", "event_id", "id"),
+    )
+
+class ChangeLog(Base):
+    """Monotonic log of row changes, used for delta sync and the /changes feed."""
+    __tablename__ = "change_log"
+
+    seq = Column(Integer, primary_key=True)
+    contest_id = Column(Integer, nullable=True)
+    table_name = Column(String, nullable=False)
+    row_id = Column(Integer, nullable=False)
+    # Second half of the key for participant_event rows (row_id is the participant)
+    related_id = Column(Integer, nullable=True)
+    op = Column(String, nullable=False)  # upsert or delete
+    changed_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_change_log_table_row", "table_name", "row_id", "seq"),
+        Index("ix_change_log_contest_seq", "contest_id", "seq"),
+    )
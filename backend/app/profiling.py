@@ -0,0 +1,246 @@
+"""Opt-in profiling of single requests.
+
+A request is profiled when it carries an ``X-Profile-Token`` header matching
+``PROFILE_TOKEN``, or when it is picked by ``PROFILE_SAMPLE_RATE`` (the
+fraction of requests to profile, 0 by default). For those requests the
+endpoint runs under cProfile and every SQL statement is timed; the result is
+written to ``PROFILE_DIR`` and served by the ``/admin/profiles`` endpoints,
+and the response carries its id in ``X-Profile-Id``.
+
+With neither setting configured the middleware passes requests straight
+through, and nothing is hooked into SQLAlchemy until the first profiled
+request.
+"""
+import asyncio
+import contextvars
+import cProfile
+import hmac
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from fastapi import Request
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from sqlalchemy.engine import Engine
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Oldest profiles beyond this many are deleted
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+# Functions listed in the JSON summary; the .prof download has all of them
+PROFILE_TOP = 40
+
+_current = contextvars.ContextVar("judgify_profile", default=None)
+_installed = False
+_install_lock = threading.Lock()
+
+
+def token_matches(token):
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def reason_to_profile(request):
+    """Why this request should be profiled ("requested" or "sampled"), or None."""
+    if request.url.path.startswith("/admin/profiles"):
+        # Reading profiles would otherwise bury the ones being looked for
+        return None
+    if token_matches(request.headers.get("x-profile-token")):
+        return "requested"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+class RequestProfile:
+    def __init__(self, request, reason):
+        self.id = f"{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.method = request.method
+        self.path = request.url.path
+        self.query = request.url.query
+        self.reason = reason
+        self.started_at = datetime.utcnow()
+        self.profiler = cProfile.Profile()
+        self.statements = []
+        self._started = time.perf_counter()
+
+    def run(self, func, *args, **kwargs):
+        # cProfile only sees the thread it is enabled in, so it is switched on
+        # around the endpoint call in the worker thread that runs it
+        self.profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.profiler.disable()
+
+    def summary(self, status_code):
+        # pstats.Stats refuses an empty profile (the endpoint never ran), so read the raw table
+        self.profiler.create_stats()
+        rows = sorted(self.profiler.stats.items(), key=lambda item: item[1][3], reverse=True)
+        functions = [
+            {
+                "function": f"{file_name}:{line}({name})",
+                "calls": calls,
+                "total_ms": round(total * 1000, 3),
+                "cumulative_ms": round(cumulative * 1000, 3),
+            }
+            for (file_name, line, name), (_, calls, total, cumulative, _) in rows[:PROFILE_TOP]
+        ]
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "reason": self.reason,
+            "status_code": status_code,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "sql_count": len(self.statements),
+            "sql_ms": round(sum(s["duration_ms"] for s in self.statements), 3),
+            "statements": self.statements,
+            "functions": functions,
+        }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is not None and conn.info.get("profile_query_start"):
+        started = conn.info["profile_query_start"].pop()
+        # Parameters are left out; they can hold participants' personal details
+        profile.statements.append({
+            "statement": statement,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "executemany": executemany,
+        })
+
+
+def _install():
+    global _installed
+    with _install_lock:
+        if not _installed:
+            # On the Engine class, so engines created later are covered too
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            _installed = True
+
+
+def finish(profile, status_code):
+    """Write the profile to PROFILE_DIR and return its summary."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    data = profile.summary(status_code)
+    profile.profiler.dump_stats(prof_path(profile.id))
+    tmp_path = os.path.join(PROFILE_DIR, f"{profile.id}.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, os.path.join(PROFILE_DIR, f"{profile.id}.json"))
+    _prune()
+    return data
+
+
+def _prune():
+    ids = sorted(name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith(".json"))
+    for profile_id in ids[:-PROFILE_KEEP] if len(ids) > PROFILE_KEEP else []:
+        for path in (os.path.join(PROFILE_DIR, f"{profile_id}.json"), prof_path(profile_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _valid_id(profile_id):
+    return all(c.isalnum() or c == "-" for c in profile_id)
+
+
+def prof_path(profile_id):
+    return os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+
+
+def get_profile(profile_id):
+    if not _valid_id(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def list_profiles(limit=50):
+    """Newest profiles first, without their statement and function lists."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    ids = sorted((name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith(".json")), reverse=True)
+    profiles = []
+    for profile_id in ids[:limit]:
+        data = get_profile(profile_id)
+        if data:
+            profiles.append({key: value for key, value in data.items() if key not in ("statements", "functions")})
+    return profiles
+
+
+class ProfiledRoute(APIRoute):
+    """Route that runs its endpoint under the request's profiler, if it has one."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        call = self.dependant.call
+        # Async endpoints run on the event loop, where cProfile would see every
+        # other request too; only sync endpoints (all of ours) are wrapped
+        if asyncio.iscoroutinefunction(call):
+            return
+
+        def profiled(*call_args, **call_kwargs):
+            profile = _current.get()
+            if profile is None:
+                return call(*call_args, **call_kwargs)
+            return profile.run(call, *call_args, **call_kwargs)
+
+        self.dependant.call = profiled
+
+
+class ProfilingMiddleware:
+    """Profiles the requests picked by ``reason_to_profile``."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (PROFILE_TOKEN or PROFILE_SAMPLE_RATE > 0):
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        reason = reason_to_profile(request)
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        _install()
+        profile = RequestProfile(request, reason)
+        # Copied into the tasks and worker threads that handle this request
+        reset_token = _current.set(profile)
+        status_code = 500
+
+        async def send_with_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("X-Profile-Id", profile.id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _current.reset(reset_token)
+            await run_in_threadpool(finish, profile, status_code)
@@ -0,0 +1,163 @@
+"""Draft and published results.
+
+Marks entered through the API are drafts: ``GET /results/`` shows them to
+organisers, but the public board does not. Publishing an event copies its
+current results into ``published_results`` under a new version with one
+INSERT ... SELECT and then points ``events.published_version`` at it, in the
+same transaction. Ranks are recomputed in the database first (see
+app.ranking), so the published order always follows the category's
+tie-break chain whatever the entering client sent. Readers join through
+that pointer in a single statement, so they see either the previous version
+or the complete new one without taking locks, and a half-entered event
+never shows.
+
+A snapshot never changes once written, so public responses carry an ETag
+built from the published versions and can be cached until the next publish.
+"""
+import hashlib
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, literal, select
+
+from . import models, ranking
+
+_COPIED = (
+    "participant_id",
+    "judge1_marks",
+    "judge2_marks",
+    "judge3_marks",
+    "total_marks",
+    "rank",
+)
+
+
+def publish(db, event):
+    """Snapshot the event's results and make them the published version; the caller commits."""
+    # Serialises publishes of the same event (a no-op on SQLite)
+    db.query(models.Event.id).filter(models.Event.id == event.id).with_for_update().one()
+    latest = db.query(func.max(models.PublishedResult.version)).filter(
+        models.PublishedResult.event_id == event.id
+    ).scalar()
+    version = max(latest or 0, event.published_version or 0) + 1
+    ranking.rerank(db, [event.id])
+
+    snapshot = (
+        select(
+            models.Result.contest_id,
+            models.Result.event_id,
+            literal(version),
+            models.Participant.name,
+            models.Participant.chest_number,
+            *[getattr(models.Result, column) for column in _COPIED],
+        )
+        .join(models.Participant, models.Result.participant_id == models.Participant.id)
+        .where(models.Result.event_id == event.id)
+    )
+    copied = db.execute(insert(models.PublishedResult).from_select(
+        ["contest_id", "event_id", "version", "participant_name", "chest_number", *_COPIED], snapshot
+    )).rowcount
+
+    # The flip; the superseded snapshot is no longer reachable and goes too
+    event.published_version = version
+    event.published_at = datetime.utcnow()
+    db.flush()
+    db.execute(delete(models.PublishedResult).where(
+        models.PublishedResult.event_id == event.id,
+        models.PublishedResult.version < version,
+    ))
+    return {"event_id": event.id, "version": version, "results": copied}
+
+
+def unpublish(db, event):
+    """Hide the event's results from the public again; the caller commits."""
+    event.published_version = None
+    event.published_at = None
+
+
+def _published(query, contest_id, event_id=None, category_id=None, event_ids=None):
+    query = query.outerjoin(
+        models.Category, models.Event.category_id == models.Category.id
+    ).filter(
+        models.Event.contest_id == contest_id,
+        models.Event.published_version.isnot(None),
+    )
+    if event_id:
+        query = query.filter(models.Event.id == event_id)
+    elif category_id:
+        query = query.filter(models.Event.category_id == category_id)
+    if event_ids is not None:
+        query = query.filter(models.Event.id.in_(event_ids))
+    return query
+
+
+_EVENT_COLUMNS = (
+    models.Event.id.label("event_id"),
+    models.Event.name.label("event_name"),
+    models.Event.category_id,
+    models.Category.name.label("category_name"),
+    models.Event.published_version.label("version"),
+    models.Event.published_at,
+)
+
+
+def etag(events):
+    """Changes whenever any of these events is published, unpublished or renamed."""
+    key = repr([
+        (e["event_id"], e["version"], e["published_at"], e["event_name"], e["category_name"])
+        for e in events
+    ])
+    return f'"{hashlib.sha1(key.encode()).hexdigest()[:20]}"'
+
+
+def current_etag(db, contest_id, **filters):
+    """ETag of the published results matching ``filters``, without reading them."""
+    events = _published(db.query(*_EVENT_COLUMNS), contest_id, **filters).order_by(models.Event.id)
+    return etag([row._asdict() for row in events])
+
+
+def snapshots(db, contest_id, **filters):
+    """(payloads, etag) of the published events matching ``filters``.
+
+    Events and their snapshot rows are read in one statement, so a publish
+    committing meanwhile is seen either entirely or not at all.
+    """
+    snapshot = models.PublishedResult
+    rows = _published(
+        db.query(*_EVENT_COLUMNS, snapshot).outerjoin(
+            snapshot,
+            (snapshot.event_id == models.Event.id) & (snapshot.version == models.Event.published_version),
+        ),
+        contest_id, **filters,
+    ).order_by(
+        models.Event.id,
+        snapshot.rank.is_(None),
+        snapshot.rank,
+        snapshot.total_marks.desc(),
+    )
+
+    payloads = {}
+    for row in rows:
+        payload = payloads.get(row.event_id)
+        if payload is None:
+            payload = payloads[row.event_id] = {
+                "event_id": row.event_id,
+                "event_name": row.event_name,
+                "category_id": row.category_id,
+                "category_name": row.category_name,
+                "version": row.version,
+                "published_at": row.published_at,
+                "results": [],
+            }
+        result = row.PublishedResult
+        if result is not None:
+            payload["results"].append({
+                "rank": result.rank,
+                "participant_name": result.participant_name,
+                "chest_number": result.chest_number,
+                "judge1_marks": result.judge1_marks,
+                "judge2_marks": result.judge2_marks,
+                "judge3_marks": result.judge3_marks,
+                "total_marks": result.total_marks,
+            })
+    events = list(payloads.values())
+    return events, etag(events)
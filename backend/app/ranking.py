@@ -0,0 +1,124 @@
+"""Ranking results within their event.
+
+Results are ranked by total marks with one window query. A category can set a
+tie-break chain (``categories.tie_breaks``), a list of the keys below tried in
+order when totals are equal, e.g. ``["judge1", "youngest"]``. The chains of
+all categories involved are compiled into extra ``ORDER BY`` terms of the
+same window, one ``CASE`` on the event's category per position in the chain,
+so ties are resolved in the database in the same pass. Rows still equal on
+every key share a rank.
+"""
+from sqlalchemy import case, func, update
+
+from . import audit, changes, models
+
+# key -> (column on the ranked model, or None for a participant column; higher wins)
+TIE_BREAKS = {
+    "judge1": ("judge1_marks", True),
+    "judge2": ("judge2_marks", True),
+    "judge3": ("judge3_marks", True),
+    "youngest": (None, False),
+    "oldest": (None, True),
+}
+
+
+def check_tie_breaks(tie_breaks):
+    """Raise ValueError unless ``tie_breaks`` is a list of distinct known keys."""
+    if not tie_breaks:
+        return
+    unknown = [key for key in tie_breaks if key not in TIE_BREAKS]
+    if unknown:
+        raise ValueError(f"Unknown tie-break {unknown[0]}; use one of {', '.join(TIE_BREAKS)}")
+    if len(set(tie_breaks)) != len(tie_breaks):
+        raise ValueError("Each tie-break can only be used once")
+
+
+def _key(model, key):
+    column, higher_wins = TIE_BREAKS[key]
+    if column is not None:
+        value = getattr(model, column)
+    elif model is models.Result:
+        value = models.Participant.age
+    else:
+        # Teams have no age; the key is skipped for them
+        return None
+    return value if higher_wins else -value
+
+
+def tie_break_order(db, event_ids=None, model=models.Result):
+    """Extra ORDER BY terms for the tie-break chains of the events' categories.
+
+    Empty when none of the categories has a chain, so plain rankings need no
+    joins. Otherwise the terms read ``events.category_id`` (and, for Result,
+    ``participants.age``), which ``ranked_results`` joins in.
+    """
+    chains = db.query(models.Category.id, models.Category.tie_breaks).filter(
+        models.Category.tie_breaks.isnot(None)
+    )
+    if event_ids is not None:
+        chains = chains.filter(models.Category.id.in_(
+            db.query(models.Event.category_id).filter(models.Event.id.in_(event_ids))
+        ))
+    chains = {category_id: tie_breaks for category_id, tie_breaks in chains if tie_breaks}
+
+    order = []
+    for position in range(max((len(chain) for chain in chains.values()), default=0)):
+        whens = {}
+        for category_id, chain in chains.items():
+            if position < len(chain):
+                value = _key(model, chain[position])
+                if value is not None:
+                    whens[category_id] = value
+        if whens:
+            key = case(whens, value=models.Event.category_id)
+            # Missing marks or age never win a tie
+            order.append(key.desc().nulls_last())
+    return order
+
+
+def rank_over(model=models.Result, tie_breaks=()):
+    """Window ranking rows of ``model`` (Result or TeamResult) within their event by total marks.
+
+    ``tie_breaks`` are further ORDER BY terms (see ``tie_break_order``); rows
+    equal on all of them share a rank.
+    """
+    return func.rank().over(
+        partition_by=model.event_id,
+        order_by=[model.total_marks.desc(), *tie_breaks],
+    )
+
+
+def ranked_query(db, query, event_ids=None, model=models.Result):
+    """(rank window, query with the joins the tie-break chains read)."""
+    tie_breaks = tie_break_order(db, event_ids, model)
+    if tie_breaks:
+        query = query.join(models.Event, model.event_id == models.Event.id)
+        if model is models.Result:
+            query = query.join(models.Participant, model.participant_id == models.Participant.id)
+    return rank_over(model, tie_breaks), query
+
+
+def ranked_results(db, event_ids=None, model=models.Result):
+    """Query of (id, contest_id, rank, new_rank) with ranks recomputed per event."""
+    new_rank, query = ranked_query(db, db.query(model.id), event_ids, model)
+    query = query.add_columns(model.contest_id, model.rank, new_rank.label("new_rank")).filter(
+        model.total_marks.isnot(None)
+    )
+    if event_ids is not None:
+        query = query.filter(model.event_id.in_(event_ids))
+    return query
+
+
+def rerank(db, event_ids=None, model=models.Result):
+    """Recompute ranks in one window query and write back only the rows that moved.
+
+    The bulk UPDATE bypasses the flush hooks, so moved rows are logged to the
+    change log (and, for Result, the audit trail) here.
+    """
+    moved = [row for row in ranked_results(db, event_ids, model) if row.rank != row.new_rank]
+    if moved:
+        db.execute(update(model), [{"id": row.id, "rank": row.new_rank} for row in moved])
+        changes.record_rows(db, changes.TRACKED_MODELS[model], [(row.id, row.contest_id) for row in moved])
+        if model is models.Result:
+            audit.record_bulk(db, "update", models.Result.id.in_([row.id for row in moved]))
+    return len(moved)
@@ -0,0 +1,275 @@
+"""Aggregated result reports computed in the database."""
+import math
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import case, func, or_, select, tuple_
+
+from . import changes, dictionaries, models
+
+MARK_COLUMNS = {
+    "judge1": models.Result.judge1_marks,
+    "judge2": models.Result.judge2_marks,
+    "judge3": models.Result.judge3_marks,
+    "total": models.Result.total_marks,
+}
+
+
+def _mark_stats(row, name):
+    mean = row[f"{name}_mean"]
+    if mean is None:
+        return {"mean": None, "stdev": None, "min": None, "max": None}
+    # Population standard deviation from E[x^2] - E[x]^2 (SQLite has no stddev)
+    variance = max(row[f"{name}_mean_sq"] - mean * mean, 0.0)
+    return {
+        "mean": round(mean, 3),
+        "stdev": round(math.sqrt(variance), 3),
+        "min": row[f"{name}_min"],
+        "max": row[f"{name}_max"],
+    }
+
+
+def results_summary(db, contest_id, category_id, top=3):
+    """Per event of a category: winners (rank <= top), entrant counts and mark statistics.
+
+    Statistics are window aggregates over each event's results, so one query
+    returns the top rows plus one carrier row for every event.
+    """
+    per_event = {"partition_by": models.Event.id}
+    # Only this category's registrations are counted, not the whole table
+    entrants = (
+        select(models.participant_event.c.event_id, func.count().label("entrants"))
+        .join(models.Event, models.Event.id == models.participant_event.c.event_id)
+        .where(models.Event.contest_id == contest_id, models.Event.category_id == category_id)
+        .group_by(models.participant_event.c.event_id)
+        .subquery()
+    )
+
+    columns = [
+        models.Event.id.label("event_id"),
+        models.Event.name.label("event_name"),
+        func.coalesce(entrants.c.entrants, 0).label("entrants"),
+        func.count(models.Result.id).over(**per_event).label("scored"),
+        models.Result.participant_id,
+        models.Participant.name.label("participant_name"),
+        models.Participant.chest_number,
+        models.Result.rank,
+        models.Result.total_marks,
+        func.row_number().over(
+            order_by=(models.Result.rank.is_(None), models.Result.rank, models.Result.id), **per_event
+        ).label("row_number"),
+    ]
+    for name, column in MARK_COLUMNS.items():
+        columns += [
+            func.avg(column).over(**per_event).label(f"{name}_mean"),
+            func.avg(column * column).over(**per_event).label(f"{name}_mean_sq"),
+            func.min(column).over(**per_event).label(f"{name}_min"),
+            func.max(column).over(**per_event).label(f"{name}_max"),
+        ]
+
+    ranked = (
+        select(*columns)
+        .select_from(models.Event)
+        .outerjoin(models.Result, models.Result.event_id == models.Event.id)
+        .outerjoin(models.Participant, models.Result.participant_id == models.Participant.id)
+        .outerjoin(entrants, entrants.c.event_id == models.Event.id)
+        .where(models.Event.contest_id == contest_id, models.Event.category_id == category_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(ranked)
+        .where(or_(ranked.c.row_number == 1, ranked.c.rank <= top))
+        .order_by(ranked.c.event_id, ranked.c.row_number)
+    ).mappings()
+
+    events = {}
+    for row in rows:
+        event = events.get(row["event_id"])
+        if event is None:
+            event = events[row["event_id"]] = {
+                "event_id": row["event_id"],
+                "event_name": row["event_name"],
+                "entrants": row["entrants"],
+                "scored": row["scored"],
+                "winners": [],
+                "marks": {name: _mark_stats(row, name) for name in MARK_COLUMNS},
+            }
+        if row["rank"] is not None and row["rank"] <= top:
+            event["winners"].append({
+                "participant_id": row["participant_id"],
+                "participant_name": row["participant_name"],
+                "chest_number": row["chest_number"],
+                "rank": row["rank"],
+                "total_marks": row["total_marks"],
+            })
+
+    return {"category_id": category_id, "top": top, "events": list(events.values())}
+
+
+# Place levels of the rollup, outermost first
+PLACE_LEVELS = ("state", "region", "district", "church")
+# Ranks 1, 2 and 3
+MEDALS = ("gold", "silver", "bronze")
+# Grouping columns, in the order of the GROUPING() bit mask
+_GROUP_COLUMNS = ("category_id",) + PLACE_LEVELS
+_COUNTS = ("participants", "entries") + MEDALS
+
+ROLLUP_CACHE_SIZE = 64
+# (contest id, category id, changes.latest_version) -> rows; every write to a
+# tracked table moves the version on, so a stale entry is never hit again
+_rollup_cache = OrderedDict()
+_rollup_lock = threading.Lock()
+
+
+def _per_participant(contest_id, category_id):
+    """One row per participant: category, place ids, event entries and medals."""
+    entries = (
+        select(models.participant_event.c.participant_id, func.count().label("entries"))
+        .join(models.Event, models.Event.id == models.participant_event.c.event_id)
+        .where(models.Event.contest_id == contest_id)
+        .group_by(models.participant_event.c.participant_id)
+        .subquery()
+    )
+    medals = (
+        select(
+            models.Result.participant_id,
+            *[
+                func.sum(case((models.Result.rank == rank, 1), else_=0)).label(medal)
+                for rank, medal in enumerate(MEDALS, start=1)
+            ],
+        )
+        .where(models.Result.contest_id == contest_id, models.Result.rank <= len(MEDALS))
+        .group_by(models.Result.participant_id)
+        .subquery()
+    )
+    query = (
+        select(
+            models.Participant.id,
+            models.Participant.category_id,
+            *[getattr(models.Participant, f"{level}_id").label(level) for level in PLACE_LEVELS],
+            func.coalesce(entries.c.entries, 0).label("entries"),
+            *[func.coalesce(medals.c[medal], 0).label(medal) for medal in MEDALS],
+        )
+        .outerjoin(entries, entries.c.participant_id == models.Participant.id)
+        .outerjoin(medals, medals.c.participant_id == models.Participant.id)
+        .where(models.Participant.contest_id == contest_id)
+    )
+    if category_id is not None:
+        query = query.where(models.Participant.category_id == category_id)
+    return query.subquery()
+
+
+def _grouping_sets(category_id):
+    # Every prefix of category -> state -> region -> district -> church; without
+    # a category filter also the whole contest and each place prefix across categories
+    if category_id is not None:
+        return [_GROUP_COLUMNS[:n] for n in range(len(_GROUP_COLUMNS), 0, -1)]
+    return (
+        [_GROUP_COLUMNS[:n] for n in range(len(_GROUP_COLUMNS), -1, -1)]
+        + [PLACE_LEVELS[:n] for n in range(len(PLACE_LEVELS), 0, -1)]
+    )
+
+
+def _grouped_sql(db, base, category_id):
+    columns = [base.c[name] for name in _GROUP_COLUMNS]
+    places = columns[1:]
+    if category_id is not None:
+        group_by = [columns[0], func.rollup(*places)]
+    else:
+        group_by = [func.grouping_sets(
+            func.rollup(*columns), *[tuple_(*places[:n]) for n in range(len(places), 0, -1)]
+        )]
+    query = select(
+        *columns,
+        func.grouping(*columns).label("grouping_mask"),
+        func.count(base.c.id).label("participants"),
+        *[func.sum(base.c[name]).label(name) for name in _COUNTS[1:]],
+    ).group_by(*group_by)
+    for row in db.execute(query).mappings():
+        # A set bit marks a column aggregated away; the last column is bit 0
+        key = {
+            name: row[name] for bit, name in enumerate(reversed(_GROUP_COLUMNS))
+            if not row["grouping_mask"] & (1 << bit)
+        }
+        yield key, {name: int(row[name] or 0) for name in _COUNTS}
+
+
+def _grouped_python(db, base, category_id):
+    # For databases without GROUPING SETS (SQLite): the same sets summed here
+    sets = _grouping_sets(category_id)
+    totals = {}
+    for row in db.execute(select(base)).mappings():
+        for names in sets:
+            group = totals.setdefault((names, tuple(row[name] for name in names)), dict.fromkeys(_COUNTS, 0))
+            group["participants"] += 1
+            for name in _COUNTS[1:]:
+                group[name] += row[name]
+    for (names, values), counts in totals.items():
+        yield dict(zip(names, values)), counts
+
+
+def _order(row):
+    # Category, then each place level with its subtotal row ahead of its
+    # members; rows across all categories and unnamed (null) places come last
+    depth = PLACE_LEVELS.index(row["level"]) + 1 if row["level"] in PLACE_LEVELS else 0
+    key = [row["category_id"] is None, row["category"] or ""]
+    for i, place in enumerate(PLACE_LEVELS):
+        key.append((0,) if i >= depth else (1, row[place] is None, row[place] or ""))
+    return key
+
+
+def _rollup(db, contest_id, category_id):
+    base = _per_participant(contest_id, category_id)
+    grouped = _grouped_sql if db.get_bind().dialect.name == "postgresql" else _grouped_python
+    groups = list(grouped(db, base, category_id))
+    top = {} if category_id is None else {"category_id": category_id}
+    if top not in [key for key, _ in groups]:
+        # No participants yet; report zeros rather than nothing
+        groups.append((top, dict.fromkeys(_COUNTS, 0)))
+
+    categories = dict(
+        db.query(models.Category.id, models.Category.name).filter(models.Category.contest_id == contest_id)
+    )
+    names = {}
+    for level in PLACE_LEVELS:
+        ids = {key[level] for key, _ in groups if key.get(level) is not None}
+        model = dictionaries.KINDS[level]
+        names[level] = dict(db.query(model.id, model.name).filter(model.id.in_(ids))) if ids else {}
+
+    rows = []
+    for key, counts in groups:
+        places = [level for level in PLACE_LEVELS if level in key]
+        row = {
+            "level": places[-1] if places else ("category" if "category_id" in key else "total"),
+            "category_id": key.get("category_id"),
+            "category": categories.get(key.get("category_id")),
+        }
+        for level in PLACE_LEVELS:
+            row[level] = names[level].get(key.get(level))
+        row.update(counts)
+        row["medals"] = sum(counts[medal] for medal in MEDALS)
+        rows.append(row)
+    return sorted(rows, key=_order)
+
+
+def place_rollup(db, contest_id, category_id=None):
+    """Participants, event entries and medals per category and place.
+
+    One row per group at every level of category -> state -> region ->
+    district -> church, plus (without ``category_id``) the whole contest and
+    the place levels across all categories. ``level`` names the deepest
+    column a row is grouped by. On Postgres every level comes from one
+    GROUPING SETS query; results are cached until the next commit to the
+    change log.
+    """
+    key = (contest_id, category_id, changes.latest_version(db))
+    with _rollup_lock:
+        if key in _rollup_cache:
+            _rollup_cache.move_to_end(key)
+            return _rollup_cache[key]
+    rows = _rollup(db, contest_id, category_id)
+    with _rollup_lock:
+        _rollup_cache[key] = rows
+        while len(_rollup_cache) > ROLLUP_CACHE_SIZE:
+            _rollup_cache.popitem(last=False)
+    return rows
@@ -0,0 +1,99 @@
+"""Heats, semi-finals and finals.
+
+A round is an ordinary event whose ``next_round_id`` points at the round its
+qualifiers go on to, so marks, ranks and certificates work per round like
+any other event, and several heats can feed one final. Who qualifies is set
+on the event: the top ``qualify_top`` by total marks (ties at the cut that
+the category's tie-break chain cannot separate all go through), everyone
+reaching ``qualify_min_marks``, or both.
+
+``advance`` picks the qualifiers with one ranked query and registers them for
+the next round with a single INSERT ... SELECT, so a heat of thousands is
+advanced in a handful of statements and one transaction.
+"""
+from sqlalchemy import exists, func, insert, literal, select
+
+from . import changes, models, ranking
+
+
+def check_round(db, contest_id, event_id, event):
+    """Validate the round settings of ``event`` (an EventCreate); raises ValueError."""
+    if event.qualify_top is not None and event.qualify_top < 1:
+        raise ValueError("qualify_top must be at least 1")
+    if event.next_round_id is None:
+        return
+    if event.next_round_id == event_id:
+        raise ValueError("An event cannot be its own next round")
+    next_round = db.query(models.Event).filter(
+        models.Event.contest_id == contest_id,
+        models.Event.id == event.next_round_id
+    ).first()
+    if next_round is None:
+        raise ValueError("Next round does not exist")
+    if next_round.category_id != event.category_id:
+        raise ValueError("Next round must be in the same category")
+    # Follow the chain on from the next round; coming back here would loop
+    seen = {next_round.id}
+    while next_round.next_round_id is not None:
+        if next_round.next_round_id == event_id or next_round.next_round_id in seen:
+            raise ValueError("Rounds cannot form a cycle")
+        seen.add(next_round.next_round_id)
+        next_round = db.get(models.Event, next_round.next_round_id)
+
+
+def qualifiers(db, event):
+    """Select of the ids of participants who qualify from ``event``.
+
+    Places follow the category's tie-break chain, so a tie at the cut only
+    takes everyone through when the chain cannot separate them.
+    """
+    place, ranked = ranking.ranked_query(db, select(models.Result.participant_id), [event.id])
+    ranked = (
+        ranked.add_columns(models.Result.total_marks, place.label("place"))
+        .where(models.Result.event_id == event.id, models.Result.total_marks.isnot(None))
+        .subquery()
+    )
+    query = select(ranked.c.participant_id)
+    if event.qualify_top is not None:
+        query = query.where(ranked.c.place <= event.qualify_top)
+    if event.qualify_min_marks is not None:
+        query = query.where(ranked.c.total_marks >= event.qualify_min_marks)
+    return query
+
+
+def advance(db, event):
+    """Register the qualifiers of ``event`` for its next round; the caller commits.
+
+    Qualifiers already registered are left alone, so advancing again after a
+    mark is corrected only adds the newcomers. Raises ValueError if the event
+    has no next round or no qualification rule.
+    """
+    if event.next_round_id is None:
+        raise ValueError("Event has no next round")
+    if event.qualify_top is None and event.qualify_min_marks is None:
+        raise ValueError("Event has no qualification rule (qualify_top or qualify_min_marks)")
+
+    # Serialises concurrent advances into the same round (a no-op on SQLite)
+    db.query(models.Event.id).filter(models.Event.id == event.next_round_id).with_for_update().one()
+
+    qualified = qualifiers(db, event).subquery()
+    registered = exists().where(
+        models.participant_event.c.participant_id == qualified.c.participant_id,
+        models.participant_event.c.event_id == event.next_round_id,
+    )
+    new = select(
+        qualified.c.participant_id,
+        literal(event.next_round_id).label("event_id"),
+    ).where(~registered)
+
+    total = db.execute(select(func.count()).select_from(qualified)).scalar()
+    changes.record_memberships(db, new, event.contest_id)
+    inserted = db.execute(
+        insert(models.participant_event).from_select(["participant_id", "event_id"], new)
+    ).rowcount
+    return {
+        "event_id": event.id,
+        "next_round_id": event.next_round_id,
+        "qualified": total,
+        "registered": inserted,
+    }
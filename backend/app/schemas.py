@@ -1,11 +1,29 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, List, Literal, Optional
+from datetime import datetime
+
+class ContestBase(BaseModel):
+    name: str
+    year: Optional[int] = None
+    description: Optional[str] = None
+
+class ContestCreate(ContestBase):
+    pass
+
+class Contest(ContestBase):
+    id: int
+    archived_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
 
 class CategoryBase(BaseModel):
     name: str
     min_age: int
     max_age: int
+    sex: Optional[str] = None
     description: str
+    tie_breaks: Optional[List[str]] = None
 
 class CategoryCreate(CategoryBase):
     pass
@@ -16,11 +34,19 @@ class Category(CategoryBase):
     class Config:
         from_attributes = True
 
+class CategoryResolve(BaseModel):
+    age: int
+    sex: Optional[str] = None
+
 class EventBase(BaseModel):
     name: str
     category_id: Optional[int] = None
     date: str
     venue: str
+    # Round this event's qualifiers advance into, and who qualifies
+    next_round_id: Optional[int] = None
+    qualify_top: Optional[int] = None
+    qualify_min_marks: Optional[float] = None
 
 class EventCreate(EventBase):
     category_id: int
@@ -45,10 +71,16 @@ class ParticipantBase(BaseModel):
 
 class ParticipantCreate(ParticipantBase):
     event_ids: List[int]
-    category_id: int
+    # Resolved from age and sex when left out
+    category_id: Optional[int] = None
 
 class Participant(ParticipantBase):
     id: int
+    # Blank places are stored as null (see app.dictionaries)
+    church: Optional[str] = None
+    district: Optional[str] = None
+    region: Optional[str] = None
+    state: Optional[str] = None
     events: List[Event] = []
     category: Optional[Category] = None
     
@@ -88,11 +120,57 @@ class ResultResponse(BaseModel):
     chest_number: str
     event_name: str
     category_name: str
+    # Tablets may sync partial marks, and unmarked results have no rank
+    judge1_marks: Optional[float] = None
+    judge2_marks: Optional[float] = None
+    judge3_marks: Optional[float] = None
+    total_marks: Optional[float] = None
+    rank: Optional[int] = None
+
+class TeamBase(BaseModel):
+    name: str
+    chest_number: Optional[str] = None
+    category_id: int
+
+class TeamCreate(TeamBase):
+    member_ids: List[int]
+    event_ids: List[int] = []
+
+class Team(TeamBase):
+    id: int
+    member_ids: List[int]
+    event_ids: List[int]
+
+class TeamResultCreate(BaseModel):
+    team_id: int
+    event_id: int
     judge1_marks: float
     judge2_marks: float
     judge3_marks: float
-    total_marks: float
-    rank: int
+    # Sum of the judges' marks when left out
+    total_marks: Optional[float] = None
+
+class TeamResultResponse(BaseModel):
+    id: int
+    team_id: int
+    team_name: str
+    chest_number: Optional[str] = None
+    event_id: int
+    event_name: str
+    category_name: str
+    judge1_marks: Optional[float] = None
+    judge2_marks: Optional[float] = None
+    judge3_marks: Optional[float] = None
+    total_marks: Optional[float] = None
+    rank: Optional[int] = None
+
+class ParticipantEvent(BaseModel):
+    event_id: int
+    event_name: str
+    category_id: Optional[int] = None
+    # Set when the participant competes as part of a team
+    team_id: Optional[int] = None
+    team_name: Optional[str] = None
 
 class ParticipantResult(BaseModel):
     participant_id: int
@@ -111,3 +189,59 @@ class ParticipantResultCreate(ParticipantResult):
 
 class ParticipantResultUpdate(ParticipantResult):
     pass
+
+class CertificateJobCreate(BaseModel):
+    # Only results ranked at or above max_rank get a certificate; None means every ranked result
+    max_rank: Optional[int] = None
+    event_id: Optional[int] = None
+    category_id: Optional[int] = None
+
+class Job(BaseModel):
+    id: int
+    contest_id: Optional[int] = None
+    kind: str
+    status: str
+    payload: Optional[dict] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    attempts: int
+    max_attempts: int
+    idempotency_key: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ResultAuditEntry(BaseModel):
+    id: int
+    result_id: Optional[int] = None
+    action: str
+    judge1_marks: Optional[float] = None
+    judge2_marks: Optional[float] = None
+    judge3_marks: Optional[float] = None
+    total_marks: Optional[float] = None
+    rank: Optional[int] = None
+    changed_by: Optional[str] = None
+    changed_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class SyncEdit(BaseModel):
+    # Client generated id so the tablet can match up the response
+    client_id: str
+    participant_id: int
+    event_id: int
+    judge1_marks: Optional[float] = None
+    judge2_marks: Optional[float] = None
+    judge3_marks: Optional[float] = None
+    total_marks: Optional[float] = None
+    rank: Optional[int] = None
+    # Version of the result the judge last saw; 0 if it did not exist
+    base_version: int = 0
+
+class SyncPush(BaseModel):
+    edits: List[SyncEdit]
+    on_conflict: Literal["server_wins", "client_wins"] = "server_wins"
@@ -0,0 +1,314 @@
+"""Static results site generator.
+
+Renders per-event and per-category result pages (HTML and JSON) into a
+directory that any static file server can publish, so public result boards
+never touch the database. Pages show each event's published results only.
+Each contest gets a directory of its own, named after its id. A manifest of
+per-event fingerprints is kept next to the pages and only events whose
+results changed since the last build are rewritten.
+
+Usage: python -m app.static_site [CONTEST_ID ...] [--out DIR] [--force]
+"""
+import argparse
+import hashlib
+import html
+import json
+import logging
+import os
+import threading
+
+from sqlalchemy.orm import joinedload
+
+from . import models, database, integrity
+
+logger = logging.getLogger(__name__)
+
+# Output directory for the on-commit hook; the hook is disabled when unset
+STATIC_SITE_DIR = os.getenv("STATIC_SITE_DIR")
+
+MANIFEST_FILE = "manifest.json"
+
+_build_lock = threading.Lock()
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 1rem; }}
+table {{ border-collapse: collapse; margin-bottom: 1.5rem; }}
+th, td {{ border: 1px solid #ccc; padding: 0.3rem 0.6rem; text-align: left; }}
+</style>
+</head>
+<body>
+<p><a href="{home}">All categories</a></p>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+
+
+def _write(path, content):
+    # Write to a temporary file first so a static server never serves half a page
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _fingerprint(payload):
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"events": {}}
+
+
+def _load_event_payload(out_dir, event_id):
+    try:
+        with open(os.path.join(out_dir, "events", f"{event_id}.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _event_payloads(db, contest_id, event_ids=None):
+    """Build the public payload of each event with one query for events and one for results.
+
+    Results come from each event's published snapshot (see app.publishing);
+    drafts never reach the public pages.
+    """
+    events_query = (
+        db.query(models.Event)
+        .options(joinedload(models.Event.category))
+        .filter(models.Event.contest_id == contest_id)
+    )
+    snapshot = models.PublishedResult
+    results_query = (
+        db.query(snapshot)
+        .join(models.Event, (snapshot.event_id == models.Event.id) & (snapshot.version == models.Event.published_version))
+        .filter(models.Event.contest_id == contest_id)
+        .order_by(snapshot.event_id, snapshot.rank, snapshot.total_marks.desc())
+    )
+    if event_ids is not None:
+        events_query = events_query.filter(models.Event.id.in_(event_ids))
+        results_query = results_query.filter(snapshot.event_id.in_(event_ids))
+
+    payloads = {}
+    for event in events_query.all():
+        payloads[event.id] = {
+            "id": event.id,
+            "name": event.name,
+            "date": event.date,
+            "venue": event.venue,
+            "category_id": event.category_id,
+            "category_name": event.category.name if event.category else None,
+            "results": [],
+        }
+
+    for row in results_query.all():
+        payload = payloads.get(row.event_id)
+        if payload is None:
+            continue
+        payload["results"].append({
+            "rank": row.rank,
+            "participant_name": row.participant_name,
+            "chest_number": row.chest_number,
+            "judge1_marks": row.judge1_marks,
+            "judge2_marks": row.judge2_marks,
+            "judge3_marks": row.judge3_marks,
+            "total_marks": row.total_marks,
+        })
+    return payloads
+
+
+def _results_table(results):
+    if not results:
+        return "<p>No results yet.</p>"
+    rows = "\n".join(
+        "<tr>" + "".join(
+            f"<td>{html.escape('' if value is None else str(value))}</td>"
+            for value in (
+                r["rank"], r["chest_number"], r["participant_name"],
+                r["judge1_marks"], r["judge2_marks"], r["judge3_marks"], r["total_marks"],
+            )
+        ) + "</tr>"
+        for r in results
+    )
+    return (
+        "<table>\n<tr><th>Rank</th><th>Chest No.</th><th>Name</th>"
+        "<th>Judge 1</th><th>Judge 2</th><th>Judge 3</th><th>Total</th></tr>\n"
+        f"{rows}\n</table>"
+    )
+
+
+def _render_event(payload):
+    subtitle = f"<p>{html.escape(payload['category_name'] or '')} &middot; " \
+               f"{html.escape(payload['date'] or '')} &middot; {html.escape(payload['venue'] or '')}</p>"
+    return PAGE_TEMPLATE.format(
+        title=html.escape(payload["name"] or ""),
+        home="../index.html",
+        body=subtitle + "\n" + _results_table(payload["results"]),
+    )
+
+
+def _render_category(category, events):
+    sections = "\n".join(
+        f'<h2><a href="../events/{event["id"]}.html">{html.escape(event["name"] or "")}</a></h2>\n'
+        + _results_table(event["results"])
+        for event in events
+    )
+    return PAGE_TEMPLATE.format(
+        title=html.escape(category["name"] or ""),
+        home="../index.html",
+        body=sections or "<p>No events yet.</p>",
+    )
+
+
+def _render_index(categories):
+    items = "\n".join(
+        f'<li><a href="categories/{c["id"]}.html">{html.escape(c["name"] or "")}</a></li>'
+        for c in categories
+    )
+    return PAGE_TEMPLATE.format(title="Results", home="index.html", body=f"<ul>\n{items}\n</ul>")
+
+
+def contest_dir(out_dir, contest_id):
+    return os.path.join(out_dir, str(contest_id))
+
+
+def build_site(db, out_dir, contest_id, event_ids=None, force=False):
+    """Regenerate the static site of one contest in its directory under ``out_dir``.
+
+    With ``event_ids`` only those events are re-read from the database;
+    otherwise every event is fingerprinted and only changed ones are rewritten.
+    Returns the ids of the events that were rewritten or removed.
+    """
+    out_dir = contest_dir(out_dir, contest_id)
+    with _build_lock:
+        os.makedirs(os.path.join(out_dir, "events"), exist_ok=True)
+        os.makedirs(os.path.join(out_dir, "categories"), exist_ok=True)
+
+        manifest = _load_manifest(out_dir)
+        if not manifest["events"]:
+            # Nothing built yet, so a partial build would leave gaps
+            event_ids = None
+
+        payloads = _event_payloads(db, contest_id, event_ids)
+        candidate_ids = set(payloads) if event_ids is None else set(event_ids)
+        if event_ids is None:
+            candidate_ids |= {int(event_id) for event_id in manifest["events"]}
+
+        changed = []
+        touched_categories = set()
+        for event_id in sorted(candidate_ids):
+            old = manifest["events"].get(str(event_id))
+            payload = payloads.get(event_id)
+            if payload is None:
+                # Event was deleted
+                if old is not None:
+                    _remove(os.path.join(out_dir, "events", f"{event_id}.html"))
+                    _remove(os.path.join(out_dir, "events", f"{event_id}.json"))
+                    touched_categories.add(old["category_id"])
+                    del manifest["events"][str(event_id)]
+                    changed.append(event_id)
+                continue
+
+            fingerprint = _fingerprint(payload)
+            if not force and old is not None and old["fingerprint"] == fingerprint:
+                continue
+
+            _write(os.path.join(out_dir, "events", f"{event_id}.json"), json.dumps(payload))
+            _write(os.path.join(out_dir, "events", f"{event_id}.html"), _render_event(payload))
+            manifest["events"][str(event_id)] = {
+                "fingerprint": fingerprint,
+                "category_id": payload["category_id"],
+            }
+            touched_categories.add(payload["category_id"])
+            if old is not None:
+                touched_categories.add(old["category_id"])
+            changed.append(event_id)
+
+        if changed or force:
+            categories = {
+                c.id: c for c in db.query(models.Category).filter(models.Category.contest_id == contest_id)
+            }
+            if force:
+                touched_categories |= set(categories)
+
+            for category_id in touched_categories:
+                if category_id is None:
+                    continue
+                category = categories.get(category_id)
+                if category is None:
+                    _remove(os.path.join(out_dir, "categories", f"{category_id}.html"))
+                    _remove(os.path.join(out_dir, "categories", f"{category_id}.json"))
+                    continue
+
+                # Unchanged sibling events are read back from their JSON files
+                event_payloads = []
+                for event_id, entry in sorted(manifest["events"].items(), key=lambda item: int(item[0])):
+                    if entry["category_id"] != category_id:
+                        continue
+                    payload = payloads.get(int(event_id)) or _load_event_payload(out_dir, event_id)
+                    if payload is not None:
+                        event_payloads.append(payload)
+
+                category_payload = {"id": category.id, "name": category.name, "events": event_payloads}
+                _write(os.path.join(out_dir, "categories", f"{category_id}.json"), json.dumps(category_payload))
+                _write(os.path.join(out_dir, "categories", f"{category_id}.html"),
+                       _render_category(category_payload, event_payloads))
+
+            category_list = [{"id": c.id, "name": c.name} for c in sorted(categories.values(), key=lambda c: c.name or "")]
+            _write(os.path.join(out_dir, "index.json"), json.dumps(category_list))
+            _write(os.path.join(out_dir, "index.html"), _render_index(category_list))
+            _write(os.path.join(out_dir, MANIFEST_FILE), json.dumps(manifest))
+
+        logger.info(f"Static site build wrote {len(changed)} event(s) to {out_dir}")
+        return changed
+
+
+def publish_events(contest_id, event_ids):
+    """On-commit hook: refresh the pages of events just published, unpublished or deleted."""
+    if not STATIC_SITE_DIR:
+        return
+    db = database.SessionLocal()
+    try:
+        build_site(db, STATIC_SITE_DIR, contest_id, event_ids=set(event_ids))
+    except Exception as e:
+        logger.error(f"Error publishing static results: {str(e)}", exc_info=True)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the static results site")
+    parser.add_argument("contest_ids", type=int, nargs="*", help="contests to render (default: all not archived)")
+    parser.add_argument("--out", default=STATIC_SITE_DIR or "public_results", help="output directory")
+    parser.add_argument("--force", action="store_true", help="rewrite every page")
+    args = parser.parse_args()
+
+    database.init_engine()
+    db = database.SessionLocal()
+    try:
+        for contest_id in args.contest_ids or integrity.active_contests(db):
+            changed = build_site(db, args.out, contest_id, force=args.force)
+            print(f"Regenerated {len(changed)} event page(s) in {contest_dir(args.out, contest_id)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
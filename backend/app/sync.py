@@ -0,0 +1,217 @@
+"""Delta sync for offline judge tablets.
+
+``pull`` returns only the rows changed since the client's last version (or a
+full snapshot for a new client), and ``push`` applies a batch of mark edits
+queued while offline. Each edit carries the version of the result the judge
+last saw; if the server copy changed since then the edit is a conflict,
+resolved by ``on_conflict`` ("server_wins" keeps the server copy and returns
+it, "client_wins" applies the edit anyway). New results pushed without a rank
+are ranked by the server.
+"""
+from sqlalchemy import tuple_
+
+from . import models, changes, ranking
+
+
+def _category(category):
+    return {
+        "id": category.id,
+        "name": category.name,
+        "min_age": category.min_age,
+        "max_age": category.max_age,
+        "sex": category.sex,
+        "description": category.description,
+        "tie_breaks": category.tie_breaks,
+    }
+
+
+def _event(event):
+    return {
+        "id": event.id,
+        "name": event.name,
+        "category_id": event.category_id,
+        "date": event.date,
+        "venue": event.venue,
+        "next_round_id": event.next_round_id,
+        "published_version": event.published_version,
+    }
+
+
+def _participant(participant, event_ids):
+    return {
+        "id": participant.id,
+        "name": participant.name,
+        "age": participant.age,
+        "sex": participant.sex,
+        "chest_number": participant.chest_number,
+        "church": participant.church,
+        "district": participant.district,
+        "region": participant.region,
+        "state": participant.state,
+        "category_id": participant.category_id,
+        "event_ids": event_ids,
+    }
+
+
+def _result(result, version):
+    return {
+        "id": result.id,
+        "participant_id": result.participant_id,
+        "event_id": result.event_id,
+        "judge1_marks": result.judge1_marks,
+        "judge2_marks": result.judge2_marks,
+        "judge3_marks": result.judge3_marks,
+        "total_marks": result.total_marks,
+        "rank": result.rank,
+        "version": version,
+    }
+
+
+def _event_ids_by_participant(db, contest_id, participant_ids=None):
+    query = (
+        db.query(models.participant_event.c.participant_id, models.participant_event.c.event_id)
+        .join(models.Participant, models.Participant.id == models.participant_event.c.participant_id)
+        .filter(models.Participant.contest_id == contest_id)
+    )
+    if participant_ids is not None:
+        query = query.filter(models.participant_event.c.participant_id.in_(participant_ids))
+    event_ids = {}
+    for participant_id, event_id in query:
+        event_ids.setdefault(participant_id, []).append(event_id)
+    return event_ids
+
+
+def pull(db, since, contest_id=models.DEFAULT_CONTEST_ID):
+    version = changes.current_version(db)
+    payload = {"version": version, "full": since <= 0}
+
+    if since <= 0:
+        # New client: send the whole contest rather than replaying the log
+        results = db.query(models.Result).filter(models.Result.contest_id == contest_id).all()
+        versions = changes.row_versions(db, "results", [r.id for r in results])
+        event_ids = _event_ids_by_participant(db, contest_id)
+        payload.update({
+            "categories": [_category(c) for c in db.query(models.Category).filter(models.Category.contest_id == contest_id)],
+            "events": [_event(e) for e in db.query(models.Event).filter(models.Event.contest_id == contest_id)],
+            "participants": [
+                _participant(p, event_ids.get(p.id, []))
+                for p in db.query(models.Participant).filter(models.Participant.contest_id == contest_id)
+            ],
+            "results": [_result(r, versions.get(r.id, 0)) for r in results],
+            "deleted": {"categories": [], "events": [], "participants": [], "results": []},
+        })
+        return payload
+
+    changed = changes.changes_since(db, since, contest_id, until=version)
+    # Participants registered or unregistered by bulk statements (rounds,
+    # integrity fixes) only have participant_event entries; resend them too
+    participants = changed.setdefault("participants", {})
+    for participant_id, (seq, _) in changed.get("participant_event", {}).items():
+        participants.setdefault(participant_id, (seq, "upsert"))
+    deleted = {}
+    loaded = {}
+    for table_name, model in (
+        ("categories", models.Category),
+        ("events", models.Event),
+        ("participants", models.Participant),
+        ("results", models.Result),
+    ):
+        rows = changed.get(table_name, {})
+        deleted[table_name] = [row_id for row_id, (_, op) in rows.items() if op == "delete"]
+        upserted = [row_id for row_id, (_, op) in rows.items() if op != "delete"]
+        loaded[table_name] = db.query(model).filter(model.id.in_(upserted)).all() if upserted else []
+
+    event_ids = _event_ids_by_participant(db, contest_id, [p.id for p in loaded["participants"]]) if loaded["participants"] else {}
+    payload.update({
+        "categories": [_category(c) for c in loaded["categories"]],
+        "events": [_event(e) for e in loaded["events"]],
+        "participants": [_participant(p, event_ids.get(p.id, [])) for p in loaded["participants"]],
+        "results": [_result(r, changed["results"][r.id][0]) for r in loaded["results"]],
+        "deleted": deleted,
+    })
+    return payload
+
+
+def push(db, edits, on_conflict="server_wins", contest_id=models.DEFAULT_CONTEST_ID):
+    keys = {(edit.participant_id, edit.event_id) for edit in edits}
+    existing = {}
+    if keys:
+        existing = {
+            (r.participant_id, r.event_id): r
+            for r in db.query(models.Result).filter(
+                models.Result.contest_id == contest_id,
+                tuple_(models.Result.participant_id, models.Result.event_id).in_(list(keys)),
+            )
+        }
+    versions = changes.row_versions(db, "results", [r.id for r in existing.values()])
+
+    # Edits for unknown participants/events are rejected up front with two queries
+    participant_ids = {p for (p,) in db.query(models.Participant.id).filter(
+        models.Participant.contest_id == contest_id,
+        models.Participant.id.in_({edit.participant_id for edit in edits}))}
+    event_ids = {e for (e,) in db.query(models.Event.id).filter(
+        models.Event.contest_id == contest_id,
+        models.Event.id.in_({edit.event_id for edit in edits}))}
+
+    applied, conflicts, rejected = [], [], []
+    # Events given a new result by an edit that left ranking to the server
+    unranked = set()
+    for edit in edits:
+        if edit.participant_id not in participant_ids or edit.event_id not in event_ids:
+            rejected.append({"client_id": edit.client_id, "detail": "Unknown participant or event"})
+            continue
+
+        values = {
+            "judge1_marks": edit.judge1_marks,
+            "judge2_marks": edit.judge2_marks,
+            "judge3_marks": edit.judge3_marks,
+            "total_marks": edit.total_marks,
+            "rank": edit.rank,
+        }
+        if values["rank"] is None:
+            # Tablets that do not rank locally leave the server's rank alone
+            del values["rank"]
+        if values["total_marks"] is None:
+            values["total_marks"] = sum(
+                mark or 0 for mark in (edit.judge1_marks, edit.judge2_marks, edit.judge3_marks)
+            )
+
+        result = existing.get((edit.participant_id, edit.event_id))
+        if result is None:
+            result = models.Result(
+                contest_id=contest_id, participant_id=edit.participant_id, event_id=edit.event_id, **values
+            )
+            db.add(result)
+            existing[(edit.participant_id, edit.event_id)] = result
+            applied.append(edit.client_id)
+            if edit.rank is None:
+                unranked.add(edit.event_id)
+            continue
+
+        server_version = versions.get(result.id, 0)
+        same = all(getattr(result, field) == value for field, value in values.items())
+        if same:
+            # Retried upload of an edit that already landed
+            applied.append(edit.client_id)
+            continue
+        if server_version > (edit.base_version or 0) and on_conflict != "client_wins":
+            conflicts.append({
+                "client_id": edit.client_id,
+                "server": _result(result, server_version),
+            })
+            continue
+
+        for field, value in values.items():
+            setattr(result, field, value)
+        applied.append(edit.client_id)
+
+    if unranked:
+        db.flush()
+        ranking.rerank(db, sorted(unranked))
+    db.commit()
+    return {
+        "version": changes.current_version(db),
+        "applied": applied,
+        "conflicts": conflicts,
+        "rejected": rejected,
+    }
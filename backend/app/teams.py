@@ -0,0 +1,202 @@
+"""Teams for group events.
+
+Group songs and skits are entered and scored per team: a ``Team`` has member
+participants (``team_members``), is registered for events (``team_event``)
+and gets a ``TeamResult`` per event, ranked among that event's teams the
+same way individual results are.
+
+A participant competes in an event either on their own (``participant_event``)
+or through a team. ``events_by_participant`` answers both with one UNION ALL
+query for any number of participants; both halves are covered by
+participant-first indexes on the association tables.
+"""
+from sqlalchemy import Integer, String, cast, null, select, tuple_
+from sqlalchemy.orm import selectinload
+
+from . import models, ranking
+
+
+def _check_category(db, contest_id, category_id):
+    category = db.query(models.Category).filter(
+        models.Category.contest_id == contest_id,
+        models.Category.id == category_id
+    ).first()
+    if category is None:
+        raise ValueError("Selected category does not exist")
+    return category
+
+
+def members_and_events(db, contest_id, team):
+    """The participants and events of ``team`` (a TeamCreate); raises ValueError if any are invalid."""
+    category = _check_category(db, contest_id, team.category_id)
+    member_ids = set(team.member_ids)
+    if not member_ids:
+        raise ValueError("A team needs at least one member")
+    members = db.query(models.Participant).filter(
+        models.Participant.contest_id == contest_id,
+        models.Participant.id.in_(member_ids)
+    ).all()
+    if len(members) != len(member_ids):
+        raise ValueError("One or more participant IDs are invalid")
+
+    event_ids = set(team.event_ids)
+    events = db.query(models.Event).filter(
+        models.Event.contest_id == contest_id,
+        models.Event.id.in_(event_ids)
+    ).all() if event_ids else []
+    if len(events) != len(event_ids):
+        raise ValueError("One or more event IDs are invalid")
+    for event in events:
+        if event.category_id != category.id:
+            raise ValueError(f"Event {event.name} does not belong to the selected category {category.name}")
+    return members, events
+
+
+def team_dict(team):
+    return {
+        "id": team.id,
+        "name": team.name,
+        "chest_number": team.chest_number,
+        "category_id": team.category_id,
+        "member_ids": sorted(p.id for p in team.members),
+        "event_ids": sorted(e.id for e in team.events),
+    }
+
+
+def list_teams(db, contest_id, category_id=None, event_id=None):
+    # Members and events in one extra query each, not one per team
+    query = db.query(models.Team).options(
+        selectinload(models.Team.members).load_only(models.Participant.id),
+        selectinload(models.Team.events).load_only(models.Event.id),
+    ).filter(models.Team.contest_id == contest_id)
+    if category_id:
+        query = query.filter(models.Team.category_id == category_id)
+    if event_id:
+        query = query.join(models.team_event).filter(models.team_event.c.event_id == event_id)
+    return [team_dict(team) for team in query.order_by(models.Team.name)]
+
+
+def save_results(db, contest_id, results):
+    """Insert or update team results and rerank the events they belong to; the caller commits."""
+    keys = {(r.team_id, r.event_id) for r in results}
+    # Registrations of these teams for these events, in one query
+    registered = set(
+        db.query(models.team_event.c.team_id, models.team_event.c.event_id)
+        .join(models.Team, models.Team.id == models.team_event.c.team_id)
+        .filter(
+            models.Team.contest_id == contest_id,
+            tuple_(models.team_event.c.team_id, models.team_event.c.event_id).in_(list(keys)),
+        )
+    )
+    unregistered = keys - registered
+    if unregistered:
+        team_id, event_id = sorted(unregistered)[0]
+        raise ValueError(f"Team {team_id} is not registered for event {event_id}")
+
+    existing = {
+        (r.team_id, r.event_id): r
+        for r in db.query(models.TeamResult).filter(
+            models.TeamResult.contest_id == contest_id,
+            tuple_(models.TeamResult.team_id, models.TeamResult.event_id).in_(list(keys)),
+        )
+    }
+    for result in results:
+        db_result = existing.get((result.team_id, result.event_id))
+        if db_result is None:
+            db_result = existing[(result.team_id, result.event_id)] = models.TeamResult(
+                contest_id=contest_id, team_id=result.team_id, event_id=result.event_id
+            )
+            db.add(db_result)
+        db_result.judge1_marks = result.judge1_marks
+        db_result.judge2_marks = result.judge2_marks
+        db_result.judge3_marks = result.judge3_marks
+        db_result.total_marks = result.total_marks if result.total_marks is not None else (
+            result.judge1_marks + result.judge2_marks + result.judge3_marks
+        )
+    db.flush()
+    ranking.rerank(db, sorted({event_id for _, event_id in keys}), models.TeamResult)
+    return len(results)
+
+
+def fetch_results(db, contest_id, event_id=None, category_id=None):
+    query = db.query(
+        models.TeamResult,
+        models.Team.name.label("team_name"),
+        models.Team.chest_number,
+        models.Event.name.label("event_name"),
+        models.Category.name.label("category_name"),
+    ).join(
+        models.Team, models.TeamResult.team_id == models.Team.id
+    ).join(
+        models.Event, models.TeamResult.event_id == models.Event.id
+    ).join(
+        models.Category, models.Event.category_id == models.Category.id
+    ).filter(
+        models.TeamResult.contest_id == contest_id
+    )
+    if event_id:
+        query = query.filter(models.TeamResult.event_id == event_id)
+    elif category_id:
+        query = query.filter(models.Event.category_id == category_id)
+
+    return [{
+        "id": row.TeamResult.id,
+        "team_id": row.TeamResult.team_id,
+        "team_name": row.team_name,
+        "chest_number": row.chest_number,
+        "event_id": row.TeamResult.event_id,
+        "event_name": row.event_name,
+        "category_name": row.category_name,
+        "judge1_marks": row.TeamResult.judge1_marks,
+        "judge2_marks": row.TeamResult.judge2_marks,
+        "judge3_marks": row.TeamResult.judge3_marks,
+        "total_marks": row.TeamResult.total_marks,
+        "rank": row.TeamResult.rank,
+    } for row in query.order_by(models.TeamResult.event_id, models.TeamResult.rank.is_(None), models.TeamResult.rank)]
+
+
+def events_by_participant(db, contest_id, participant_ids):
+    """{participant id: [event, ...]} of the events each competes in, on their own or in a team.
+
+    Each event carries ``team_id``/``team_name`` when entered through a team.
+    """
+    if not participant_ids:
+        return {}
+    pe = models.participant_event
+    individual = (
+        select(
+            pe.c.participant_id,
+            models.Event.id.label("event_id"),
+            models.Event.name.label("event_name"),
+            models.Event.category_id,
+            cast(null(), Integer).label("team_id"),
+            cast(null(), String).label("team_name"),
+        )
+        .join(models.Event, models.Event.id == pe.c.event_id)
+        .where(pe.c.participant_id.in_(participant_ids), models.Event.contest_id == contest_id)
+    )
+    via_team = (
+        select(
+            models.team_members.c.participant_id,
+            models.Event.id,
+            models.Event.name,
+            models.Event.category_id,
+            models.Team.id,
+            models.Team.name,
+        )
+        .join(models.Team, models.Team.id == models.team_members.c.team_id)
+        .join(models.team_event, models.team_event.c.team_id == models.Team.id)
+        .join(models.Event, models.Event.id == models.team_event.c.event_id)
+        .where(models.team_members.c.participant_id.in_(participant_ids), models.Team.contest_id == contest_id)
+    )
+    events = individual.union_all(via_team).subquery()
+    rows = db.execute(
+        select(events).order_by(events.c.participant_id, events.c.event_name, events.c.team_id)
+    ).mappings()
+
+    by_participant = {participant_id: [] for participant_id in participant_ids}
+    for row in rows:
+        by_participant[row["participant_id"]].append({
+            key: row[key] for key in ("event_id", "event_name", "category_id", "team_id", "team_name")
+        })
+    return by_participant
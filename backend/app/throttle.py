@@ -0,0 +1,106 @@
+"""Protection for hot read endpoints.
+
+``SingleFlight`` lets identical concurrent reads share one database query:
+the first caller runs it and the others wait for its result, so hundreds of
+phones refreshing a result board at the same moment cost one query rather
+than hundreds. ``RateLimiter`` is a token bucket per client and route that
+the API applies as middleware.
+"""
+import os
+import threading
+import time
+
+# Off by default: tablets behind one venue NAT share an address
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "0"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "40"))
+# Addresses of proxies in front of the API. Only requests coming through one
+# of them are identified by X-Forwarded-For and the client id header, since
+# anyone else could send a new value with each request
+RATE_LIMIT_TRUSTED_PROXIES = {
+    address.strip() for address in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if address.strip()
+}
+# Set by the proxy (e.g. to a tablet's device id) so devices behind one address get a bucket each
+RATE_LIMIT_CLIENT_HEADER = os.getenv("RATE_LIMIT_CLIENT_HEADER", "x-client-id").lower()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """Run ``func`` once for all concurrent callers with the same key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            # Later callers start a fresh query, so nobody gets a stale result
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+
+class RateLimiter:
+    def __init__(self, rate=RATE_LIMIT_PER_SECOND, burst=RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        # key -> (tokens, last refill time)
+        self._buckets = {}
+        self._last_prune = time.monotonic()
+
+    def acquire(self, key):
+        """Take one token; returns 0 when allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            if now - self._last_prune > 60:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        # Buckets that have refilled completely carry no state worth keeping
+        full_after = self.burst / self.rate
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < full_after
+        }
+        self._last_prune = now
+
+
+def client_key(request):
+    address = request.client.host if request.client else "unknown"
+    if address not in RATE_LIMIT_TRUSTED_PROXIES:
+        return address
+    if request.headers.get("x-forwarded-for"):
+        address = request.headers["x-forwarded-for"].split(",")[0].strip()
+    client_id = request.headers.get(RATE_LIMIT_CLIENT_HEADER)
+    return f"{address}:{client_id}" if client_id else address
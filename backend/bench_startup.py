@@ -0,0 +1,53 @@
+"""Measure cold start time of the API.
+
+Each run starts a fresh interpreter, so module import caches do not hide
+regressions. Reports the time to import ``app.main`` and the time until the
+lifespan startup (engine creation, job workers) has finished. Without
+DATABASE_URL the runs use a throwaway SQLite database.
+
+    python bench_startup.py --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = """
+import asyncio, time
+start = time.perf_counter()
+from app.main import app, lifespan
+imported = time.perf_counter()
+
+async def ready():
+    async with lifespan(app):
+        return time.perf_counter()
+
+ready_at = asyncio.run(ready())
+print(imported - start, ready_at - start)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API cold start time")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports, readies = [], []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(os.environ)
+        env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}")
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, "-c", PROBE], capture_output=True, text=True, check=True, env=env
+            ).stdout.split()
+            imports.append(float(output[-2]))
+            readies.append(float(output[-1]))
+
+    print(f"import app.main: median {statistics.median(imports) * 1000:.0f} ms, max {max(imports) * 1000:.0f} ms")
+    print(f"ready to serve:  median {statistics.median(readies) * 1000:.0f} ms, max {max(readies) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+def test_judge_analytics(client, dataset, count_queries):
+    category_id = dataset["categories"][0].id
+    with count_queries() as statements:
+        response = client.get(f"/analytics/judges?category_id={category_id}")
+    assert response.status_code == 200
+    report = response.json()
+    assert report["events"] == 1
+    assert report["results"] == 10
+    # Judges 1 and 3 sit one mark either side of judge 2 for every performance
+    assert report["judges"]["judge1"]["mean_offset"] == -1
+    assert report["judges"]["judge3"]["mean_offset"] == 1
+    assert report["agreement"]["judge1-judge2"]["spearman"] == 1
+    assert len(statements) <= 2
+
+
+def test_judge_analytics_without_results(client):
+    response = client.get("/analytics/judges")
+    assert response.status_code == 200
+    assert response.json()["results"] == 0
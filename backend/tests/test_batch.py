@@ -0,0 +1,38 @@
+def test_batch_page_load(client, dataset, count_queries):
+    category_id = dataset["categories"][0].id
+    with count_queries() as statements:
+        response = client.get(f"/batch?include=categories,events,participants&events=ids&category_id={category_id}")
+    assert response.status_code == 200
+    body = response.json()
+    assert [c["name"] for c in body["categories"]] == ["Category 0", "Category 1"]
+    assert {e["category_id"] for e in body["events"]} == {category_id}
+    assert len(body["participants"]["participants"]) == 10
+    assert "errors" not in body
+    # The contest lookup plus one or two queries per read, in one request
+    assert len(statements) <= 6
+
+
+def test_batch_matches_individual_endpoints(client, dataset):
+    event = dataset["events"][0]
+    params = f"category_id={event.category_id}&event_id={event.id}"
+    body = client.get(f"/batch?include=results,results_summary,registrations,dashboard&{params}").json()
+    assert body["results"] == client.get(f"/results/?event_id={event.id}").json()
+    assert body["results_summary"] == client.get(f"/results/summary?category_id={event.category_id}").json()
+    assert body["registrations"] == client.get(f"/participants/by-category-event/{event.category_id}/{event.id}").json()
+    assert body["dashboard"]["total_participants"] == 20
+
+
+def test_batch_per_read_parameters(client, dataset):
+    first, second = dataset["categories"]
+    body = client.get(f"/batch?include=events,participants&events.category_id={first.id}&category_id={second.id}").json()
+    assert {e["category_id"] for e in body["events"]} == {first.id}
+    assert {p["category_id"] for p in body["participants"]} == {second.id}
+
+
+def test_batch_errors(client, dataset):
+    assert client.get("/batch?include=categories,nope").status_code == 400
+
+    body = client.get("/batch?include=categories,results_summary,events&events.category_id=abc").json()
+    assert len(body["categories"]) == 2
+    assert body["errors"]["results_summary"]["status_code"] == 400
+    assert body["errors"]["events"]["status_code"] == 400
@@ -0,0 +1,44 @@
+from conftest import category_payload
+
+
+def test_create_and_get_category(client):
+    created = client.post("/categories/", json=category_payload())
+    assert created.status_code == 200
+    category_id = created.json()["id"]
+
+    response = client.get(f"/categories/{category_id}")
+    assert response.status_code == 200
+    assert response.json()["name"] == "Sub Junior"
+
+
+def test_duplicate_category_name_is_rejected(client):
+    client.post("/categories/", json=category_payload())
+    response = client.post("/categories/", json=category_payload())
+    assert response.status_code == 400
+
+
+def test_list_categories(client, dataset, count_queries):
+    with count_queries() as statements:
+        response = client.get("/categories/")
+    assert response.status_code == 200
+    assert [c["name"] for c in response.json()] == ["Category 0", "Category 1"]
+    assert len(statements) <= 2
+
+
+def test_update_category(client, dataset):
+    category_id = dataset["categories"][0].id
+    response = client.put(f"/categories/{category_id}", json=category_payload(name="Renamed"))
+    assert response.status_code == 200
+    assert client.get(f"/categories/{category_id}").json()["name"] == "Renamed"
+
+
+def test_delete_category(client):
+    category_id = client.post("/categories/", json=category_payload()).json()["id"]
+    assert client.delete(f"/categories/{category_id}").status_code == 200
+    assert client.get(f"/categories/{category_id}").status_code == 404
+
+
+def test_missing_category(client):
+    assert client.get("/categories/999").status_code == 404
+    assert client.put("/categories/999", json=category_payload()).status_code == 404
+    assert client.delete("/categories/999").status_code == 404
@@ -0,0 +1,77 @@
+from app import archive, models
+
+from conftest import make_dataset
+
+
+def test_create_and_list_contests(client):
+    created = client.post("/contests/", json={"name": "Kalotsavam 2025", "year": 2025})
+    assert created.status_code == 200
+    assert client.post("/contests/", json={"name": "Kalotsavam 2025"}).status_code == 400
+
+    contest_id = created.json()["id"]
+    assert client.get(f"/contests/{contest_id}").json()["year"] == 2025
+    assert {c["name"] for c in client.get("/contests/").json()} == {"Default contest", "Kalotsavam 2025"}
+    assert client.get("/contests/999").status_code == 404
+
+
+def test_reads_are_scoped_to_contest(client, db):
+    other = models.Contest(name="Other")
+    db.add(other)
+    db.commit()
+    make_dataset(db, categories=1)
+    make_dataset(db, categories=1, contest_id=other.id)
+
+    assert len(client.get("/participants/").json()) == 10
+    assert len(client.get("/participants/", headers={"X-Contest-Id": str(other.id)}).json()) == 10
+    assert len(client.get(f"/results/?contest_id={other.id}").json()) == 10
+
+    foreign_category = db.query(models.Category).filter(models.Category.contest_id == other.id).first()
+    assert client.get(f"/categories/{foreign_category.id}").status_code == 404
+    assert client.get("/categories/", headers={"X-Contest-Id": "999"}).status_code == 404
+
+
+def test_results_are_scoped_to_contest(client, db):
+    other = models.Contest(name="Other")
+    db.add(other)
+    db.commit()
+    data = make_dataset(db, categories=1)
+    foreign = make_dataset(db, categories=1, contest_id=other.id)
+    event, participant = data["events"][1], data["participants"][0]
+    foreign_event, foreign_participant = foreign["events"][1], foreign["participants"][0]
+    marks = {"judge1_marks": 8, "judge2_marks": 8, "judge3_marks": 8, "total_marks": 24, "rank": 1}
+
+    created = client.post("/results/", json=[{"participant_id": foreign_participant.id, "event_id": event.id, **marks}])
+    assert created.status_code == 400
+    created = client.post("/results/", json=[{"participant_id": participant.id, "event_id": foreign_event.id, **marks}])
+    assert created.status_code == 400
+
+    update = {"mark1": 8, "mark2": 8, "mark3": 8, "total_marks": 24, "rank": 1}
+    assert client.post("/results/update", json={
+        "participant_id": foreign_participant.id, "event_id": event.id, **update,
+    }).status_code == 404
+    assert client.post("/results/update", json={
+        "participant_id": participant.id, "event_id": foreign_event.id, **update,
+    }).status_code == 404
+    assert db.query(models.Result).filter(models.Result.event_id.in_([event.id, foreign_event.id])).count() == 0
+
+
+def test_archive_contest(client, db, tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+    contest = models.Contest(name="Last year")
+    db.add(contest)
+    db.commit()
+    make_dataset(db, categories=1, contest_id=contest.id)
+
+    manifest = archive.archive_contest(db, contest.id)
+    assert manifest["tables"]["results"]["rows"] == 10
+    assert db.query(models.Result).filter(models.Result.contest_id == contest.id).count() == 0
+
+    assert [a["contest"]["id"] for a in client.get("/archive/").json()] == [contest.id]
+    assert client.get(f"/archive/{contest.id}").status_code == 200
+    rows = client.get(f"/archive/{contest.id}/participants?limit=5").json()
+    assert len(rows["rows"]) == 5
+    assert client.get(f"/archive/{contest.id}/participants?event_id=1").status_code == 400
+    assert client.get("/archive/999").status_code == 404
+
+    # Archived contests are no longer served live
+    assert client.get("/categories/", headers={"X-Contest-Id": str(contest.id)}).status_code == 404
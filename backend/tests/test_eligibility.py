@@ -0,0 +1,126 @@
+from collections import namedtuple
+
+import pytest
+
+from app.eligibility import CategoryIndex
+
+from conftest import participant_payload
+
+Band = namedtuple("Band", "id name min_age max_age sex")
+
+
+@pytest.fixture
+def index():
+    return CategoryIndex([
+        Band(1, "Kids", 5, 9, None),
+        Band(2, "Junior Boys", 10, 14, "Male"),
+        Band(3, "Junior Girls", 10, 14, "Female"),
+        Band(4, "Senior", 18, 25, None),
+    ])
+
+
+@pytest.mark.parametrize("age, sex, expected", [
+    (5, "Male", 1),
+    (9, "F", 1),
+    (12, "male", 2),
+    (12, "Female", 3),
+    (25, None, 4),
+])
+def test_resolve(index, age, sex, expected):
+    assert index.resolve(age, sex).id == expected
+
+
+@pytest.mark.parametrize("age, sex", [(4, "Male"), (16, "Female"), (12, None), (30, "Male")])
+def test_resolve_without_match(index, age, sex):
+    with pytest.raises(ValueError):
+        index.resolve(age, sex)
+
+
+def test_resolve_ambiguous():
+    index = CategoryIndex([Band(1, "A", 5, 12, None), Band(2, "B", 10, 14, None)])
+    with pytest.raises(ValueError, match="several categories"):
+        index.resolve(11)
+
+
+def test_overlaps(index):
+    assert [c.id for c in index.overlaps(8, 11, "Female")] == [1, 3]
+    assert index.overlaps(10, 14, "Female", exclude_id=3) == []
+    assert [c.id for c in index.overlaps(15, 30)] == [4]
+
+
+def test_coverage(index):
+    coverage = index.coverage()
+    assert coverage["overlaps"] == []
+    assert coverage["gaps"] == {
+        "f": [{"min_age": 15, "max_age": 17}],
+        "m": [{"min_age": 15, "max_age": 17}],
+    }
+
+
+def test_overlapping_category_is_rejected(client, dataset):
+    payload = {"name": "Overlap", "min_age": 8, "max_age": 11, "description": ""}
+    response = client.post("/categories/", json=payload)
+    assert response.status_code == 400
+    assert "overlaps" in response.json()["detail"]
+
+    # Split by sex instead: girls 15-19 next to an open 20-24 band
+    assert client.post("/categories/", json={"name": "Girls", "min_age": 15, "max_age": 19, "sex": "Female", "description": ""}).status_code == 200
+    assert client.post("/categories/", json={"name": "Boys", "min_age": 15, "max_age": 19, "sex": "Male", "description": ""}).status_code == 200
+    assert client.get("/categories/coverage").json()["overlaps"] == []
+
+
+def test_participant_category_from_age(client, dataset):
+    payload = {
+        "name": "Anna", "age": 12, "sex": "Female", "chest_number": "A001", "church": "St. Thomas",
+        "district": "South", "region": "Central", "state": "Kerala", "event_ids": [],
+    }
+    response = client.post("/participants/", json=payload)
+    assert response.status_code == 200
+    assert response.json()["category_id"] == dataset["categories"][1].id
+
+    response = client.post("/participants/", json={**payload, "chest_number": "A002", "age": 40})
+    assert response.status_code == 400
+
+
+def test_index_follows_category_writes(client, dataset):
+    assert client.post("/categories/resolve", json=[{"age": 20}]).json()[0]["category_id"] is None
+    created = client.post("/categories/", json={"name": "Youth", "min_age": 15, "max_age": 25, "description": ""}).json()
+    assert client.post("/categories/resolve", json=[{"age": 20}]).json()[0]["category_id"] == created["id"]
+
+
+def test_bulk_resolve_query_count(client, dataset, count_queries):
+    rows = [{"age": 5 + i % 12, "sex": "Male"} for i in range(2000)]
+    with count_queries() as statements:
+        response = client.post("/categories/resolve", json=rows)
+    assert response.status_code == 200
+    resolved = response.json()
+    assert sum(1 for r in resolved if r["category_id"]) == 1668
+    assert len(statements) <= 2
+
+
+def test_import_job_resolves_categories(client, dataset):
+    from app import jobs
+
+    rows = [
+        {"name": f"Imported {i}", "age": 6 + i % 8, "sex": "F", "chest_number": f"I{i:04d}", "church": "",
+         "district": "", "region": "", "state": "", "event_ids": []}
+        for i in range(50)
+    ]
+    job_id = client.post("/jobs/import", json={"participants": rows}).json()["id"]
+    jobs.run(job_id)
+    assert client.get(f"/jobs/{job_id}").json()["result"] == {"created": 50, "errors": []}
+
+
+def test_chosen_category_must_accept_the_sex(client, dataset):
+    from app import jobs
+
+    girls = client.post("/categories/", json={"name": "Girls", "min_age": 15, "max_age": 19, "sex": "Female", "description": ""}).json()
+    response = client.post("/participants/", json=participant_payload(girls["id"], age=16, sex="Male"))
+    assert response.status_code == 400
+    assert "only open to Female" in response.json()["detail"]
+    assert client.post("/participants/", json=participant_payload(girls["id"], age=16, sex="F")).status_code == 200
+
+    rows = [participant_payload(girls["id"], age=16, sex="M", chest_number="I0001")]
+    job_id = client.post("/jobs/import", json={"participants": rows}).json()["id"]
+    jobs.run(job_id)
+    assert client.get(f"/jobs/{job_id}").json()["result"]["created"] == 0
@@ -0,0 +1,49 @@
+from app import models
+
+from conftest import event_payload
+
+
+def test_create_and_get_event(client, dataset):
+    category_id = dataset["categories"][0].id
+    created = client.post("/events/", json=event_payload(category_id))
+    assert created.status_code == 200
+
+    response = client.get(f"/events/{created.json()['id']}")
+    assert response.status_code == 200
+    assert response.json()["category"]["id"] == category_id
+
+
+def test_create_event_in_unknown_category(client):
+    assert client.post("/events/", json=event_payload(999)).status_code == 400
+
+
+def test_list_events_by_category(client, dataset, count_queries):
+    category_id = dataset["categories"][1].id
+    with count_queries() as statements:
+        response = client.get(f"/events/?category_id={category_id}")
+    assert response.status_code == 200
+    assert {e["category_id"] for e in response.json()} == {category_id}
+    assert len(response.json()) == 3
+    # Events plus their categories; must not grow with the number of events
+    assert len(statements) <= 4
+
+
+def test_update_event(client, dataset):
+    event = dataset["events"][0]
+    response = client.put(f"/events/{event.id}", json=event_payload(event.category_id, venue="Chapel"))
+    assert response.status_code == 200
+    assert response.json()["venue"] == "Chapel"
+
+
+def test_delete_event_removes_its_results(client, dataset, db):
+    event_id = dataset["events"][0].id
+    assert client.delete(f"/events/{event_id}").status_code == 200
+    assert client.get(f"/events/{event_id}").status_code == 404
+    assert db.query(models.Result).filter(models.Result.event_id == event_id).count() == 0
+
+
+def test_missing_event(client, dataset):
+    category_id = dataset["categories"][0].id
+    assert client.get("/events/999").status_code == 404
+    assert client.put("/events/999", json=event_payload(category_id)).status_code == 404
+    assert client.delete("/events/999").status_code == 404
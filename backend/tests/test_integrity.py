@@ -0,0 +1,108 @@
+from app import integrity, jobs, models
+
+from conftest import make_dataset
+
+CHECKS = ("unregistered_results", "age_outside_category", "duplicate_results", "wrong_ranks")
+
+
+def counts(report):
+    return {check: report[check]["count"] for check in CHECKS}
+
+
+def corrupt(db, data):
+    """One of each problem in the first event; returns its results by participant id."""
+    event = data["events"][0]
+    participants = data["participants"][:10]
+    results = {r.participant_id: r for r in data["results"] if r.event_id == event.id}
+    participants[0].events.remove(event)
+    participants[1].age = 50
+    copy = results[participants[2].id]
+    db.add(models.Result(
+        contest_id=copy.contest_id, participant_id=copy.participant_id, event_id=event.id,
+        judge1_marks=copy.judge1_marks, judge2_marks=copy.judge2_marks, judge3_marks=copy.judge3_marks,
+        total_marks=copy.total_marks, rank=copy.rank,
+    ))
+    results[participants[9].id].rank = 2
+    db.commit()
+    return results
+
+
+def test_clean_contest(db, dataset):
+    report = integrity.scan(db, models.DEFAULT_CONTEST_ID)
+    assert counts(report) == dict.fromkeys(CHECKS, 0)
+    assert "fixed" not in report["wrong_ranks"]
+
+
+def test_detects_each_problem(db, dataset):
+    participants = dataset["participants"]
+    results = corrupt(db, dataset)
+    report = integrity.scan(db, models.DEFAULT_CONTEST_ID)
+    assert counts(report) == {
+        "unregistered_results": 1,
+        "age_outside_category": 1,
+        "duplicate_results": 1,
+        # The duplicate pushes the two below it down, and the winner was given rank 2
+        "wrong_ranks": 3,
+    }
+    assert report["unregistered_results"]["sample"][0]["participant_id"] == participants[0].id
+    assert report["age_outside_category"]["sample"][0] == {
+        "participant_id": participants[1].id, "age": 50, "category_id": participants[1].category_id,
+        "min_age": 5, "max_age": 9,
+    }
+    duplicate = report["duplicate_results"]["sample"][0]
+    assert duplicate["result_id"] == results[participants[2].id].id
+    assert duplicate["kept_id"] > duplicate["result_id"]
+    # Reporting changes nothing
+    db.rollback()
+    assert counts(integrity.scan(db, models.DEFAULT_CONTEST_ID))["duplicate_results"] == 1
+
+
+def test_fix_job(client, db, dataset):
+    corrupt(db, dataset)
+    # A result in an event of another category cannot be fixed by registering
+    outsider = dataset["participants"][10]
+    db.add(models.Result(contest_id=outsider.contest_id, participant_id=outsider.id, event_id=dataset["events"][0].id))
+    db.commit()
+    job_id = client.post("/jobs/integrity", json={"fix": True}).json()["id"]
+    jobs.run(job_id)
+    report = client.get(f"/jobs/{job_id}").json()["result"]["reports"][0]
+    assert report["unregistered_results"]["not_fixed"] == 1
+    assert {check: report[check].get("fixed") for check in CHECKS} == {
+        "unregistered_results": 1,
+        "age_outside_category": None,
+        "duplicate_results": 1,
+        # With the duplicate gone only the winner's rank is still wrong
+        "wrong_ranks": 1,
+    }
+    # Only the age and the other category's result are left for an organiser
+    db.expire_all()
+    assert counts(integrity.scan(db, models.DEFAULT_CONTEST_ID)) == {
+        "unregistered_results": 1, "age_outside_category": 1, "duplicate_results": 0, "wrong_ranks": 0,
+    }
+    # Repairs reach incremental readers
+    logged = db.query(models.ChangeLog.table_name, models.ChangeLog.op).distinct().all()
+    assert {("participant_event", "upsert"), ("results", "delete"), ("results", "upsert")} <= set(logged)
+
+
+def test_scheduled_scans_reschedule(db, dataset, monkeypatch):
+    monkeypatch.setattr(jobs, "INTEGRITY_SCAN_INTERVAL", 300)
+    jobs.schedule_integrity_scan(db, delay=0)
+    jobs.schedule_integrity_scan(db, delay=0)
+    job = jobs.claim(db)
+    assert job.kind == "integrity" and job.contest_id is None
+    jobs.run(job.id)
+
+    db.expire_all()
+    assert db.get(models.Job, job.id).result["reports"][0]["contest_id"] == models.DEFAULT_CONTEST_ID
+    waiting = db.query(models.Job).filter(models.Job.kind == "integrity", models.Job.status == "queued").all()
+    assert len(waiting) == 1 and waiting[0].run_after > job.started_at
+    # The next scan is not due yet
+    assert jobs.claim(db) is None
+
+
+def test_scan_query_count(db, count_queries, per_category):
+    make_dataset(db, participants_per_category=per_category)
+    with count_queries() as statements:
+        integrity.scan(db, models.DEFAULT_CONTEST_ID)
+    # One query per check plus the tie-break chains, however many rows
+    assert len(statements) <= 5
@@ -0,0 +1,123 @@
+import zipfile
+
+from app import archive, certificates, jobs, models
+
+from conftest import make_dataset
+
+
+def test_export_job(client, dataset, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "EXPORT_DIR", str(tmp_path))
+    created = client.post("/jobs/export", json={"category_id": dataset["categories"][0].id})
+    assert created.status_code == 202
+    job_id = created.json()["id"]
+    assert created.json()["status"] == "queued"
+
+    # No workers run under test; run the job inline
+    jobs.run(job_id)
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["status"] == "completed"
+    assert job["result"]["rows"] == 10
+
+    download = client.get(f"/jobs/{job_id}/download")
+    assert download.status_code == 200
+    assert download.text.startswith("category,event,chest_number")
+
+
+def test_job_idempotency_key(client, dataset):
+    first = client.post("/jobs/stats", json={}, headers={"Idempotency-Key": "stats-1"}).json()
+    second = client.post("/jobs/stats", json={}, headers={"Idempotency-Key": "stats-1"}).json()
+    assert first["id"] == second["id"]
+
+
+def test_job_idempotency_key_is_per_contest(client, dataset):
+    other = client.post("/contests/", json={"name": "Kalotsavam 2025"}).json()["id"]
+    first = client.post("/jobs/stats", json={}, headers={"Idempotency-Key": "stats-1"}).json()
+    second = client.post(
+        "/jobs/stats", json={}, headers={"Idempotency-Key": "stats-1", "X-Contest-Id": str(other)}
+    ).json()
+    assert first["id"] != second["id"]
+    retried = client.post(
+        "/jobs/stats", json={}, headers={"Idempotency-Key": "stats-1", "X-Contest-Id": str(other)}
+    ).json()
+    assert retried["id"] == second["id"]
+
+
+def test_jobs_stay_in_their_contest(client, db, dataset, tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+    other = models.Contest(name="Other")
+    db.add(other)
+    db.commit()
+    foreign = make_dataset(db, categories=1, contest_id=other.id)
+    foreign_event_id = foreign["events"][0].id
+    for result in foreign["results"]:
+        result.rank = 1
+    db.commit()
+
+    rerank_id = client.post("/jobs/rerank", json={"event_ids": [foreign_event_id]}).json()["id"]
+    jobs.run(rerank_id)
+    assert client.get(f"/jobs/{rerank_id}").json()["result"] == {"updated": 0}
+
+    archive_id = client.post("/jobs/archive", json={"contest_id": other.id}).json()["id"]
+    jobs.run(archive_id)
+    db.expire_all()
+    # The job archived its own contest, not the one the payload named
+    assert db.get(models.Contest, other.id).archived_at is None
+    assert db.get(models.Contest, models.DEFAULT_CONTEST_ID).archived_at is not None
+    foreign_results = db.query(models.Result).filter(models.Result.event_id == foreign_event_id).all()
+    assert {r.rank for r in foreign_results} == {1}
+
+
+def test_unknown_job(client):
+    assert client.post("/jobs/nope", json={}).status_code == 404
+    assert client.get("/jobs/999").status_code == 404
+    assert client.get("/jobs/999/download").status_code == 404
+
+
+def test_incomplete_job_download(client, dataset):
+    job_id = client.post("/jobs/stats", json={}).json()["id"]
+    assert client.get(f"/jobs/{job_id}/download").status_code == 409
+
+
+def test_dashboard_stats(client, dataset, count_queries):
+    with count_queries() as statements:
+        response = client.get("/dashboard/stats")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["total_categories"] == 2
+    assert stats["total_events"] == 6
+    assert stats["total_participants"] == 20
+    assert stats["completed_events"] == 2
+    assert len(statements) <= 12
+
+
+def test_cached_dashboard_stats(client, dataset):
+    job_id = client.post("/jobs/stats", json={}).json()["id"]
+    jobs.run(job_id)
+    assert client.get("/dashboard/stats?cached=true").json()["total_participants"] == 20
+
+
+def test_certificate_job(client, dataset, tmp_path, monkeypatch):
+    monkeypatch.setattr(certificates, "CERTIFICATE_DIR", str(tmp_path))
+    monkeypatch.setattr(certificates, "CERTIFICATE_WORKERS", 1)
+    created = client.post("/certificates/jobs", json={"max_rank": 3, "event_id": dataset["events"][0].id})
+    assert created.status_code == 202
+    job_id = created.json()["id"]
+
+    thread = certificates._running.get(job_id)
+    if thread is not None:
+        thread.join(timeout=60)
+    job = client.get(f"/certificates/jobs/{job_id}").json()
+    assert job["status"] == "completed", job
+    assert job["total"] == 3
+
+    download = client.get(f"/certificates/jobs/{job_id}/download")
+    assert download.status_code == 200
+    with zipfile.ZipFile(tmp_path / job_id / "certificates.zip") as archive:
+        assert "prize_list.pdf" in archive.namelist()
+        assert len([n for n in archive.namelist() if n.startswith("certificates/")]) == 3
+
+
+def test_unknown_certificate_job(client):
+    assert client.get("/certificates/jobs/missing").status_code == 404
+    assert client.get("/certificates/jobs/missing/download").status_code == 404
+    assert client.post("/certificates/jobs/missing/resume").status_code == 404
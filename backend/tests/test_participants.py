@@ -0,0 +1,90 @@
+import pytest
+
+from conftest import make_dataset, participant_payload
+
+
+def test_create_and_get_participant(client, dataset):
+    category = dataset["categories"][0]
+    event_ids = [e.id for e in dataset["events"] if e.category_id == category.id][:2]
+    created = client.post("/participants/", json=participant_payload(category.id, event_ids))
+    assert created.status_code == 200
+
+    response = client.get(f"/participants/{created.json()['id']}")
+    assert response.status_code == 200
+    assert sorted(e["id"] for e in response.json()["events"]) == sorted(event_ids)
+
+
+@pytest.mark.parametrize("overrides, detail", [
+    ({"chest_number": "0000"}, "Chest number already registered"),
+    ({"age": 40}, "not within the allowed range"),
+    ({"category_id": 999}, "Selected category does not exist"),
+])
+def test_create_participant_validation(client, dataset, overrides, detail):
+    payload = participant_payload(dataset["categories"][0].id, [dataset["events"][0].id])
+    payload.update(overrides)
+    response = client.post("/participants/", json=payload)
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
+
+
+def test_create_participant_with_event_of_other_category(client, dataset):
+    category = dataset["categories"][0]
+    other_event = next(e for e in dataset["events"] if e.category_id != category.id)
+    response = client.post("/participants/", json=participant_payload(category.id, [other_event.id]))
+    assert response.status_code == 400
+
+
+def test_list_participants_query_count(client, db, count_queries, per_category):
+    data = make_dataset(db, participants_per_category=per_category)
+    event_id = data["events"][0].id
+    with count_queries() as statements:
+        response = client.get(f"/participants/?event_id={event_id}")
+    assert response.status_code == 200
+    assert len(response.json()) == per_category
+    assert all("total_marks" in p for p in response.json())
+    # Events and results are eager loaded, so the count does not depend on the number of participants
+    assert len(statements) <= 2
+
+
+def test_list_participants_with_event_ids(client, dataset):
+    category_id = dataset["categories"][1].id
+    response = client.get(f"/participants/?category_id={category_id}&events=ids")
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["participants"]) == 10
+    assert set(body["events"]) == {str(e.id) for e in dataset["events"] if e.category_id == category_id}
+    assert "events" not in body["participants"][0]
+
+
+def test_by_category_event_query_count(client, db, count_queries, per_category):
+    data = make_dataset(db, participants_per_category=per_category)
+    event = data["events"][0]
+    with count_queries() as statements:
+        response = client.get(f"/participants/by-category-event/{event.category_id}/{event.id}")
+    assert response.status_code == 200
+    assert len(response.json()) == per_category
+    # Participants, their events (selectin), then lazy categories in serialisation;
+    # none of these repeat per participant
+    assert len(statements) <= 4
+
+
+def test_update_participant(client, dataset):
+    participant = dataset["participants"][0]
+    event_ids = [dataset["events"][1].id]
+    payload = participant_payload(participant.category_id, event_ids, chest_number=participant.chest_number, age=participant.age)
+    response = client.put(f"/participants/{participant.id}", json=payload)
+    assert response.status_code == 200
+    assert [e["id"] for e in response.json()["events"]] == event_ids
+
+
+def test_update_participant_duplicate_chest_number(client, dataset):
+    first, second = dataset["participants"][:2]
+    payload = participant_payload(first.category_id, [], chest_number=second.chest_number, age=first.age)
+    assert client.put(f"/participants/{first.id}", json=payload).status_code == 400
+
+
+def test_delete_participant(client, dataset):
+    participant_id = dataset["participants"][0].id
+    assert client.delete(f"/participants/{participant_id}").status_code == 200
+    assert client.get(f"/participants/{participant_id}").status_code == 404
+    assert client.delete(f"/participants/{participant_id}").status_code == 404
@@ -0,0 +1,77 @@
+from app import dictionaries, jobs, models
+
+from conftest import participant_payload
+
+
+def test_name_key():
+    assert dictionaries.name_key("  St. Mary's  Church ") == dictionaries.name_key("st marys church")
+    assert dictionaries.name_key("  ") is None
+    assert dictionaries.name_key(None) is None
+
+
+def test_spelling_variants_share_one_row(client, dataset, db):
+    category_id = dataset["categories"][0].id
+    first = client.post("/participants/", json=participant_payload(category_id, church="St. Mary's Kottayam"))
+    second = client.post("/participants/", json=participant_payload(category_id, chest_number="A002", church="st marys  kottayam"))
+    assert first.status_code == second.status_code == 200
+    # Both read back with the first spelling
+    assert second.json()["church"] == "St. Mary's Kottayam"
+
+    ids = {p.church_id for p in db.query(models.Participant).filter(models.Participant.id.in_([first.json()["id"], second.json()["id"]]))}
+    assert len(ids) == 1
+    assert db.query(models.Church).count() == 2
+
+
+def test_update_only_place(client, dataset):
+    participant = dataset["participants"][0]
+    payload = participant_payload(participant.category_id, chest_number=participant.chest_number,
+                                  age=participant.age, church="St. George")
+    assert client.put(f"/participants/{participant.id}", json=payload).status_code == 200
+    assert client.get(f"/participants/{participant.id}").json()["church"] == "St. George"
+
+
+def test_blank_place_is_null(client, dataset, db):
+    category_id = dataset["categories"][0].id
+    created = client.post("/participants/", json=participant_payload(category_id, church=" ")).json()
+    assert created["church"] is None
+    assert db.get(models.Participant, created["id"]).church_id is None
+
+
+def test_import_encodes_names_in_bulk(client, dataset, count_queries):
+    rows = [
+        participant_payload(None, name=f"Imported {i}", chest_number=f"I{i:04d}", church=f"Church {i % 7}",
+                            district=f"District {i % 3}")
+        for i in range(300)
+    ]
+    job_id = client.post("/jobs/import", json={"participants": rows}).json()["id"]
+    with count_queries() as statements:
+        jobs.run(job_id)
+    assert client.get(f"/jobs/{job_id}").json()["result"]["created"] == 300
+    lookups = [s for s in statements if "churches" in s and "participants" not in s]
+    # Look up, insert the new names, read them back: not one query per row
+    assert len(lookups) <= 3
+
+
+def test_place_rollup(client, dataset):
+    category_id = dataset["categories"][0].id
+    client.post("/participants/", json=participant_payload(category_id, district="South"))
+    rows = client.get("/reports/places?levels=state,district").json()
+    assert rows == [
+        {"state": "Kerala", "district": "North", "participants": 20},
+        {"state": "Kerala", "district": "South", "participants": 1},
+    ]
+    assert client.get("/reports/places?levels=country").status_code == 400
+
+
+def test_place_names(client, dataset):
+    category_id = dataset["categories"][0].id
+    client.post("/participants/", json=participant_payload(category_id, church="St. Thomas"))
+    assert [e["name"] for e in client.get("/places/church?q=st").json()] == ["St. Mary", "St. Thomas"]
+    assert client.get("/places/parish").status_code == 404
+
+
+def test_sync_pull_keeps_names(client, dataset):
+    participant = client.get("/sync").json()["participants"][0]
+    assert (participant["church"], participant["district"], participant["region"], participant["state"]) == (
+        "St. Mary", "North", "Central", "Kerala"
+    )
@@ -0,0 +1,61 @@
+import pytest
+
+from app import profiling
+
+
+@pytest.fixture
+def profiled(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    return {"X-Profile-Token": "secret"}
+
+
+def test_requests_are_not_profiled_by_default(client, dataset, tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    response = client.get("/participants/")
+    assert "X-Profile-Id" not in response.headers
+    assert list(tmp_path.iterdir()) == []
+    assert client.get("/admin/profiles").status_code == 403
+
+
+def test_profile_requested_by_header(client, dataset, profiled):
+    category_id = dataset["categories"][0].id
+    response = client.get(f"/participants/?category_id={category_id}", headers=profiled)
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    profile = client.get(f"/admin/profiles/{profile_id}", headers=profiled).json()
+    assert profile["path"] == "/participants/"
+    assert profile["reason"] == "requested"
+    assert profile["status_code"] == 200
+    assert profile["sql_count"] == len(profile["statements"]) >= 1
+    assert any("participants" in s["statement"] for s in profile["statements"])
+    assert any("get_participants" in f["function"] for f in profile["functions"])
+
+    assert [p["id"] for p in client.get("/admin/profiles", headers=profiled).json()] == [profile_id]
+    download = client.get(f"/admin/profiles/{profile_id}/download", headers=profiled)
+    assert download.status_code == 200 and download.content
+
+
+def test_wrong_token_is_not_profiled(client, dataset, profiled):
+    response = client.get("/participants/", headers={"X-Profile-Token": "guess"})
+    assert "X-Profile-Id" not in response.headers
+    assert client.get("/admin/profiles", headers={"X-Profile-Token": "guess"}).status_code == 403
+
+
+def test_sampled_requests(client, dataset, profiled, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    profile_id = client.get("/categories/").headers["X-Profile-Id"]
+    assert client.get(f"/admin/profiles/{profile_id}", headers=profiled).json()["reason"] == "sampled"
+
+
+def test_old_profiles_are_pruned(client, dataset, profiled, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_KEEP", 2)
+    for _ in range(4):
+        client.get("/categories/", headers=profiled)
+    assert len(profiling.list_profiles()) == 2
+
+
+def test_missing_profile(client, profiled):
+    assert client.get("/admin/profiles/nope", headers=profiled).status_code == 404
+    assert client.get("/admin/profiles/..%2Fjobs/download", headers=profiled).status_code == 404
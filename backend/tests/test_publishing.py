@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+from app import models, static_site
+
+from conftest import make_dataset
+
+
+def test_drafts_stay_private(client, dataset):
+    event = dataset["events"][0]
+    assert client.get("/public/results").json() == []
+    # Organisers still see the drafts
+    assert len(client.get(f"/results/?event_id={event.id}").json()) == 10
+
+
+def test_publish_snapshot(client, dataset, db):
+    event = dataset["events"][0]
+    result = dataset["results"][0]
+    participant_id, event_id = result.participant_id, event.id
+    published = client.post(f"/events/{event_id}/publish").json()
+    assert published == {"event_id": event_id, "version": 1, "results": 10}
+
+    board = client.get(f"/public/results?event_id={event_id}").json()
+    assert [(e["event_id"], e["version"]) for e in board] == [(event_id, 1)]
+    assert [r["rank"] for r in board[0]["results"]] == list(range(1, 11))
+
+    # A later draft edit is not public until the event is published again
+    update = {"participant_id": participant_id, "event_id": event_id,
+              "mark1": 13, "mark2": 13, "mark3": 14, "total_marks": 40, "rank": 1}
+    client.post("/results/update", json=update)
+    board = client.get(f"/public/results?event_id={event_id}").json()
+    assert board[0]["results"][0]["total_marks"] == 30
+
+    assert client.post(f"/events/{event_id}/publish").json()["version"] == 2
+    board = client.get(f"/public/results?event_id={event_id}").json()
+    # Ranks are recomputed on publish, whatever the client sent
+    assert [r["total_marks"] for r in board[0]["results"] if r["rank"] == 1] == [40]
+    # The superseded snapshot is pruned
+    assert db.query(models.PublishedResult).count() == 10
+
+
+def test_etag_revalidation(client, dataset):
+    event_id = dataset["events"][0].id
+    client.post(f"/events/{event_id}/publish")
+    first = client.get("/public/results")
+    etag = first.headers["etag"]
+    assert "no-cache" in first.headers["cache-control"]
+
+    not_modified = client.get("/public/results", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+
+    client.post(f"/events/{event_id}/publish")
+    changed = client.get("/public/results", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_unpublish(client, dataset):
+    event_id = dataset["events"][0].id
+    client.post(f"/events/{event_id}/publish")
+    assert client.post(f"/events/{event_id}/unpublish").status_code == 200
+    assert client.get("/public/results").json() == []
+    # Versions are never reused, so cached copies of the old one cannot match
+    assert client.post(f"/events/{event_id}/publish").json()["version"] == 2
+    assert client.post("/events/9999/publish").status_code == 404
+
+
+def test_static_site_shows_published_results(client, dataset, db, tmp_path):
+    event_id = dataset["events"][0].id
+    site = tmp_path / str(models.DEFAULT_CONTEST_ID)
+    static_site.build_site(db, str(tmp_path), models.DEFAULT_CONTEST_ID)
+    page = json.loads((site / "events" / f"{event_id}.json").read_text())
+    assert page["results"] == []
+
+    client.post(f"/events/{event_id}/publish")
+    static_site.build_site(db, str(tmp_path), models.DEFAULT_CONTEST_ID, event_ids={event_id})
+    page = json.loads((site / "events" / f"{event_id}.json").read_text())
+    assert len(page["results"]) == 10
+
+
+def test_static_site_per_contest(client, dataset, db, tmp_path):
+    other = models.Contest(name="Other")
+    db.add(other)
+    db.flush()
+    other_data = make_dataset(db, categories=1, contest_id=other.id)
+    db.commit()
+    client.post(f"/events/{dataset['events'][0].id}/publish")
+    client.post(f"/events/{other_data['events'][0].id}/publish", headers={"X-Contest-Id": str(other.id)})
+
+    for contest_id in (models.DEFAULT_CONTEST_ID, other.id):
+        static_site.build_site(db, str(tmp_path), contest_id)
+
+    def listed(contest_id):
+        site = tmp_path / str(contest_id)
+        categories = json.loads((site / "index.json").read_text())
+        events = sorted(int(path.stem) for path in (site / "events").glob("*.json"))
+        return [c["id"] for c in categories], events
+
+    assert listed(models.DEFAULT_CONTEST_ID) == (
+        [c.id for c in dataset["categories"]], sorted(e.id for e in dataset["events"]),
+    )
+    assert listed(other.id) == ([other_data["categories"][0].id], [e.id for e in other_data["events"]])
+    page = json.loads((tmp_path / str(other.id) / "events" / f"{other_data['events'][0].id}.json").read_text())
+    assert len(page["results"]) == 10
+
+
+def test_delete_published_event(client, dataset, db):
+    event_id = dataset["events"][0].id
+    client.post(f"/events/{event_id}/publish")
+    assert client.delete(f"/events/{event_id}").status_code == 200
+    assert db.query(models.PublishedResult).count() == 0
+
+
+def test_public_results_query_count(client, db, count_queries, per_category):
+    data = make_dataset(db, participants_per_category=per_category)
+    event_ids = [e.id for e in data["events"]]
+    for event_id in event_ids:
+        client.post(f"/events/{event_id}/publish")
+    with count_queries() as statements:
+        board = client.get("/public/results").json()
+    assert len(board) == len(event_ids)
+    # Contest check and one query for every event and snapshot row
+    assert len(statements) <= 2
@@ -0,0 +1,68 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from app import database, models
+
+CATEGORY = {"min_age": 30, "max_age": 39, "description": ""}
+
+
+@pytest.fixture
+def replica(engine, monkeypatch):
+    """A second SQLite database standing in for a read replica."""
+    replica_engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(replica_engine)
+    with replica_engine.begin() as connection:
+        connection.execute(models.Contest.__table__.insert(), {"id": models.DEFAULT_CONTEST_ID, "name": "Default contest"})
+        # Only on the replica, so a response shows which database answered
+        connection.execute(models.Category.__table__.insert(), {
+            "contest_id": models.DEFAULT_CONTEST_ID, "name": "Replica only",
+            "min_age": 20, "max_age": 29, "description": "",
+        })
+    monkeypatch.setattr(database, "replica_engines", [replica_engine])
+    database._replica_lag.clear()
+    yield replica_engine
+    database._replica_lag.clear()
+    replica_engine.dispose()
+
+
+def names(response):
+    return [c["name"] for c in response.json()]
+
+
+def test_reads_go_to_the_replica(client, replica):
+    assert names(client.get("/categories/")) == ["Replica only"]
+
+
+def test_writes_and_primary_reads_go_to_the_primary(client, db, replica):
+    created = client.post("/categories/", json={"name": "Seniors", **CATEGORY})
+    assert created.status_code == 200
+    assert db.query(models.Category.name).filter(models.Category.id == created.json()["id"]).scalar() == "Seniors"
+    with replica.connect() as connection:
+        assert connection.execute(models.Category.__table__.select().where(models.Category.name == "Seniors")).first() is None
+
+    # The write set the read-your-writes cookie, so this client reads its own write
+    assert database.READ_YOUR_WRITES_COOKIE in created.cookies
+    assert names(client.get("/categories/")) == ["Seniors"]
+
+    client.cookies.clear()
+    assert names(client.get("/categories/")) == ["Replica only"]
+    assert names(client.get("/categories/", headers={"X-Read-Primary": "1"})) == ["Seniors"]
+
+
+def test_lagging_replica_falls_back_to_the_primary(client, replica, monkeypatch):
+    monkeypatch.setattr(database, "REPLICA_MAX_LAG", 5.0)
+    database._replica_lag[replica] = (time.monotonic(), 60.0)
+    assert database.pick_replica() is None
+    assert names(client.get("/categories/")) == []
+
+    # An unreachable replica is skipped the same way
+    database._replica_lag[replica] = (time.monotonic(), None)
+    assert names(client.get("/categories/")) == []
+
+    # Lag is measured again once the check interval has passed
+    database._replica_lag[replica] = (time.monotonic() - database.REPLICA_LAG_CHECK_INTERVAL - 1, 60.0)
+    assert names(client.get("/categories/")) == ["Replica only"]
+    assert database._replica_lag[replica][1] == 0.0
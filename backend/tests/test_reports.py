@@ -0,0 +1,115 @@
+from datetime import datetime
+
+import pytest
+
+from app import changes, models, reports
+
+from conftest import make_dataset, participant_payload
+
+
+def find(rows, **fields):
+    return [row for row in rows if all(row[name] == value for name, value in fields.items())]
+
+
+def test_rollup_levels(client, dataset):
+    category = dataset["categories"][0]
+    client.post("/participants/", json=participant_payload(category.id, event_ids=[dataset["events"][0].id]))
+    rows = client.get("/reports/rollup").json()
+
+    total = find(rows, level="total")
+    assert len(total) == 1
+    # 2 categories x 10 participants x 3 events, plus the new participant's entry
+    assert total[0]["participants"] == 21
+    assert total[0]["entries"] == 61
+    assert (total[0]["gold"], total[0]["silver"], total[0]["bronze"], total[0]["medals"]) == (2, 2, 2, 6)
+
+    first = find(rows, level="category", category_id=category.id)[0]
+    assert (first["participants"], first["entries"], first["medals"]) == (11, 31, 3)
+
+    churches = find(rows, level="church", category_id=category.id)
+    assert [(row["district"], row["church"], row["participants"]) for row in churches] == [
+        ("North", "St. Mary", 10), ("South", "St. Thomas", 1)
+    ]
+    # Across categories
+    region = find(rows, level="region", category_id=None)
+    assert [(row["state"], row["region"], row["participants"]) for row in region] == [("Kerala", "Central", 21)]
+
+    # Each category's subtotal comes before its places, and whole-contest rows last
+    levels = [row["level"] for row in rows if row["category_id"] == category.id]
+    assert levels[:3] == ["category", "state", "region"]
+    assert rows[-1]["category_id"] is None
+
+
+def test_rollup_for_one_category(client, dataset):
+    category = dataset["categories"][1]
+    rows = client.get(f"/reports/rollup?category_id={category.id}").json()
+    assert {row["category_id"] for row in rows} == {category.id}
+    assert [row["level"] for row in rows] == ["category", "state", "region", "district", "church"]
+    assert all(row["participants"] == 10 and row["entries"] == 30 for row in rows)
+    assert client.get("/reports/rollup?category_id=999").status_code == 404
+
+
+def test_rollup_empty_category(client, db):
+    category_id = client.post("/categories/", json={"name": "Seniors", "min_age": 60, "max_age": 99, "description": ""}).json()["id"]
+    rows = client.get(f"/reports/rollup?category_id={category_id}").json()
+    assert rows == [{
+        "level": "category", "category_id": category_id, "category": "Seniors",
+        "state": None, "region": None, "district": None, "church": None,
+        "participants": 0, "entries": 0, "gold": 0, "silver": 0, "bronze": 0, "medals": 0,
+    }]
+
+
+def test_rollup_cached_until_write(client, dataset, count_queries):
+    participant = dataset["participants"][0]
+    payload = participant_payload(participant.category_id, chest_number=participant.chest_number, age=participant.age)
+    client.get("/reports/rollup")
+    with count_queries() as statements:
+        client.get("/reports/rollup")
+    # Only the change_log version
+    assert len(statements) == 1
+
+    assert client.put(f"/participants/{participant.id}", json=payload).status_code == 200
+    rows = client.get("/reports/rollup").json()
+    assert find(rows, level="church", church="St. Thomas", category_id=None)[0]["participants"] == 1
+
+
+def test_rollup_cache_sees_commits_while_a_writer_is_open(client, dataset, monkeypatch):
+    # A long transaction (an import, say) holds the commit-safe watermark back
+    settled = datetime.utcnow()
+    monkeypatch.setattr(changes, "_in_flight_since", lambda db: settled)
+    category = dataset["categories"][0]
+    client.get("/reports/rollup")
+
+    client.post("/participants/", json=participant_payload(category.id))
+    total = find(client.get("/reports/rollup").json(), level="total")[0]
+    assert total["participants"] == 21
+
+
+@pytest.mark.parametrize("by_category", [False, True])
+def test_rollup_sql_matches_python(client, db, dataset, by_category):
+    if db.get_bind().dialect.name != "postgresql":
+        pytest.skip("GROUPING SETS needs Postgres (set TEST_DATABASE_URL)")
+    category = dataset["categories"][0]
+    client.post("/participants/", json=participant_payload(category.id, event_ids=[dataset["events"][0].id]))
+    client.post("/participants/", json=participant_payload(category.id, chest_number="A002", district="East"))
+    category_id = category.id if by_category else None
+    base = reports._per_participant(models.DEFAULT_CONTEST_ID, category_id)
+
+    def groups(grouped):
+        # Place ids can be null, so compare by repr rather than by value
+        return sorted(((sorted(key.items()), counts) for key, counts in grouped(db, base, category_id)), key=repr)
+
+    assert groups(reports._grouped_sql) == groups(reports._grouped_python)
+
+
+def test_rollup_query_count(client, db, count_queries, per_category):
+    make_dataset(db, participants_per_category=per_category)
+    with count_queries() as statements:
+        assert client.get("/reports/rollup").status_code == 200
+    # Contest check, version, grouped counts, category names and one per place level
+    assert len(statements) <= 8
+
+
+def test_rollup_in_batch(client, dataset):
+    payload = client.get("/batch?include=rollup,categories").json()
+    assert find(payload["rollup"], level="total")[0]["participants"] == 20
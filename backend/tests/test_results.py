@@ -0,0 +1,105 @@
+from app import models
+
+from conftest import make_dataset
+
+
+def test_create_results(client, dataset):
+    event = dataset["events"][1]
+    participants = [p for p in dataset["participants"] if p.category_id == event.category_id][:2]
+    payload = [
+        {"participant_id": p.id, "event_id": event.id, "judge1_marks": 8, "judge2_marks": 7,
+         "judge3_marks": 9, "total_marks": 24, "rank": rank}
+        for rank, p in enumerate(participants, start=1)
+    ]
+    response = client.post("/results/", json=payload)
+    assert response.status_code == 200
+    assert response.json()["count"] == 2
+    assert len(client.get(f"/results/?event_id={event.id}").json()) == 2
+
+
+def test_create_results_for_unknown_event(client, dataset):
+    payload = [{"participant_id": dataset["participants"][0].id, "event_id": 999, "judge1_marks": 1,
+                "judge2_marks": 1, "judge3_marks": 1, "total_marks": 3, "rank": 1}]
+    assert client.post("/results/", json=payload).status_code == 400
+
+
+def test_list_results_query_count(client, db, count_queries, per_category):
+    data = make_dataset(db, participants_per_category=per_category)
+    category_id = data["categories"][0].id
+    with count_queries() as statements:
+        response = client.get(f"/results/?category_id={category_id}")
+    assert response.status_code == 200
+    assert len(response.json()) == per_category
+    assert {r["category_name"] for r in response.json()} == {"Category 0"}
+    assert len(statements) <= 2
+
+
+def test_results_summary(client, dataset, count_queries):
+    category_id = dataset["categories"][0].id
+    with count_queries() as statements:
+        response = client.get(f"/results/summary?category_id={category_id}&top=3")
+    assert response.status_code == 200
+    events = response.json()["events"]
+    assert len(events) == 3
+    judged = events[0]
+    assert judged["entrants"] == 10 and judged["scored"] == 10
+    assert [w["rank"] for w in judged["winners"]] == [1, 2, 3]
+    assert events[1]["winners"] == []
+    # One query for the whole category
+    assert len(statements) <= 2
+
+
+def test_get_and_update_result(client, dataset):
+    result = dataset["results"][0]
+    response = client.get(f"/results/{result.participant_id}/{result.event_id}")
+    assert response.status_code == 200
+    assert response.json()["total_marks"] == result.total_marks
+
+    update = {"participant_id": result.participant_id, "event_id": result.event_id,
+              "mark1": 10, "mark2": 9, "mark3": 8, "total_marks": 27, "rank": 1}
+    response = client.post("/results/update", json=update)
+    assert response.status_code == 200
+    assert response.json()["judge1_marks"] == 10
+    assert response.json()["total_marks"] == 27
+
+
+def test_update_result_creates_missing_result(client, dataset):
+    event = dataset["events"][1]
+    participant = next(p for p in dataset["participants"] if p.category_id == event.category_id)
+    update = {"participant_id": participant.id, "event_id": event.id, "mark1": 5, "mark2": 6, "mark3": 7,
+              "total_marks": 18, "rank": 1}
+    assert client.post("/results/update", json=update).status_code == 200
+    assert client.get(f"/results/{participant.id}/{event.id}").json()["judge3_marks"] == 7
+
+
+def test_result_history(client, dataset):
+    result = dataset["results"][0]
+    update = {"participant_id": result.participant_id, "event_id": result.event_id,
+              "mark1": 1, "mark2": 1, "mark3": 1, "total_marks": 3, "rank": 10}
+    client.post("/results/update", json=update)
+
+    response = client.get(f"/results/{result.participant_id}/{result.event_id}/history")
+    assert response.status_code == 200
+    actions = [entry["action"] for entry in response.json()]
+    assert "update" in actions
+
+    assert client.get(f"/results/{result.participant_id}/999/history").status_code == 404
+
+
+def test_bulk_rank_and_delete_are_audited(client, dataset, db):
+    event = dataset["events"][0]
+    winner = max((r for r in dataset["results"] if r.event_id == event.id), key=lambda r: r.total_marks)
+    winner_id, participant_id = winner.id, winner.participant_id
+    winner.rank = 5
+    db.commit()
+
+    client.post(f"/events/{event.id}/rank", headers={"X-Changed-By": "judge-1"})
+    entries = db.query(models.ResultAudit).filter(models.ResultAudit.result_id == winner_id).all()
+    assert (entries[-1].action, entries[-1].rank, entries[-1].changed_by) == ("update", 1, "judge-1")
+
+    client.delete(f"/events/{event.id}")
+    deleted = db.query(models.ResultAudit).filter(
+        models.ResultAudit.event_id == event.id, models.ResultAudit.action == "delete"
+    ).all()
+    assert len(deleted) == 10
+    assert participant_id in {entry.participant_id for entry in deleted}
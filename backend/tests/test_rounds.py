@@ -0,0 +1,104 @@
+from app import models
+
+from conftest import event_payload, make_dataset
+
+
+def create_final(client, category_id, **overrides):
+    response = client.post("/events/", json=event_payload(category_id, name="Final", venue="Main stage", **overrides))
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def participant_ids(client, event_id):
+    return {p["id"] for p in client.get(f"/participants/?event_id={event_id}").json()}
+
+
+def test_advance_top_n(client, dataset, db):
+    heat = dataset["events"][0]
+    top_three = {p.id for p in dataset["participants"][7:10]}
+    final_id = create_final(client, heat.category_id)
+    assert client.put(f"/events/{heat.id}", json=event_payload(heat.category_id, next_round_id=final_id, qualify_top=3)).status_code == 200
+
+    advanced = client.post(f"/events/{heat.id}/advance").json()
+    assert advanced == {"event_id": heat.id, "next_round_id": final_id, "qualified": 3, "registered": 3}
+    assert participant_ids(client, final_id) == top_three
+    # Memberships reach the change feed like any other registration
+    logged = db.query(models.ChangeLog).filter(
+        models.ChangeLog.table_name == "participant_event", models.ChangeLog.related_id == final_id
+    ).all()
+    assert {entry.row_id for entry in logged} == top_three
+
+    # Advancing again adds nobody twice
+    assert client.post(f"/events/{heat.id}/advance").json()["registered"] == 0
+    assert len(participant_ids(client, final_id)) == 3
+
+
+def test_advance_by_marks(client, dataset):
+    heat = dataset["events"][0]
+    final_id = create_final(client, heat.category_id)
+    # Totals are 3, 6, ... 30
+    client.put(f"/events/{heat.id}", json=event_payload(heat.category_id, next_round_id=final_id, qualify_min_marks=24))
+    assert client.post(f"/events/{heat.id}/advance").json()["qualified"] == 3
+
+    client.put(f"/events/{heat.id}", json=event_payload(heat.category_id, next_round_id=final_id, qualify_top=5, qualify_min_marks=27))
+    assert client.post(f"/events/{heat.id}/advance").json()["qualified"] == 2
+
+
+def test_ties_at_the_cut_all_qualify(client, dataset, db):
+    heat = dataset["events"][0]
+    # Third and fourth place tie
+    result = next(r for r in dataset["results"] if r.participant_id == dataset["participants"][6].id)
+    result.total_marks = 24.0
+    db.commit()
+    final_id = create_final(client, heat.category_id)
+    client.put(f"/events/{heat.id}", json=event_payload(heat.category_id, next_round_id=final_id, qualify_top=3))
+    assert client.post(f"/events/{heat.id}/advance").json()["qualified"] == 4
+
+
+def test_heats_feed_one_final(client, dataset):
+    heats = dataset["events"][:2]
+    final_id = create_final(client, heats[0].category_id)
+    for heat in heats:
+        client.put(f"/events/{heat.id}", json=event_payload(heat.category_id, next_round_id=final_id, qualify_top=2))
+        client.post(f"/events/{heat.id}/advance")
+    # Only the first heat is judged
+    assert len(participant_ids(client, final_id)) == 2
+
+
+def test_round_validation(client, dataset):
+    heat, semi = dataset["events"][:2]
+    other_category = dataset["events"][3]
+    assert client.put(f"/events/{heat.id}", json=event_payload(heat.category_id, next_round_id=heat.id)).status_code == 400
+    assert client.put(f"/events/{heat.id}", json=event_payload(heat.category_id, next_round_id=other_category.id)).status_code == 400
+    assert client.put(f"/events/{heat.id}", json=event_payload(heat.category_id, next_round_id=9999)).status_code == 400
+    assert client.put(f"/events/{heat.id}", json=event_payload(heat.category_id, qualify_top=0)).status_code == 400
+
+    assert client.put(f"/events/{heat.id}", json=event_payload(heat.category_id, next_round_id=semi.id)).status_code == 200
+    cycle = client.put(f"/events/{semi.id}", json=event_payload(semi.category_id, next_round_id=heat.id))
+    assert cycle.status_code == 400
+    assert "cycle" in cycle.json()["detail"]
+
+    # A next round but no rule
+    assert client.post(f"/events/{heat.id}/advance").status_code == 400
+    assert client.post(f"/events/{semi.id}/advance").status_code == 400
+    assert client.post("/events/9999/advance").status_code == 404
+
+
+def test_deleting_next_round_unlinks_heats(client, dataset):
+    heat = dataset["events"][0]
+    final_id = create_final(client, heat.category_id)
+    client.put(f"/events/{heat.id}", json=event_payload(heat.category_id, next_round_id=final_id, qualify_top=3))
+    assert client.delete(f"/events/{final_id}").status_code == 200
+    assert client.get(f"/events/{heat.id}").json()["next_round_id"] is None
+
+
+def test_advance_query_count(client, db, count_queries, per_category):
+    data = make_dataset(db, participants_per_category=per_category)
+    heat = data["events"][0]
+    heat_id, category_id = heat.id, heat.category_id
+    final_id = create_final(client, category_id)
+    client.put(f"/events/{heat_id}", json=event_payload(heat.category_id, next_round_id=final_id, qualify_min_marks=0))
+    with count_queries() as statements:
+        assert client.post(f"/events/{heat_id}/advance").json()["registered"] == per_category
+    # Contest and event lookups, lock, count, change log and registrations: not one per qualifier
+    assert len(statements) <= 6
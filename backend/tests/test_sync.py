@@ -0,0 +1,135 @@
+import threading
+import time
+from datetime import datetime
+
+from app import changes, database, models
+
+
+def edit(participant_id, event_id, client_id="tablet-1", **marks):
+    return {"client_id": client_id, "participant_id": participant_id, "event_id": event_id, **marks}
+
+
+def test_full_pull(client, dataset, count_queries):
+    with count_queries() as statements:
+        response = client.get("/sync")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["full"] is True
+    assert len(body["participants"]) == 20
+    assert len(body["results"]) == 20
+    assert sorted(body["participants"][0]["event_ids"]) == [e.id for e in dataset["events"][:3]]
+    # A handful of set-based queries, whatever the size of the contest
+    assert len(statements) <= 8
+
+
+def test_delta_pull_after_push(client, dataset):
+    version = client.get("/sync").json()["version"]
+    result = dataset["results"][0]
+    pushed = client.post("/sync", json={"edits": [
+        edit(result.participant_id, result.event_id, judge1_marks=9, judge2_marks=9, judge3_marks=9, base_version=version),
+    ]}).json()
+    assert pushed["applied"] == ["tablet-1"]
+
+    delta = client.get(f"/sync?since={version}").json()
+    assert delta["full"] is False
+    assert [r["id"] for r in delta["results"]] == [result.id]
+    assert delta["results"][0]["total_marks"] == 27
+
+
+def test_delta_pull_after_advancing_a_round(client, dataset):
+    heat = dataset["events"][0]
+    final_id = client.post("/events/", json={"name": "Final", "category_id": heat.category_id,
+                                             "date": "2024-12-21", "venue": "Main stage"}).json()["id"]
+    client.put(f"/events/{heat.id}", json={"name": heat.name, "category_id": heat.category_id, "date": "2024-12-20",
+                                           "venue": "Hall", "next_round_id": final_id, "qualify_top": 2})
+    version = client.get("/sync").json()["version"]
+    assert client.post(f"/events/{heat.id}/advance").json()["registered"] == 2
+
+    # The bulk registration reaches tablets without a full pull
+    delta = client.get(f"/sync?since={version}").json()
+    finalists = {p["id"] for p in delta["participants"] if final_id in p["event_ids"]}
+    assert finalists == {p.id for p in dataset["participants"][8:10]}
+    assert delta["deleted"]["participants"] == []
+
+
+def test_push_conflict_and_rejection(client, dataset):
+    result = dataset["results"][0]
+    client.post("/results/update", json={"participant_id": result.participant_id, "event_id": result.event_id,
+                                         "mark1": 1, "mark2": 2, "mark3": 3, "total_marks": 6, "rank": 5})
+    pushed = client.post("/sync", json={"edits": [
+        edit(result.participant_id, result.event_id, judge1_marks=9, judge2_marks=9, judge3_marks=9, base_version=0),
+        edit(result.participant_id, 999, client_id="tablet-2", judge1_marks=1),
+    ]}).json()
+    assert [c["client_id"] for c in pushed["conflicts"]] == ["tablet-1"]
+    assert [r["client_id"] for r in pushed["rejected"]] == ["tablet-2"]
+
+
+def test_push_without_rank(client, dataset):
+    event = dataset["events"][1]
+    participants = [p for p in dataset["participants"] if event in p.events][:2]
+    pushed = client.post("/sync", json={"edits": [
+        edit(participants[0].id, event.id, judge1_marks=5, judge2_marks=5, judge3_marks=5),
+        edit(participants[1].id, event.id, client_id="tablet-2", judge1_marks=9),
+    ]}).json()
+    assert pushed["applied"] == ["tablet-1", "tablet-2"]
+
+    # The server ranks the new results, and partial marks read back as null
+    results = client.get(f"/results/?event_id={event.id}")
+    assert results.status_code == 200
+    assert [(r["total_marks"], r["rank"], r["judge2_marks"]) for r in results.json()] == [(15, 1, 5), (9, 2, None)]
+
+
+def test_change_feed(client, dataset):
+    first = client.get("/changes?limit=5")
+    assert first.status_code == 200
+    page = first.json()
+    assert len(page["changes"]) == 5 and page["has_more"] is True
+
+    rest = client.get(f"/changes?after={page['cursor']}&tables=results&limit=5000").json()
+    assert {c["table"] for c in rest["changes"]} == {"results"}
+    assert all(c["contest_id"] == 1 for c in rest["changes"])
+
+
+def test_cursors_stop_at_the_commit_watermark(client, dataset, monkeypatch):
+    version = client.get("/sync").json()["version"]
+    first, second = dataset["results"][:2]
+    client.post("/sync", json={"edits": [edit(first.participant_id, first.event_id, judge1_marks=9, base_version=version)]})
+    settled = datetime.utcnow()
+    time.sleep(0.01)
+    client.post("/sync", json={"edits": [edit(second.participant_id, second.event_id, judge1_marks=9, base_version=version)]})
+
+    # A transaction that began in between is still writing, so the later entry is held back
+    monkeypatch.setattr(changes, "_in_flight_since", lambda db: settled)
+    delta = client.get(f"/sync?since={version}").json()
+    assert [r["id"] for r in delta["results"]] == [first.id]
+    page = client.get(f"/changes?after={version}&tables=results").json()
+    assert [c["row_id"] for c in page["changes"]] == [first.id]
+    assert page["cursor"] == delta["version"]
+
+    monkeypatch.setattr(changes, "_in_flight_since", lambda db: None)
+    assert [r["id"] for r in client.get(f"/sync?since={delta['version']}").json()["results"]] == [second.id]
+
+
+def test_long_poll_wakes_on_commit(client, dataset, db):
+    version = changes.current_version(db)
+    db.rollback()
+
+    def write():
+        time.sleep(0.3)
+        session = database.SessionLocal()
+        session.add(models.Category(contest_id=models.DEFAULT_CONTEST_ID, name="Late", min_age=60, max_age=69))
+        session.commit()
+        session.close()
+
+    writer = threading.Thread(target=write)
+    started = time.monotonic()
+    writer.start()
+    page = client.get(f"/changes?after={version}&wait=10").json()
+    writer.join()
+    assert [c["table"] for c in page["changes"]] == ["categories"]
+    assert time.monotonic() - started < 5
+
+    # Nothing new: the poll gives up after the wait
+    started = time.monotonic()
+    assert client.get(f"/changes?after={page['cursor']}&wait=1").json()["changes"] == []
+    assert time.monotonic() - started >= 1
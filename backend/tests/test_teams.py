@@ -0,0 +1,120 @@
+from app import models
+
+from conftest import make_dataset
+
+
+def create_team(client, members, event_ids, name="Choir", category_id=None):
+    payload = {
+        "name": name,
+        "chest_number": f"T-{name}",
+        "category_id": category_id or members[0].category_id,
+        "member_ids": [p.id for p in members],
+        "event_ids": event_ids,
+    }
+    response = client.post("/teams/", json=payload)
+    assert response.status_code == 200, response.json()
+    return response.json()
+
+
+def team_result(team_id, event_id, marks):
+    return {"team_id": team_id, "event_id": event_id, "judge1_marks": marks, "judge2_marks": marks, "judge3_marks": marks}
+
+
+def test_create_and_update_team(client, dataset):
+    members = dataset["participants"][:3]
+    event = dataset["events"][1]
+    team = create_team(client, members, [event.id])
+    assert team["member_ids"] == sorted(p.id for p in members)
+    assert team["event_ids"] == [event.id]
+
+    payload = {"name": "Choir", "category_id": event.category_id, "member_ids": [members[0].id], "event_ids": []}
+    updated = client.put(f"/teams/{team['id']}", json=payload).json()
+    assert (updated["member_ids"], updated["event_ids"]) == ([members[0].id], [])
+    assert client.get("/teams/").json() == [updated]
+
+
+def test_team_validation(client, dataset):
+    members = dataset["participants"][:2]
+    other_category_event = dataset["events"][3]
+    payload = {"name": "Choir", "category_id": members[0].category_id, "member_ids": [m.id for m in members]}
+    assert client.post("/teams/", json={**payload, "event_ids": [other_category_event.id]}).status_code == 400
+    assert client.post("/teams/", json={**payload, "member_ids": [9999]}).status_code == 400
+    assert client.post("/teams/", json={**payload, "member_ids": []}).status_code == 400
+    assert client.post("/teams/", json={**payload, "category_id": 9999}).status_code == 400
+    assert client.post("/teams/", json=payload).status_code == 200
+    # Names are unique within a contest
+    assert client.post("/teams/", json=payload).status_code == 400
+
+
+def test_team_results_are_ranked(client, dataset):
+    event = dataset["events"][1]
+    members = dataset["participants"]
+    first = create_team(client, members[:3], [event.id], name="A")
+    second = create_team(client, members[3:6], [event.id], name="B")
+    third = create_team(client, members[6:9], [event.id], name="C")
+
+    response = client.post("/team-results/", json=[
+        team_result(first["id"], event.id, 7), team_result(second["id"], event.id, 9), team_result(third["id"], event.id, 8),
+    ])
+    assert response.json()["count"] == 3
+    ranked = client.get(f"/team-results/?event_id={event.id}").json()
+    assert [(r["team_name"], r["total_marks"], r["rank"]) for r in ranked] == [("B", 27, 1), ("C", 24, 2), ("A", 21, 3)]
+
+    # Posting again updates in place and reranks
+    client.post("/team-results/", json=[team_result(first["id"], event.id, 10)])
+    ranked = client.get(f"/team-results/?event_id={event.id}").json()
+    assert [(r["team_name"], r["rank"]) for r in ranked] == [("A", 1), ("B", 2), ("C", 3)]
+
+    # Only for events the team is registered for
+    not_registered = client.post("/team-results/", json=[team_result(first["id"], dataset["events"][2].id, 5)])
+    assert not_registered.status_code == 400
+
+
+def test_participant_events_include_team_entries(client, dataset):
+    participant = dataset["participants"][0]
+    group_event = dataset["events"][1]
+    team = create_team(client, [participant, dataset["participants"][1]], [group_event.id])
+
+    events = client.get(f"/participants/{participant.id}/events").json()
+    # Three individual entries from the dataset plus one through the team
+    assert len(events) == 4
+    via_team = [e for e in events if e["team_id"] is not None]
+    assert via_team == [{
+        "event_id": group_event.id, "event_name": group_event.name, "category_id": group_event.category_id,
+        "team_id": team["id"], "team_name": "Choir",
+    }]
+    assert client.get("/participants/9999/events").status_code == 404
+
+
+def test_deletes_clean_up_team_rows(client, dataset, db):
+    members = dataset["participants"][:2]
+    event = dataset["events"][1]
+    team = create_team(client, members, [event.id])
+    client.post("/team-results/", json=[team_result(team["id"], event.id, 5)])
+
+    assert client.delete(f"/participants/{members[0].id}").status_code == 200
+    assert client.get(f"/teams/{team['id']}").json()["member_ids"] == [members[1].id]
+    assert client.delete(f"/events/{event.id}").status_code == 200
+    assert db.query(models.TeamResult).count() == 0
+    assert client.delete(f"/teams/{team['id']}").status_code == 200
+    assert client.get(f"/teams/{team['id']}").status_code == 404
+
+
+def test_participant_events_query_count(client, db, count_queries, per_category):
+    data = make_dataset(db, participants_per_category=per_category)
+    participant_id = data["participants"][0].id
+    for i in range(per_category):
+        create_team(client, data["participants"][:2], [data["events"][1].id], name=f"Team {i}")
+    with count_queries() as statements:
+        assert len(client.get(f"/participants/{participant_id}/events").json()) == 3 + per_category
+    assert len(statements) <= 2
+
+
+def test_list_teams_query_count(client, db, count_queries, per_category):
+    data = make_dataset(db, participants_per_category=per_category)
+    members = data["participants"][:2]
+    for i in range(per_category):
+        create_team(client, members, [data["events"][1].id], name=f"Team {i}")
+    with count_queries() as statements:
+        assert len(client.get("/teams/").json()) == per_category
+    assert len(statements) <= 4
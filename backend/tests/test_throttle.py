@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from app import main, throttle
+
+
+def test_single_flight_shares_one_call():
+    flight = throttle.SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "rows"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", fetch)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("key", fetch))) for _ in range(5)]
+    for thread in followers:
+        thread.start()
+    # Let the followers reach the wait before the leader finishes
+    time.sleep(0.2)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert results == ["rows"] * 6
+    assert len(calls) == 1
+    # The call is forgotten once done, so the next read queries afresh
+    assert flight.do("key", lambda: "fresh") == "fresh"
+
+
+def test_single_flight_passes_errors_to_every_caller():
+    flight = throttle.SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fetch():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("database gone")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("key", fetch)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=call) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    # Let the followers reach the wait before the leader finishes
+    time.sleep(0.2)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+    assert errors == ["database gone"] * 4
+
+
+def test_bucket_refills(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(throttle.time, "monotonic", lambda: now[0])
+    limiter = throttle.RateLimiter(rate=2, burst=3)
+    assert [limiter.acquire("a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("a") == pytest.approx(0.5)
+    # Other clients have buckets of their own
+    assert limiter.acquire("b") == 0
+
+    now[0] += 0.5
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") > 0
+    # A full refill never exceeds the burst
+    now[0] += 60
+    assert [limiter.acquire("a") for _ in range(4)][-1] > 0
+
+
+def test_rate_limit_answers_429(client, monkeypatch):
+    monkeypatch.setattr(main, "rate_limiter", throttle.RateLimiter(rate=0.01, burst=2))
+    assert [client.get("/categories/").status_code for _ in range(2)] == [200, 200]
+    limited = client.get("/categories/")
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+    # Writes are never limited
+    assert client.post("/categories/resolve", json=[]).status_code == 200
+
+
+def test_client_ids_only_count_from_a_trusted_proxy(client, monkeypatch):
+    monkeypatch.setattr(main, "rate_limiter", throttle.RateLimiter(rate=0.01, burst=2))
+    # A client sending a new id with each request still runs out
+    statuses = [client.get("/categories/", headers={"X-Client-Id": f"tablet-{i}"}).status_code for i in range(3)]
+    assert statuses == [200, 200, 429]
+
+    # Through a trusted proxy each device has a bucket of its own
+    monkeypatch.setattr(throttle, "RATE_LIMIT_TRUSTED_PROXIES", {"testclient"})
+    assert client.get("/categories/", headers={"X-Client-Id": "tablet-7"}).status_code == 200
+    headers = {"X-Forwarded-For": "10.0.0.8", "X-Client-Id": "tablet-7"}
+    assert [client.get("/categories/", headers=headers).status_code for _ in range(3)] == [200, 200, 429]
@@ -0,0 +1,102 @@
+import pytest
+
+from app import models
+
+from conftest import category_payload, make_dataset
+
+
+def tie(db, data, index, judge_marks, age=None):
+    """Give participant ``index`` of the first category these judge marks (and age)."""
+    participant = data["participants"][index]
+    result = next(r for r in data["results"] if r.participant_id == participant.id)
+    result.judge1_marks, result.judge2_marks, result.judge3_marks = judge_marks
+    result.total_marks = sum(judge_marks)
+    if age is not None:
+        participant.age = age
+    db.commit()
+    return result.id
+
+
+def ranks(db, event_id):
+    db.expire_all()
+    return dict(db.query(models.Result.participant_id, models.Result.rank).filter(models.Result.event_id == event_id))
+
+
+def test_judge_chain_breaks_ties(client, dataset, db):
+    category, event = dataset["categories"][0], dataset["events"][0]
+    third, fourth = dataset["participants"][7].id, dataset["participants"][6].id
+    # Participant 6 ties participant 7 on 24 but with a higher third judge
+    tie(db, dataset, 6, (6.0, 6.0, 12.0))
+    assert client.post(f"/events/{event.id}/rank").json() == {"event_id": event.id, "updated": 1}
+    assert ranks(db, event.id)[third] == ranks(db, event.id)[fourth] == 3
+
+    response = client.put(f"/categories/{category.id}", json=category_payload(category, tie_breaks=["judge3"]))
+    assert response.status_code == 200
+    assert response.json()["tie_breaks"] == ["judge3"]
+    # Changing the chain reranks the category's events
+    assert ranks(db, event.id)[fourth] == 3
+    assert ranks(db, event.id)[third] == 4
+    assert ranks(db, event.id)[dataset["participants"][5].id] == 5
+
+
+def test_age_chain_and_change_log(client, dataset, db):
+    category, event = dataset["categories"][0], dataset["events"][0]
+    older = dataset["participants"][7]
+    younger_result = tie(db, dataset, 6, (7.0, 8.0, 9.0), age=5)
+    older.age = 6
+    db.commit()
+    client.put(f"/categories/{category.id}", json=category_payload(category, tie_breaks=["judge1", "youngest"]))
+    after = client.get("/sync?since=0").json()["version"]
+
+    assert client.post(f"/events/{event.id}/rank").json()["updated"] == 0
+    tie(db, dataset, 6, (7.0, 8.0, 9.0), age=7)
+    assert client.post(f"/events/{event.id}/rank").json()["updated"] == 2
+    assert ranks(db, event.id)[older.id] == 3
+    # Ranks written by the bulk update reach incremental readers
+    delta = client.get(f"/sync?since={after}").json()
+    assert younger_result in {r["id"] for r in delta["results"]}
+
+
+def test_chains_are_per_category(client, dataset, db):
+    first, second = dataset["categories"]
+    tie(db, dataset, 6, (6.0, 6.0, 12.0))
+    client.put(f"/categories/{first.id}", json=category_payload(first, tie_breaks=["judge3"]))
+    # The other category has a tie of its own and no chain
+    other = dataset["participants"][16]
+    other_result = next(r for r in dataset["results"] if r.participant_id == other.id)
+    other_result.judge3_marks, other_result.total_marks = 11.0, 24.0
+    db.commit()
+
+    client.post(f"/events/{dataset['events'][3].id}/rank")
+    other_ranks = ranks(db, dataset["events"][3].id)
+    assert other_ranks[other.id] == other_ranks[dataset["participants"][17].id] == 3
+
+
+def test_ties_at_the_cut_follow_the_chain(client, dataset, db):
+    category, heat = dataset["categories"][0], dataset["events"][0]
+    tie(db, dataset, 6, (6.0, 6.0, 12.0))
+    final = client.post("/events/", json={"name": "Final", "category_id": category.id, "date": "2024-12-21", "venue": "Main stage"}).json()
+    client.put(f"/events/{heat.id}", json={"name": heat.name, "category_id": category.id, "date": "2024-12-20",
+                                             "venue": "Hall", "next_round_id": final["id"], "qualify_top": 3})
+    client.put(f"/categories/{category.id}", json=category_payload(category, tie_breaks=["judge3"]))
+    assert client.post(f"/events/{heat.id}/advance").json()["qualified"] == 3
+
+
+@pytest.mark.parametrize("tie_breaks", [["judge4"], ["judge1", "judge1"]])
+def test_invalid_chains_are_rejected(client, dataset, tie_breaks):
+    category = dataset["categories"][0]
+    response = client.put(f"/categories/{category.id}", json=category_payload(category, tie_breaks=tie_breaks))
+    assert response.status_code == 400
+
+
+def test_rank_query_count(client, db, count_queries, per_category):
+    data = make_dataset(db, participants_per_category=per_category)
+    category, event_id = data["categories"][0], data["events"][0].id
+    client.put(f"/categories/{category.id}", json=category_payload(category, tie_breaks=["judge2", "oldest"]))
+    for result in data["results"]:
+        result.rank = None
+    db.commit()
+    with count_queries() as statements:
+        assert client.post(f"/events/{event_id}/rank").json()["updated"] == per_category
+    # Lookups, chains, one ranking window, one bulk update and its change log, per model: not one per result
+    assert len(statements) <= 10
@@ -47,61 +47,54 @@ function Participants() {
   const [formErrors, setFormErrors] = useState({});
 
   useEffect(() => {
-    fetchCategories();
-    fetchEvents();
-    fetchParticipants();
+    fetchPageData();
   }, []);
 
-  const fetchParticipants = async () => {
-    try {
-      const response = await fetch(`${API_URL}/participants/`);
-      if (!response.ok) {
-        throw new Error('Failed to fetch participants');
-      }
-      const data = await response.json();
-      console.log('Fetched participants:', data); // Debug log
-      setParticipants(data);
-    } catch (error) {
-      console.error('Error fetching participants:', error);
-      setSnackbar({
-        open: true,
-        message: 'Error loading participants',
-        severity: 'error'
-      });
-    }
-  };
+  // Events are sent once per page (events=ids), so put them back on each participant
+  const withEvents = (data) => data.participants.map(participant => ({
+    ...participant,
+    events: participant.event_ids.map(id => data.events[id]).filter(Boolean)
+  }));
 
-  const fetchEvents = async () => {
+  const fetchPageData = async () => {
     try {
-      const response = await fetch(`${API_URL}/events/`);
+      // Categories, events and participants in one round trip
+      const response = await fetch(`${API_URL}/batch?include=categories,events,participants&events=ids`);
       if (!response.ok) {
-        throw new Error('Failed to fetch events');
+        throw new Error('Failed to load page data');
       }
       const data = await response.json();
-      setEvents(data);
+      if (data.errors) {
+        console.error('Errors loading page data:', data.errors);
+      }
+      setCategories(data.categories || []);
+      setEvents(data.events || []);
+      setParticipants(data.participants ? withEvents(data.participants) : []);
     } catch (error) {
-      console.error('Error fetching events:', error);
+      console.error('Error loading page data:', error);
       setSnackbar({
         open: true,
-        message: 'Error loading events',
+        message: 'Error loading participants',
         severity: 'error'
       });
     }
   };
 
-  const fetchCategories = async () => {
+  const fetchParticipants = async () => {
     try {
-      const response = await fetch(`${API_URL}/categories/`);
+      // events=ids sends each event once instead of repeating it per participant
+      const response = await fetch(`${API_URL}/participants/?events=ids`);
       if (!response.ok) {
-        throw new Error('Failed to fetch categories');
+        throw new Error('Failed to fetch participants');
       }
       const data = await response.json();
-      setCategories(data);
+      console.log('Fetched participants:', data); // Debug log
+      setParticipants(withEvents(data));
     } catch (error) {
-      console.error('Error fetching categories:', error);
+      console.error('Error fetching participants:', error);
       setSnackbar({
         open: true,
-        message: 'Error loading categories',
+        message: 'Error loading participants',
         severity: 'error'
       });
     }
@@ -22,8 +22,7 @@ import {
 } from '@mui/material';
 import { Save as SaveIcon, Download as DownloadIcon, Calculate as CalculateIcon } from '@mui/icons-material';
 import * as XLSX from 'xlsx';
-
-const API_URL = 'http://localhost:8000';
+import * as sync from '../sync';
 
 function Results() {
   const [categories, setCategories] = useState([]);
@@ -37,6 +36,10 @@ function Results() {
 
   useEffect(() => {
     fetchCategories();
+    // Upload marks queued while offline as soon as the connection returns
+    const handleOnline = () => sync.syncNow();
+    window.addEventListener('online', handleOnline);
+    return () => window.removeEventListener('online', handleOnline);
   }, []);
 
   useEffect(() => {
@@ -46,32 +49,17 @@ function Results() {
   }, [selectedEvent, selectedCategory]);
 
   const fetchCategories = async () => {
-    try {
-      const response = await fetch(`${API_URL}/categories/`);
-      const data = await response.json();
-      setCategories(data);
-    } catch (error) {
-      console.error('Error fetching categories:', error);
-      showNotification('Error fetching categories', 'error');
+    if (!(await sync.syncNow())) {
+      showNotification('Working offline with the last synced data', 'warning');
     }
+    setCategories(sync.getCategories());
   };
 
   const fetchEvents = async (categoryId) => {
-    try {
-      setLoading(true);
-      const response = await fetch(`${API_URL}/events/?category_id=${categoryId}`);
-      if (!response.ok) {
-        throw new Error('Failed to fetch events');
-      }
-      const data = await response.json();
-      setEvents(Array.isArray(data) ? data : []);
-    } catch (error) {
-      console.error('Error fetching events:', error);
-      showNotification('Error fetching events', 'error');
-      setEvents([]);
-    } finally {
-      setLoading(false);
-    }
+    setLoading(true);
+    await sync.syncNow();
+    setEvents(sync.getEvents(categoryId));
+    setLoading(false);
   };
 
   const fetchParticipants = async () => {
@@ -79,27 +67,9 @@ function Results() {
     
     setLoading(true);
     try {
-      console.log('Fetching participants with:', {
-        category_id: selectedCategory,
-        event_id: selectedEvent
-      });
-      
-      const response = await fetch(
-        `${API_URL}/participants/?category_id=${selectedCategory}&event_id=${selectedEvent}`
-      );
-      
-      if (!response.ok) {
-        const errorData = await response.json();
-        console.error('Error response:', response.status, errorData);
-        throw new Error(`Failed to fetch participants: ${errorData.detail || response.statusText}`);
-      }
-      
-      const data = await response.json();
-      console.log('Received participants data:', data);
-      
-      if (!Array.isArray(data)) {
-        throw new Error('Expected array of participants but received: ' + typeof data);
-      }
+      // Delta sync only downloads what changed since the last pull
+      await sync.syncNow();
+      const data = sync.getParticipants(selectedCategory, selectedEvent);
       
       if (data.length === 0) {
         showNotification('No participants found for the selected category and event', 'info');
@@ -120,7 +90,6 @@ function Results() {
         };
       });
       
-      console.log('Setting marks:', initialMarks);  // Debug log
       setMarks(initialMarks);
       
       // Update participants with their total marks and ranks
@@ -253,25 +222,18 @@ function Results() {
         };
       });
 
-      console.log('Saving results:', resultsData); // Debug log
-
-      const response = await fetch(`${API_URL}/results/`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(resultsData),
-      });
-
-      if (!response.ok) {
-        const responseData = await response.json();
-        console.log('Error response:', response.status, responseData); // Debug log
-        throw new Error(responseData.detail || 'Failed to save results');
+      // Marks are queued locally first so nothing is lost if the upload fails
+      sync.queueEdits(resultsData);
+      let conflicts = [];
+      let online = true;
+      try {
+        conflicts = await sync.push();
+        // Final ranks come from the server; the pull below picks them up
+        await sync.rankEvent(selectedEvent);
+      } catch (error) {
+        online = false;
       }
 
-      const responseData = await response.json();
-      console.log('Results saved:', responseData); // Debug log
-      
       // Update local state with saved results
       const updatedParticipants = participants.map(participant => {
         const savedResult = resultsData.find(r => r.participant_id === participant.id);
@@ -283,7 +245,13 @@ function Results() {
       });
       
       setParticipants(updatedParticipants);
-      showNotification('Results saved successfully', 'success');
+      if (!online) {
+        showNotification(`Saved offline; ${sync.pendingEdits()} mark(s) will upload when the connection returns`, 'warning');
+      } else if (conflicts.length > 0) {
+        showNotification(`${conflicts.length} result(s) were changed by someone else; showing the server marks`, 'warning');
+      } else {
+        showNotification('Results saved successfully', 'success');
+      }
       
       // Refresh the participants list to show updated marks
       await fetchParticipants();
@@ -0,0 +1,173 @@
+// Offline-first data store for judge tablets.
+//
+// Keeps a local copy of categories, events, participants and results in
+// localStorage, refreshed with delta pulls from GET /sync?since=<version>.
+// Mark edits are queued locally and uploaded with POST /sync, so judging keeps
+// working while the venue Wi-Fi is down.
+
+const API_URL = 'http://localhost:8000';
+const STORAGE_KEY = 'judgify-sync';
+
+const emptyStore = () => ({
+  version: 0,
+  categories: {},
+  events: {},
+  participants: {},
+  results: {},
+  queue: [],
+});
+
+const resultKey = (participantId, eventId) => `${participantId}:${eventId}`;
+
+let store = null;
+
+const load = () => {
+  if (!store) {
+    try {
+      store = { ...emptyStore(), ...JSON.parse(localStorage.getItem(STORAGE_KEY)) };
+    } catch (error) {
+      store = emptyStore();
+    }
+  }
+  return store;
+};
+
+const save = () => {
+  localStorage.setItem(STORAGE_KEY, JSON.stringify(store));
+};
+
+const applyDelta = (delta) => {
+  const local = delta.full ? { ...emptyStore(), queue: load().queue } : load();
+  delta.categories.forEach(c => { local.categories[c.id] = c; });
+  delta.events.forEach(e => { local.events[e.id] = e; });
+  delta.participants.forEach(p => { local.participants[p.id] = p; });
+  delta.results.forEach(r => { local.results[resultKey(r.participant_id, r.event_id)] = r; });
+
+  delta.deleted.categories.forEach(id => { delete local.categories[id]; });
+  delta.deleted.events.forEach(id => {
+    delete local.events[id];
+    // Results of a deleted event are removed with it on the server
+    Object.keys(local.results)
+      .filter(key => local.results[key].event_id === id)
+      .forEach(key => { delete local.results[key]; });
+  });
+  delta.deleted.participants.forEach(id => {
+    delete local.participants[id];
+    Object.keys(local.results)
+      .filter(key => local.results[key].participant_id === id)
+      .forEach(key => { delete local.results[key]; });
+  });
+  delta.deleted.results.forEach(id => {
+    Object.keys(local.results)
+      .filter(key => local.results[key].id === id)
+      .forEach(key => { delete local.results[key]; });
+  });
+
+  local.version = delta.version;
+  store = local;
+  save();
+};
+
+export const pull = async () => {
+  const response = await fetch(`${API_URL}/sync?since=${load().version}`);
+  if (!response.ok) {
+    throw new Error('Failed to sync');
+  }
+  applyDelta(await response.json());
+};
+
+// Queue mark edits; they are applied to the local copy straight away
+export const queueEdits = (edits) => {
+  const local = load();
+  edits.forEach(edit => {
+    const key = resultKey(edit.participant_id, edit.event_id);
+    const current = local.results[key];
+    local.queue = local.queue.filter(
+      queued => resultKey(queued.participant_id, queued.event_id) !== key
+    );
+    local.queue.push({
+      ...edit,
+      client_id: `${key}:${Date.now()}`,
+      base_version: current ? current.version || 0 : 0,
+    });
+    local.results[key] = { ...current, ...edit };
+  });
+  save();
+};
+
+// Upload queued edits; returns the conflicts the server resolved in its favour
+export const push = async () => {
+  const local = load();
+  if (local.queue.length === 0) {
+    return [];
+  }
+  const response = await fetch(`${API_URL}/sync`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ edits: local.queue }),
+  });
+  if (!response.ok) {
+    throw new Error('Failed to upload marks');
+  }
+  const data = await response.json();
+  const done = new Set([
+    ...data.applied,
+    ...data.conflicts.map(c => c.client_id),
+    ...data.rejected.map(r => r.client_id),
+  ]);
+  local.queue = local.queue.filter(edit => !done.has(edit.client_id));
+  data.conflicts.forEach(conflict => {
+    const server = conflict.server;
+    local.results[resultKey(server.participant_id, server.event_id)] = server;
+  });
+  save();
+  return data.conflicts;
+};
+
+// Have the server rank an event; ties follow the category's tie-break chain
+export const rankEvent = async (eventId) => {
+  const response = await fetch(`${API_URL}/events/${eventId}/rank`, { method: 'POST' });
+  if (!response.ok) {
+    throw new Error('Failed to rank results');
+  }
+  return response.json();
+};
+
+// Push then pull; returns false when the server could not be reached
+export const syncNow = async () => {
+  try {
+    await push();
+    await pull();
+    return true;
+  } catch (error) {
+    console.warn('Working offline:', error);
+    return false;
+  }
+};
+
+export const pendingEdits = () => load().queue.length;
+
+export const getCategories = () => Object.values(load().categories);
+
+export const getEvents = (categoryId) =>
+  Object.values(load().events).filter(e => String(e.category_id) === String(categoryId));
+
+// Same shape as GET /participants/?category_id=&event_id=
+export const getParticipants = (categoryId, eventId) => {
+  const local = load();
+  return Object.values(local.participants)
+    .filter(p => String(p.category_id) === String(categoryId))
+    .filter(p => p.event_ids.some(id => String(id) === String(eventId)))
+    .map(p => {
+      const result = local.results[resultKey(p.id, Number(eventId))] || {};
+      return {
+        ...p,
+        events: p.event_ids.map(id => local.events[id]).filter(Boolean),
+        judge1_marks: result.judge1_marks ?? null,
+        judge2_marks: result.judge2_marks ?? null,
+        judge3_marks: result.judge3_marks ?? null,
+        total_marks: result.total_marks ?? null,
+        rank: result.rank ?? null,
+      };
+    });
+};